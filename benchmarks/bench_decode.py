@@ -0,0 +1,118 @@
+"""
+Benchmark the decoding of runtime value change lists.
+
+Compares the precompiled xsi:type decoders in ihcsdk.ihcdecoder with the previous
+ElementTree path lookups, for a waitForResourceValueChanges response with many
+changes. Run from the repository root:
+
+python -m benchmarks.bench_decode
+"""
+
+import datetime
+import timeit
+import xml.etree.ElementTree as ET
+
+from ihcsdk.ihcclient import IHCSoapClient
+from ihcsdk.ihcdecoder import decode_resource_values
+
+NS = IHCSoapClient.ihcns
+ITEMS_PATH = "./SOAP-ENV:Body/ns1:waitForResourceValueChanges2/ns1:arrayItem"
+
+VALUE_BOOL = (
+    '<ns1:value xsi:type="ns2:WSBooleanValue"><ns2:value>true</ns2:value></ns1:value>'
+)
+VALUE_INT = (
+    '<ns1:value xsi:type="ns2:WSIntegerValue"><ns2:integer>42</ns2:integer></ns1:value>'
+)
+VALUE_FLOAT = (
+    '<ns1:value xsi:type="ns2:WSFloatingPointValue">'
+    "<ns2:floatingPointValue>21.5</ns2:floatingPointValue></ns1:value>"
+)
+VALUE_TIME = (
+    '<ns1:value xsi:type="ns2:WSTimeValue"><ns2:hours>1</ns2:hours>'
+    "<ns2:minutes>2</ns2:minutes><ns2:seconds>3</ns2:seconds></ns1:value>"
+)
+VALUES = (VALUE_BOOL, VALUE_INT, VALUE_FLOAT, VALUE_TIME)
+
+
+def make_change_list(count: int) -> ET.Element:
+    """Create a waitForResourceValueChanges response with count changes."""
+    items = "".join(
+        "<ns1:arrayItem>"
+        f"{VALUES[i % len(VALUES)]}"
+        "<ns1:typeString/>"
+        f"<ns1:resourceID>{1000 + i}</ns1:resourceID>"
+        "<ns1:isValueRuntime>true</ns1:isValueRuntime>"
+        "</ns1:arrayItem>"
+        for i in range(count)
+    )
+    return ET.fromstring(  # noqa: S314
+        '<SOAP-ENV:Envelope xmlns:SOAP-ENV="http://schemas.xmlsoap.org/soap/envelope/"'
+        ' xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"'
+        ' xmlns:ns1="utcs" xmlns:ns2="utcs.values"><SOAP-ENV:Body>'
+        f"<ns1:waitForResourceValueChanges2>{items}</ns1:waitForResourceValueChanges2>"
+        "</SOAP-ENV:Body></SOAP-ENV:Envelope>"
+    )
+
+
+def path_decode_value(resource_value: ET.Element) -> object:
+    """Decode a value with the namespaced path lookups used before the decoders."""
+    valuetype = resource_value.attrib[
+        "{http://www.w3.org/2001/XMLSchema-instance}type"
+    ].split(":")[1]
+    match valuetype:
+        case "WSBooleanValue":
+            return resource_value.find("./ns2:value", NS).text == "true"
+        case "WSIntegerValue":
+            return int(resource_value.find("./ns2:integer", NS).text)
+        case "WSFloatingPointValue":
+            return round(
+                float(resource_value.find("./ns2:floatingPointValue", NS).text), 2
+            )
+        case "WSTimeValue":
+            return datetime.time(
+                int(resource_value.find("./ns2:hours", NS).text),
+                int(resource_value.find("./ns2:minutes", NS).text),
+                int(resource_value.find("./ns2:seconds", NS).text),
+            )
+    return resource_value.text
+
+
+def path_decode(xdoc: ET.Element) -> list:
+    """Decode the change list with per item path lookups."""
+    changes = []
+    for item in xdoc.findall(ITEMS_PATH, NS):
+        ihcid = item.find("ns1:resourceID", NS)
+        if ihcid is None:
+            continue
+        value = path_decode_value(item.find("./ns1:value", NS))
+        if value is not None:
+            changes.append((int(ihcid.text), value))
+    return changes
+
+
+def decoder_decode(xdoc: ET.Element) -> list:
+    """Decode the change list with the precompiled decoders."""
+    return decode_resource_values(xdoc.findall(ITEMS_PATH, NS))
+
+
+def main() -> None:
+    """Run the benchmark."""
+    print(f"{'changes':>8} {'path us/item':>14} {'decoder us/item':>16} {'speedup':>8}")  # noqa: T201
+    for count in (10, 100, 1000, 5000):
+        xdoc = make_change_list(count)
+        number = max(1, 20000 // count)
+        results = []
+        for func in (path_decode, decoder_decode):
+            best = min(
+                timeit.repeat(lambda f=func, x=xdoc: f(x), number=number, repeat=5)
+            )
+            results.append(best / number / count * 1e6)
+        print(  # noqa: T201
+            f"{count:>8} {results[0]:>14.2f} {results[1]:>16.2f} "
+            f"{results[0] / results[1]:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""
+Benchmark the soap hot paths.
+
+The offline cases use synthetic soap responses, and the request cases run the
+client against the in-process IHCSimulator, so no controller is needed. Each case
+reports the items per second, the latency percentiles per call and the peak
+memory allocated by a call. The peak of the request cases includes the
+allocations of the simulator, as it runs in the same process. Run from the
+repository root:
+
+python -m benchmarks.bench_soap [--calls 50] [--filter parse] [--json out.json]
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import xml.etree.ElementTree as ET
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+from benchmarks.measure import HEADER, BenchResult, format_result, measure
+from ihcsdk import ihcpayload
+from ihcsdk.ihcclient import IHCSoapClient
+from ihcsdk.ihcconnection import IHCConnection
+from ihcsdk.ihcdecoder import decode_resource_values, decode_value
+from ihcsdk.ihcparser import get_parser, lxml_etree
+from ihcsdk.ihcproject import IHCProject
+from ihcsdk.ihcsimulator import (
+    ENVELOPE,
+    FIRST_RESOURCEID,
+    IHCSimulator,
+    encode_resource_value,
+    encode_value,
+)
+
+SIZES = (1, 100, 1000, 5000)
+CHANGES = (100, 1000, 5000)
+CONCURRENT = 4
+ITEM_TAG = "{utcs}arrayItem"
+VALUES = {
+    "bool": True,
+    "int": 42,
+    "float": 21.5,
+    "timer": datetime.timedelta(milliseconds=1500),
+    "time": datetime.time(1, 2, 3),
+    "enum": "On",
+}
+
+
+class Case(NamedTuple):
+    """A benchmark case, the setup is called before each call and not timed."""
+
+    name: str
+    func: Callable[[], object]
+    items: int
+    setup: Callable[[], object] | None = None
+
+
+def resource_values_response(count: int) -> bytes:
+    """Create a getRuntimeValues response with count values of mixed types."""
+    values = list(VALUES.values())
+    items = "".join(
+        encode_resource_value(FIRST_RESOURCEID + i, values[i % len(values)])
+        for i in range(count)
+    )
+    return ENVELOPE.format(
+        f"<ns1:getRuntimeValues2>{items}</ns1:getRuntimeValues2>"
+    ).encode()
+
+
+def chunks(data: bytes, size: int = 65536) -> Iterator[bytes]:
+    """Split the data in chunks like the streamed response."""
+    for start in range(0, len(data), size):
+        yield data[start : start + size]
+
+
+def payload_cases() -> Iterator[Case]:
+    """Build the requests like the connection does."""
+    connection = IHCConnection("http://localhost")
+    for size in SIZES:
+        ids = range(FIRST_RESOURCEID, FIRST_RESOURCEID + size)
+        yield Case(
+            f"payload getRuntimeValues {size}",
+            lambda ids=ids: connection.build_request(
+                "getResourceValues", ihcpayload.get_runtime_values(ids)
+            ),
+            size,
+        )
+    items = [(FIRST_RESOURCEID + i, (True, 42, 21.5)[i % 3]) for i in range(100)]
+    yield Case(
+        "payload setResourceValues 100",
+        lambda: connection.build_request(
+            "setResourceValues", ihcpayload.set_resource_values(items)
+        ),
+        100,
+    )
+
+
+def parse_cases() -> Iterator[Case]:
+    """Parse the responses with the parser backends."""
+    backends = ["etree"] if lxml_etree is None else ["etree", "lxml"]
+    for backend in backends:
+        parser = get_parser(backend)
+        for size in SIZES:
+            data = resource_values_response(size)
+            yield Case(
+                f"parse {backend} {size}",
+                lambda p=parser, d=data: p.parse(d),
+                size,
+            )
+            yield Case(
+                f"find items {backend} {size}",
+                lambda p=parser, d=data: p.find_items(d, ITEM_TAG),
+                size,
+            )
+            yield Case(
+                f"parse items {backend} {size}",
+                lambda p=parser, d=data: list(p.iter_items(chunks(d), ITEM_TAG)),
+                size,
+            )
+
+
+def decode_cases() -> Iterator[Case]:
+    """Decode the values by type and the resource value lists."""
+    count = 1000
+    for name, value in VALUES.items():
+        xdoc = ET.fromstring(ENVELOPE.format(encode_value("value", value)))  # noqa: S314
+        element = xdoc[0][0]
+        elements = [element] * count
+        yield Case(
+            f"decode_value {name}",
+            lambda e=elements: [decode_value(v) for v in e],
+            count,
+        )
+    for size in CHANGES:
+        items = list(
+            get_parser().iter_items([resource_values_response(size)], ITEM_TAG)
+        )
+        yield Case(
+            f"decode_resource_values {size}",
+            lambda i=items: decode_resource_values(i),
+            size,
+        )
+
+
+def request_cases(simulator: IHCSimulator) -> Iterator[Case]:
+    """Do the requests against the simulator."""
+    client = IHCSoapClient(simulator.url)
+    client.authenticate("user", "password")
+    for size in (1, 10, *SIZES[1:]):
+        ids = list(range(FIRST_RESOURCEID, FIRST_RESOURCEID + size))
+        yield Case(
+            f"get_runtime_values {size}",
+            lambda ids=ids: client.get_runtime_values(ids),
+            size,
+        )
+    executor = ThreadPoolExecutor(max_workers=CONCURRENT)
+    ids = list(range(FIRST_RESOURCEID, FIRST_RESOURCEID + CONCURRENT))
+    for coalesce in (False, True):
+        # Concurrent single reads, folded into getResourceValues if coalesced
+        yield Case(
+            f"concurrent get_runtime_value {CONCURRENT} coalesce={coalesce}",
+            lambda ids=ids: list(executor.map(client.get_runtime_value, ids)),
+            CONCURRENT,
+            lambda c=coalesce: setattr(client, "coalesce", c),
+        )
+    ids = list(simulator.values)
+    client.enable_runtime_notifications(ids)
+    client.wait_for_resource_value_change_list(0)
+    for size in CHANGES:
+        # The changes are queued by the setup, so the poll returns at once
+        yield Case(
+            f"wait_for_resource_value_change_list {size}",
+            client.wait_for_resource_value_change_list,
+            size,
+            lambda s=size: simulator.generate_changes(s),
+        )
+    data = client.get_project_data_in_segments()
+    yield Case(
+        f"get_project_in_segments {simulator.segments}",
+        client.get_project_in_segments,
+        len(data),
+    )
+    yield Case(
+        "decompress_project",
+        lambda: IHCSoapClient.decompress_project(data),
+        len(data),
+    )
+    segments = list(chunks(data, len(data) // simulator.segments + 1))
+    yield Case(
+        "parse_project_stream to IHCProject",
+        lambda: IHCProject.from_events(
+            IHCSoapClient.parse_project_stream(segments, ("start", "end"))
+        ),
+        len(data),
+    )
+
+
+def run(cases: Iterator[Case], calls: int, pattern: str | None) -> list[BenchResult]:
+    """Measure and print the cases matching the pattern."""
+    results = []
+    for case in cases:
+        if pattern and pattern not in case.name:
+            continue
+        result = measure(case.name, case.func, case.items, calls, setup=case.setup)
+        print(format_result(result))  # noqa: T201
+        results.append(result)
+    return results
+
+
+def main() -> None:
+    """Run the benchmarks."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--calls", type=int, default=50, help="timed calls per case")
+    parser.add_argument("--filter", help="only run the cases containing the text")
+    parser.add_argument("--json", help="write the results to a json file")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    print(HEADER)  # noqa: T201
+    results = []
+    for cases in (payload_cases(), parse_cases(), decode_cases()):
+        results += run(cases, args.calls, args.filter)
+    with IHCSimulator(resources=5000, segments=10, seed=1) as simulator:
+        results += run(request_cases(simulator), args.calls, args.filter)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:  # noqa: PTH123
+            json.dump([result.as_dict() for result in results], file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Measure the latency, throughput and allocations of a benchmark case.
+
+Each call is timed on its own, so the latency percentiles can be reported. The
+allocations are measured with tracemalloc in separate calls, so the tracing does
+not slow down the timed calls.
+"""
+
+import statistics
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+
+@dataclass(slots=True)
+class BenchResult:
+    """The result of a benchmark case."""
+
+    name: str
+    # Number of items (ids, changes, bytes) handled by each call
+    items: int
+    # Seconds for each timed call
+    samples: list[float]
+    # Peak memory allocated during a call in bytes
+    peak: int
+
+    def percentile(self, percent: int) -> float:
+        """Get a latency percentile in seconds."""
+        if len(self.samples) < 2:  # noqa: PLR2004
+            return self.samples[0]
+        return statistics.quantiles(self.samples, n=100, method="inclusive")[
+            percent - 1
+        ]
+
+    @property
+    def throughput(self) -> float:
+        """Get the items per second."""
+        return self.items * len(self.samples) / sum(self.samples)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Get the result as a dictionary for the json output."""
+        return {
+            "name": self.name,
+            "items": self.items,
+            "calls": len(self.samples),
+            "throughput": self.throughput,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "peak": self.peak,
+        }
+
+
+def measure(  # noqa: PLR0913
+    name: str,
+    func: Callable[[], Any],
+    items: int = 1,
+    calls: int = 100,
+    *,
+    warmup: int = 3,
+    setup: Callable[[], Any] | None = None,
+) -> BenchResult:
+    """
+    Measure a benchmark case.
+
+    The setup function is called before each call of func, and is not timed.
+    """
+    for _ in range(warmup):
+        if setup is not None:
+            setup()
+        func()
+    samples = []
+    for _ in range(calls):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        func()
+        peak = tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+    return BenchResult(name, items, samples, peak)
+
+
+HEADER = (
+    f"{'case':<40} {'calls':>6} {'items/s':>12} {'p50 ms':>9} {'p90 ms':>9} "
+    f"{'p99 ms':>9} {'peak KiB':>9}"
+)
+
+
+def format_result(result: BenchResult) -> str:
+    """Format a result as a table row."""
+    return (
+        f"{result.name:<40} {len(result.samples):>6} {result.throughput:>12,.0f} "
+        f"{result.percentile(50) * 1000:>9.3f} {result.percentile(90) * 1000:>9.3f} "
+        f"{result.percentile(99) * 1000:>9.3f} {result.peak / 1024:>9.1f}"
+    )
@@ -0,0 +1,460 @@
+"""Implements the asyncio connection to the ihc controller."""
+
+import asyncio
+import base64
+import datetime
+import time
+import xml.etree.ElementTree as ET
+from collections import deque
+from collections.abc import AsyncIterator
+from typing import Any, Literal
+
+import aiohttp
+
+from ihcsdk import ihcpayload
+from ihcsdk.ihcasyncconnection import AsyncIHCConnection
+from ihcsdk.ihcclient import IHCProjectParser, IHCSoapClient
+from ihcsdk.ihcconnection import ERROR_AUTH
+from ihcsdk.ihcdecoder import decode_resource_values, decode_value
+from ihcsdk.ihcratelimiter import PRIORITY_BULK, PRIORITY_READ, PRIORITY_WRITE
+
+
+class AsyncIHCSoapClient:
+    """
+    Implements the IHCSoapClient requests using asyncio.
+
+    The methods and return values are the same as for the IHCSoapClient, but all
+    requests must be awaited, and the iter methods are async iterators. A single
+    event loop can drive many concurrent requests for one or more controllers.
+    """
+
+    ihcns = IHCSoapClient.ihcns
+
+    def __init__(self, url: str, session: aiohttp.ClientSession | None = None) -> None:
+        """Initialize the AsyncIHCSoapClient with a url for the controller."""
+        self.url = url
+        self.username = ""
+        self.password = ""
+        self.connection = AsyncIHCConnection(url, session)
+
+    async def close(self) -> None:
+        """Close the connection."""
+        await self.connection.close()
+        self.connection = None
+
+    async def authenticate(self, username: str, password: str) -> bool:
+        """
+        Do an Authentricate request.
+
+        And save the cookie returned to be used on the following requests.
+        Return True if the request was successfull.
+        """
+        self.username = username
+        self.password = password
+
+        payload = ihcpayload.authenticate(username, password)
+        xdoc = await self.connection.soap_action(
+            "/ws/AuthenticationService", "authenticate", payload
+        )
+        if xdoc is not False:
+            isok = xdoc.find(
+                "./SOAP-ENV:Body/ns1:authenticate2/ns1:loginWasSuccessful",
+                self.ihcns,
+            )
+            if isok.text != "true":
+                self.connection.last_error = ERROR_AUTH
+                return False
+            self.connection.authenticated_at = time.monotonic()
+            return True
+        return False
+
+    async def get_state(self) -> str:
+        """Get the controller state."""
+        xdoc = await self.connection.soap_action(
+            "/ws/ControllerService", "getState", ""
+        )
+        if xdoc is not False:
+            return xdoc.find("./SOAP-ENV:Body/ns1:getState1/ns1:state", self.ihcns).text
+        return False
+
+    async def wait_for_state_change(self, state: str, waitsec: int) -> str:
+        """Wait for controller state change and return state."""
+        payload = ihcpayload.wait_for_state_change(state, waitsec)
+        xdoc = await self.connection.soap_action(
+            "/ws/ControllerService", "waitForControllerStateChange", payload
+        )
+        if xdoc is not False:
+            return xdoc.find(
+                "./SOAP-ENV:Body/ns1:waitForControllerStateChange3/ns1:state",
+                self.ihcns,
+            ).text
+        return False
+
+    async def get_project(self) -> str:
+        """
+        Get the ihc project in single SOAP action.
+
+        You should use the get_project_in_segments to get the project in multiple
+        segments. This will stress the IHC controller less.
+        """
+        data = await self.get_project_data()
+        if data is False:
+            return False
+        return IHCSoapClient.decompress_project(data)
+
+    async def get_project_data(self) -> bytes | Literal[False]:
+        """Get the compressed ihc project data in single SOAP action."""
+        xdoc = await self.connection.soap_action(
+            "/ws/ControllerService", "getIHCProject", "", PRIORITY_BULK
+        )
+        if xdoc is not False:
+            base64data = xdoc.find(
+                "./SOAP-ENV:Body/ns1:getIHCProject1/ns1:data", self.ihcns
+            ).text
+            if not base64data:
+                return False
+            return base64.b64decode(base64data)
+        return False
+
+    async def get_project_in_segments(
+        self, info: dict[str, Any] | None = None, max_workers: int = 1
+    ) -> str:
+        """
+        Get the ihc project per segments.
+
+        Param: info .. reuse existing project info.
+        If not provided, the get_project_info() is called internally.
+        Param: max_workers .. number of segments to download concurrently.
+        """
+        data = await self.get_project_data_in_segments(info, max_workers)
+        if data is False:
+            return False
+        return IHCSoapClient.decompress_project(data)
+
+    async def get_project_data_in_segments(
+        self, info: dict[str, Any] | None = None, max_workers: int = 1
+    ) -> bytes | Literal[False]:
+        """
+        Get the compressed ihc project data per segments.
+
+        With max_workers above 1 the segments are downloaded concurrently,
+        but never more than max_workers requests at a time.
+        """
+        try:
+            return b"".join(
+                [s async for s in self.iter_project_segments(info, max_workers)]
+            )
+        except ConnectionError:
+            return False
+
+    async def iter_project_segments(
+        self, info: dict[str, Any] | None = None, max_workers: int = 1
+    ) -> AsyncIterator[bytes]:
+        """
+        Yield the compressed ihc project segments in order as they arrive.
+
+        With max_workers above 1 the next segments are downloaded concurrently.
+        Raise ConnectionError if the project or a segment can not be downloaded.
+        """
+        if info is None:
+            info = await self.get_project_info()
+        if not info:
+            msg = "Unable to get the ihc project info"
+            raise ConnectionError(msg)
+        project_major = info.get("projectMajorRevision", 0)
+        project_minor = info.get("projectMinorRevision", 0)
+        segments = await self.get_project_number_of_segments()
+        if segments is False:
+            msg = "Unable to get the number of ihc project segments"
+            raise ConnectionError(msg)
+        pending: deque[asyncio.Task] = deque()
+        nextsegment = 0
+        try:
+            while nextsegment < segments or pending:
+                while nextsegment < segments and len(pending) < max(max_workers, 1):
+                    pending.append(
+                        asyncio.create_task(
+                            self.get_project_segment(
+                                nextsegment, project_major, project_minor
+                            )
+                        )
+                    )
+                    nextsegment += 1
+                segment = await pending.popleft()
+                if segment is False:
+                    msg = "Unable to get ihc project segment"
+                    raise ConnectionError(msg)
+                yield segment
+        finally:
+            # Stop the downloads that are not needed, if the iteration ended early
+            for task in pending:
+                task.cancel()
+
+    async def iter_project(
+        self,
+        info: dict[str, Any] | None = None,
+        max_workers: int = 1,
+        events: tuple[str, ...] = ("end",),
+    ) -> AsyncIterator[tuple[str, ET.Element]]:
+        """
+        Download, decompress and parse the ihc project incrementally.
+
+        See IHCSoapClient.iter_project.
+        """
+        parser = IHCProjectParser(events)
+        async for segment in self.iter_project_segments(info, max_workers):
+            for event in parser.feed(segment):
+                yield event
+        for event in parser.close():
+            yield event
+
+    async def get_project_info(self) -> dict[str, Any]:
+        """Return dictionary of project info items."""
+        xdoc = await self.connection.soap_action(
+            "/ws/ControllerService", "getProjectInfo", ""
+        )
+        if xdoc is not False:
+            info = {}
+            elem = xdoc.find("./SOAP-ENV:Body/ns1:getProjectInfo1", self.ihcns)
+            if elem is not None:
+                for e in list(elem):
+                    name = e.tag.split("}")[-1]
+                    info[name] = decode_value(e)
+            return info
+        return False
+
+    async def get_project_number_of_segments(self) -> int:
+        """Return the number of segments needed to fetch the current ihc-project."""
+        xdoc = await self.connection.soap_action(
+            "/ws/ControllerService", "getIHCProjectNumberOfSegments", ""
+        )
+        if xdoc is not False:
+            return int(
+                xdoc.find(
+                    "./SOAP-ENV:Body/ns1:getIHCProjectNumberOfSegments1", self.ihcns
+                ).text
+            )
+        return False
+
+    async def get_project_segment(
+        self, segment: int, project_major: int, project_minor: int
+    ) -> bytes:
+        """Return a segment of the ihc-project with the given number."""
+        payload = ihcpayload.get_project_segment(segment, project_major, project_minor)
+        xdoc = await self.connection.soap_action(
+            "/ws/ControllerService", "getIHCProjectSegment", payload, PRIORITY_BULK
+        )
+        if xdoc is not False:
+            base64data = xdoc.find(
+                "./SOAP-ENV:Body/ns1:getIHCProjectSegment4/ns1:data", self.ihcns
+            ).text
+            if not base64data:
+                return False
+            return base64.b64decode(base64data)
+        return False
+
+    async def _set_resource_value(self, resourceid: int, valueelement: str) -> bool:
+        """Set a runtime value from the xml value element."""
+        xdoc = await self.connection.soap_action(
+            "/ws/ResourceInteractionService",
+            "setResourceValue",
+            ihcpayload.set_resource_value(resourceid, valueelement),
+            PRIORITY_WRITE,
+        )
+        if xdoc is not False:
+            result = xdoc.find("./SOAP-ENV:Body/ns1:setResourceValue2", self.ihcns).text
+            return result == "true"
+        return False
+
+    async def set_runtime_value_bool(self, resourceid: int, value: bool) -> bool:
+        """Set a boolean runtime value."""
+        return await self._set_resource_value(resourceid, ihcpayload.bool_value(value))
+
+    async def set_runtime_value_int(self, resourceid: int, intvalue: int) -> bool:
+        """Set a integer runtime value."""
+        return await self._set_resource_value(
+            resourceid, ihcpayload.int_value(intvalue)
+        )
+
+    async def set_runtime_value_float(self, resourceid: int, floatvalue: float) -> bool:
+        """Set a flot runtime value."""
+        return await self._set_resource_value(
+            resourceid, ihcpayload.float_value(floatvalue)
+        )
+
+    async def set_runtime_value_timer(self, resourceid: int, timer: int) -> bool:
+        """Set a timer runtime value in milliseconds."""
+        return await self._set_resource_value(resourceid, ihcpayload.timer_value(timer))
+
+    async def set_runtime_value_time(
+        self, resourceid: int, hours: int, minutes: int, seconds: int
+    ) -> bool:
+        """Set a time runtime value in hours:minutes:seconds."""
+        return await self._set_resource_value(
+            resourceid, ihcpayload.time_value(hours, minutes, seconds)
+        )
+
+    async def get_runtime_value(
+        self, resourceid: int
+    ) -> bool | int | float | str | datetime.datetime | None:
+        """
+        Get runtime value of specified resource id.
+
+        Return None if resource cannot be found or on error
+        """
+        payload = ihcpayload.get_runtime_value(resourceid)
+        xdoc = await self.connection.soap_action(
+            "/ws/ResourceInteractionService", "getResourceValue", payload
+        )
+        if xdoc is False:
+            return None
+        value = xdoc.find("./SOAP-ENV:Body/ns1:getRuntimeValue2/ns1:value", self.ihcns)
+        return decode_value(value)
+
+    async def get_runtime_values(
+        self, resourceids: list[int], priority: int = PRIORITY_READ
+    ) -> dict[int, Any] | Literal[False]:
+        """
+        Get runtime values of specified resource ids.
+
+        The priority is used by the rate limiter of the connection.
+        Return False on error
+        """
+        payload = ihcpayload.get_runtime_values(resourceids)
+        items = await self.connection.soap_action_items(
+            "/ws/ResourceInteractionService",
+            "getResourceValues",
+            payload,
+            "{utcs}arrayItem",
+            priority,
+        )
+        if items is False:
+            return False
+        return dict(decode_resource_values(items))
+
+    async def cycle_bool_value(self, resourceid: int) -> bool | None:
+        """
+        Turn a booelan resource On and back Off.
+
+        Return None if resource cannot be found or on error
+        """
+        payload = ihcpayload.set_resource_values(
+            [(resourceid, True), (resourceid, False)]
+        )
+        xdoc = await self.connection.soap_action(
+            "/ws/ResourceInteractionService",
+            "SOAPAction: setResourceValues",
+            payload,
+            PRIORITY_WRITE,
+        )
+        if xdoc is False:
+            return None
+        return True
+
+    async def set_runtime_values(
+        self, values: dict[int, Any], chunksize: int = 100
+    ) -> dict[int, bool]:
+        """
+        Set multiple runtime values using the setResourceValues request.
+
+        See IHCSoapClient.set_runtime_values. The chunks are send concurrently.
+        """
+        items = list(values.items())
+        chunks = [
+            items[start : start + chunksize]
+            for start in range(0, len(items), chunksize)
+        ]
+        xdocs = await asyncio.gather(
+            *(
+                self.connection.soap_action(
+                    "/ws/ResourceInteractionService",
+                    "setResourceValues",
+                    ihcpayload.set_resource_values(chunk),
+                    PRIORITY_WRITE,
+                )
+                for chunk in chunks
+            )
+        )
+        result = {}
+        for xdoc, chunk in zip(xdocs, chunks, strict=True):
+            result.update(IHCSoapClient._get_set_resource_values_result(xdoc, chunk))  # noqa: SLF001
+        return result
+
+    async def enable_runtime_notification(self, resourceid: int) -> bool:
+        """Enable notification for specified resource id."""
+        return await self.enable_runtime_notifications([resourceid])
+
+    async def enable_runtime_notifications(self, resourceids: list[int]) -> bool:
+        """Enable notification for specified resource ids."""
+        payload = ihcpayload.enable_runtime_notifications(resourceids)
+        xdoc = await self.connection.soap_action(
+            "/ws/ResourceInteractionService", "enableRuntimeValueNotifications", payload
+        )
+        return xdoc is not False
+
+    async def wait_for_resource_value_changes(
+        self, wait: int = 10
+    ) -> dict[int, str] | Literal[False]:
+        """
+        Long polling for changes.
+
+        And return a dictionary with resource:value for changes (Only last change)
+        """
+        change_list = await self.wait_for_resource_value_change_list(wait)
+        if change_list is False:
+            return False
+        return dict(change_list)
+
+    async def wait_for_resource_value_change_list(
+        self,
+        wait: int = 10,
+        timeout: float | None = None,  # noqa: ASYNC109
+    ) -> list[(int, Any)] | Literal[False]:
+        """
+        Long polling for changes.
+
+        Return a list of tuples with the id,value of all changes since last poll.
+        The poll fails if there is no response within timeout seconds, like when
+        the connection is stalled.
+        """
+        payload = ihcpayload.wait_for_resource_value_changes(wait)
+        items = await self.connection.soap_action_items(
+            "/ws/ResourceInteractionService",
+            "getResourceValue",
+            payload,
+            "{utcs}arrayItem",
+            timeout=timeout,
+        )
+        if items is False:
+            return False
+        return decode_resource_values(items)
+
+    async def get_user_log(self, language: str = "da") -> str | Literal[False]:
+        """Get the user log from the controller."""
+        payload = ihcpayload.get_user_log(language)
+        xdoc = await self.connection.soap_action(
+            "/ws/ConfigurationService", "getUserLog", payload
+        )
+        if xdoc is not False:
+            base64data = xdoc.find(
+                "./SOAP-ENV:Body/ns1:getUserLog4/ns1:data", self.ihcns
+            ).text
+            if not base64data:
+                return False
+            return base64.b64decode(base64data).decode("UTF-8")
+        return False
+
+    async def clear_user_log(self) -> None:
+        """Clear the user log in the controller."""
+        await self.connection.soap_action(
+            "/ws/ConfigurationService", "clearUserLog", ""
+        )
+
+    async def get_system_info(self) -> dict[str, str] | bool:
+        """Get controller system info."""
+        xdoc = await self.connection.soap_action(
+            "/ws/ConfigurationService", "getSystemInfo", ""
+        )
+        if xdoc is False:
+            return False
+        return IHCSoapClient._get_system_info(xdoc)  # noqa: SLF001
@@ -0,0 +1,198 @@
+"""Implements soap reqeust using the "aiohttp" module."""
+
+import asyncio
+import logging
+import os
+import ssl
+import time
+import xml.etree.ElementTree as ET
+from http import HTTPStatus
+from typing import Literal
+
+import aiohttp
+
+from ihcsdk.ihcconnection import IHCConnectionBase, classify_error
+from ihcsdk.ihcratelimiter import PRIORITY_READ
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class AsyncIHCConnection(IHCConnectionBase):
+    """Implements an asyncio http(s) connection to the controller."""
+
+    timeout_errors = (TimeoutError,)
+
+    def __init__(self, url: str, session: aiohttp.ClientSession | None = None) -> None:
+        """
+        Initialize the AsyncIHCConnection with a url for the controller.
+
+        A shared aiohttp session can be passed in. If not, the connection will
+        create its own session on first use and close it in close().
+        """
+        super().__init__(url)
+        self.session = session
+        self._own_session = session is None
+        # retry on these http status codes like the requests based connection
+        self.retries = 3
+        self.backoff_factor = 0.2
+        self.status_forcelist = {502, 503, 504}
+        self.cert_file = None
+        if url.startswith("https://"):
+            self.cert_file = os.path.dirname(__file__) + "/certs/ihc3.crt"  # noqa: PTH120
+
+    async def close(self) -> None:
+        """Close the connection."""
+        if self.session is not None and self._own_session:
+            await self.session.close()
+        self.session = None
+
+    def ssl_context(self) -> ssl.SSLContext | None:
+        """Create the ssl context for the controller certificate."""
+        if self.cert_file is None:
+            return None
+        context = ssl.create_default_context(cafile=self.cert_file)
+        context.set_ciphers("DEFAULT:!DH")
+        # The controller uses a self signed certificate without a matching hostname
+        context.check_hostname = False
+        return context
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Get the session and create it if needed."""
+        if self.session is None:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(ssl=self.ssl_context() or False),
+                cookie_jar=aiohttp.CookieJar(unsafe=True),
+            )
+            self._own_session = True
+        return self.session
+
+    async def soap_action(
+        self,
+        service: str,
+        action: str,
+        payloadbody: str,
+        priority: int = PRIORITY_READ,
+        *,
+        timeout: float | None = None,  # noqa: ASYNC109
+    ) -> ET.Element | Literal[False]:
+        """
+        Do a soap request.
+
+        The request fails if no response is received within timeout seconds (None
+        uses the timeout of the session).
+        """
+        data = None
+        try:
+            data = await self._post(
+                service, action, payloadbody, priority, timeout=timeout
+            )
+            if data is False:
+                return False
+            xdoc = self.parse_response(service, action, data)
+            if xdoc is None:
+                return False
+        except (aiohttp.ClientError, TimeoutError, *self.parser.errors) as exp:
+            self.request_failed(service, action, exp, data)
+        else:
+            return xdoc
+        return False
+
+    async def soap_action_items(  # noqa: PLR0913
+        self,
+        service: str,
+        action: str,
+        payloadbody: str,
+        tag: str,
+        priority: int = PRIORITY_READ,
+        *,
+        timeout: float | None = None,  # noqa: ASYNC109
+    ) -> list[ET.Element] | Literal[False]:
+        """Do a soap request and return the elements with the tag from the response."""
+        data = None
+        try:
+            data = await self._post(
+                service, action, payloadbody, priority, timeout=timeout
+            )
+            if data is False:
+                return False
+            _LOGGER.debug("soap request response %s", data)
+            start = time.perf_counter()
+            items = self.parser.find_items(data, tag)
+            if self.metrics is not None:
+                self.metrics.parse(service, action, time.perf_counter() - start)
+        except (aiohttp.ClientError, TimeoutError, *self.parser.errors) as exp:
+            self.request_failed(service, action, exp, data)
+        else:
+            return items
+        return False
+
+    async def _post(
+        self,
+        service: str,
+        action: str,
+        payloadbody: str,
+        priority: int = PRIORITY_READ,
+        *,
+        timeout: float | None = None,  # noqa: ASYNC109
+    ) -> bytes | Literal[False]:
+        """Post the soap request and return the response body if the status is OK."""
+        payload, headers = self.build_request(action, payloadbody)
+        session = self._get_session()
+        options = {}
+        if timeout is not None:
+            # Like the read timeout of requests, the time to connect or to read
+            options["timeout"] = aiohttp.ClientTimeout(
+                sock_connect=timeout, sock_read=timeout
+            )
+        await self.rate_limit(priority)
+        _LOGGER.debug("soap payload %s", payload)
+        self.last_exception = None
+        self.last_error = None
+        start = time.perf_counter()
+        for retry in range(self.retries + 1):
+            async with session.post(
+                self.url + service, headers=headers, data=payload, **options
+            ) as response:
+                _LOGGER.debug("soap request response status %d", response.status)
+                if response.status in self.status_forcelist and retry < self.retries:
+                    await asyncio.sleep(self.backoff_factor * (2**retry))
+                    continue
+                data = await response.read()
+                if self.metrics is not None:
+                    self.metrics.request(
+                        service,
+                        action,
+                        time.perf_counter() - start,
+                        sent=len(payload),
+                        received=len(data),
+                        retries=retry,
+                    )
+                if response.status != HTTPStatus.OK:
+                    self.last_response = response
+                    self.failed(service, action, classify_error(response.status, data))
+                    return False
+                self.last_request_at = time.monotonic()
+                return data
+        return False
+
+    async def rate_limit(self, priority: int = PRIORITY_READ) -> None:
+        """Wait for the rate limiter before a request with the priority."""
+        limiter = self.rate_limiter
+        if limiter is None:
+            return
+        waited = 0.0
+        wait = limiter.try_acquire(priority)
+        if wait:
+            # Keep the lower priority requests waiting while this one sleeps
+            limiter.add_waiter(priority)
+            try:
+                while wait:
+                    await asyncio.sleep(wait)
+                    waited += wait
+                    wait = limiter.try_acquire(priority)
+            finally:
+                limiter.remove_waiter(priority)
+        if waited and self.metrics is not None:
+            self.metrics.rate_limited(priority, waited)
+        if self.logtiming:
+            _LOGGER.warning("rate limited for %f sec", waited)
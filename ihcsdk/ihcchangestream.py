@@ -0,0 +1,196 @@
+"""
+Stream the resource value changes of a controller.
+
+A change stream gets the changes from each notify poll as one batch of
+(resourceid, value, timestamp) tuples, where the timestamp is the time.time()
+the poll returned. The batches are kept in a bounded queue, and can be consumed
+with a generator or with async for. When the queue is full the overflow policy
+is used: OVERFLOW_BLOCK makes the notify thread wait for the consumer, so the
+changes stay queued on the controller, OVERFLOW_DROP_OLDEST drops the oldest
+batch, and OVERFLOW_COALESCE merges the changes into the last queued batch, which
+keeps only the latest change of each resource.
+"""
+
+import asyncio
+import logging
+import threading
+from collections import deque
+from collections.abc import AsyncIterator, Callable, Iterable, Iterator
+from typing import Any
+
+from ihcsdk.ihcdispatcher import (
+    OVERFLOW_BLOCK,
+    OVERFLOW_COALESCE,
+    OVERFLOW_DROP_OLDEST,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+Change = tuple[int, Any, float]
+
+
+class IHCChangeStream:
+    """A bounded stream of the change batches, see IHCController.change_stream."""
+
+    def __init__(
+        self,
+        resourceids: Iterable[int] | None = None,
+        maxsize: int = 100,
+        overflow: str = OVERFLOW_BLOCK,
+        on_close: Callable[["IHCChangeStream"], None] | None = None,
+    ) -> None:
+        """
+        Initialize the stream.
+
+        Only the changes for the resourceids are streamed, or all the changes if
+        None. maxsize is the number of queued batches.
+        """
+        if overflow not in (OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_COALESCE):
+            msg = f"Unknown overflow policy {overflow}"
+            raise ValueError(msg)
+        self.resourceids = None if resourceids is None else frozenset(resourceids)
+        self.maxsize = maxsize
+        self.overflow = overflow
+        # Number of changes dropped or replaced because the stream was full
+        self.dropped = 0
+        self.closed = False
+        self._on_close = on_close
+        self._batches: deque[list[Change]] = deque()
+        self._condition = threading.Condition()
+        # The futures of the async consumers waiting for a batch
+        self._waiters: list[tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    def __len__(self) -> int:
+        """Return the number of queued batches."""
+        return len(self._batches)
+
+    def __enter__(self) -> "IHCChangeStream":  # noqa: PYI034
+        """Use the stream as a context manager that closes it."""
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        """Close the stream."""
+        self.close()
+
+    def put(self, changes: Iterable[tuple[int, Any]], timestamp: float) -> None:
+        """Queue the changes from a poll as one batch, called by the notify thread."""
+        ids = self.resourceids
+        batch = [
+            (resourceid, value, timestamp)
+            for resourceid, value in changes
+            if ids is None or resourceid in ids
+        ]
+        if not batch:
+            return
+        with self._condition:
+            while len(self._batches) >= self.maxsize and not self.closed:
+                if self.overflow == OVERFLOW_DROP_OLDEST:
+                    self.dropped += len(self._batches.popleft())
+                    _LOGGER.debug("Change stream is full, dropped the oldest batch")
+                elif self.overflow == OVERFLOW_COALESCE:
+                    self._batches[-1] = self._merge(self._batches[-1], batch)
+                    self._wake()
+                    return
+                else:
+                    self._condition.wait()
+            if self.closed:
+                return
+            self._batches.append(batch)
+            self._wake()
+
+    def _merge(self, batch: list[Change], changes: list[Change]) -> list[Change]:
+        """Merge the changes into a batch, the replaced changes are dropped."""
+        merged = {change[0]: change for change in batch}
+        for change in changes:
+            if merged.pop(change[0], None) is not None:
+                self.dropped += 1
+            merged[change[0]] = change
+        return list(merged.values())
+
+    def _wake(self) -> None:
+        """Wake the consumers, with the condition held."""
+        self._condition.notify_all()
+        for loop, future in self._waiters:
+            loop.call_soon_threadsafe(_set_done, future)
+        self._waiters.clear()
+
+    def get(self, block: bool = True, timeout: float | None = None) -> list | None:
+        """
+        Get the next batch of changes.
+
+        Return None if the stream is closed and empty, or if no batch arrived
+        within the timeout (or at once if not block).
+        """
+        with self._condition:
+            if block and not self._condition.wait_for(
+                lambda: self._batches or self.closed, timeout
+            ):
+                return None
+            if not self._batches:
+                return None
+            batch = self._batches.popleft()
+            self._condition.notify_all()
+            return batch
+
+    def batches(self, timeout: float | None = None) -> Iterator[list[Change]]:
+        """
+        Iterate the batches of changes.
+
+        The iteration ends when the stream is closed, or if no changes are
+        received within the timeout.
+        """
+        while True:
+            batch = self.get(timeout=timeout)
+            if batch is None:
+                return
+            yield batch
+
+    def __iter__(self) -> Iterator[Change]:
+        """Iterate the changes until the stream is closed."""
+        for batch in self.batches():
+            yield from batch
+
+    async def async_get(self) -> list | None:
+        """Wait for the next batch without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._condition:
+                if self._batches:
+                    batch = self._batches.popleft()
+                    self._condition.notify_all()
+                    return batch
+                if self.closed:
+                    return None
+                future = loop.create_future()
+                self._waiters.append((loop, future))
+            await future
+
+    async def async_batches(self) -> AsyncIterator[list[Change]]:
+        """Iterate the batches of changes until the stream is closed."""
+        while True:
+            batch = await self.async_get()
+            if batch is None:
+                return
+            yield batch
+
+    async def __aiter__(self) -> AsyncIterator[Change]:
+        """Iterate the changes with async for until the stream is closed."""
+        async for batch in self.async_batches():
+            for change in batch:
+                yield change
+
+    def close(self) -> None:
+        """Close the stream, the queued batches are still returned."""
+        with self._condition:
+            if self.closed:
+                return
+            self.closed = True
+            self._wake()
+        if self._on_close is not None:
+            self._on_close(self)
+
+
+def _set_done(future: asyncio.Future) -> None:
+    """Wake an async consumer, in its event loop."""
+    if not future.done():
+        future.set_result(None)
@@ -3,17 +3,44 @@
 # pylint: disable=bare-except
 import base64
 import datetime
-import io
+import time
 import xml.etree.ElementTree as ET
 import zlib
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, ClassVar, Literal
 
-from ihcsdk.ihcconnection import IHCConnection
+from ihcsdk import ihcpayload
+from ihcsdk.ihccoalescer import IHCReadBatcher, IHCSingleFlight
+from ihcsdk.ihcconnection import ERROR_AUTH, IHCConnection
+from ihcsdk.ihcdecoder import decode_resource_values, decode_value
+from ihcsdk.ihcratelimiter import PRIORITY_BULK, PRIORITY_READ, PRIORITY_WRITE
 from ihcsdk.ihcsslconnection import IHCSSLConnection
 
 IHCSTATE_READY = "text.ctrl.state.ready"
 
 
+class IHCProjectParser:
+    """Decompress and parse the compressed project data as the chunks arrive."""
+
+    def __init__(self, events: tuple[str, ...] = ("end",)) -> None:
+        """Initialize the parser for the (event, element) parse events."""
+        self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self._parser = ET.XMLPullParser(events)
+
+    def feed(self, chunk: bytes) -> Iterator[tuple[str, ET.Element]]:
+        """Feed a chunk of the compressed data and return the new parse events."""
+        self._parser.feed(self._decompressor.decompress(chunk).decode("ISO-8859-1"))
+        return self._parser.read_events()
+
+    def close(self) -> Iterator[tuple[str, ET.Element]]:
+        """End the data and return the last parse events."""
+        self._parser.feed(self._decompressor.flush().decode("ISO-8859-1"))
+        self._parser.close()
+        return self._parser.read_events()
+
+
 class IHCSoapClient:
     """Implements a limited set of the soap request for the IHC controller."""
 
@@ -33,6 +60,13 @@ class IHCSoapClient:
             self.connection = IHCSSLConnection(url)
         else:
             self.connection = IHCConnection(url)
+        # Concurrent identical reads share one request, and concurrent
+        # get_runtime_value calls are folded into getResourceValues requests
+        self.coalesce = True
+        self.inflight = IHCSingleFlight(self.connection)
+        self.read_batcher = IHCReadBatcher(
+            self._get_runtime_value, self.get_runtime_values, self.connection
+        )
 
     def close(self) -> None:
         """Close the connection."""
@@ -49,14 +83,7 @@ class IHCSoapClient:
         self.username = username
         self.password = password
 
-        auth_payload = """<authenticate1 xmlns=\"utcs\"
-                          xmlns:i=\"http://www.w3.org/2001/XMLSchema-instance\">
-                          <password>{password}</password>
-                          <username>{username}</username>
-                          <application>treeview</application>
-                          </authenticate1>"""
-        payload = auth_payload.format(password=self.password, username=self.username)
-
+        payload = ihcpayload.authenticate(username, password)
         xdoc = self.connection.soap_action(
             "/ws/AuthenticationService", "authenticate", payload
         )
@@ -65,11 +92,21 @@ class IHCSoapClient:
                 "./SOAP-ENV:Body/ns1:authenticate2/ns1:loginWasSuccessful",
                 IHCSoapClient.ihcns,
             )
-            return isok.text == "true"
+            if isok.text != "true":
+                self.connection.last_error = ERROR_AUTH
+                return False
+            self.connection.authenticated_at = time.monotonic()
+            return True
         return False
 
     def get_state(self) -> str:
         """Get the controller state."""
+        if self.coalesce:
+            return self.inflight.call("getState", self._get_state)
+        return self._get_state()
+
+    def _get_state(self) -> str:
+        """Do the getState request."""
         xdoc = self.connection.soap_action("/ws/ControllerService", "getState", "")
         if xdoc is not False:
             return xdoc.find(
@@ -79,16 +116,12 @@ class IHCSoapClient:
 
     def wait_for_state_change(self, state: str, waitsec: int) -> str:
         """Wait for controller state change and return state."""
-        payload = f"""<ns1:waitForControllerStateChange1
-                     xmlns:ns1=\"utcs\" xsi:type=\"ns1:WSControllerState\">
-                     <ns1:state xsi:type=\"xsd:string\">{state}</ns1:state>
-                     </ns1:waitForControllerStateChange1>
-                     <ns2:waitForControllerStateChange2
-                     xmlns:ns2=\"utcs\" xsi:type=\"xsd:int\">
-                     {waitsec}</ns2:waitForControllerStateChange2>
-                     """
+        payload = ihcpayload.wait_for_state_change(state, waitsec)
         xdoc = self.connection.soap_action(
-            "/ws/ControllerService", "waitForControllerStateChange", payload
+            "/ws/ControllerService",
+            "waitForControllerStateChange",
+            payload,
+            longpoll=True,
         )
         if xdoc is not False:
             return xdoc.find(
@@ -104,41 +137,125 @@ class IHCSoapClient:
         You should use the get_project_in_segments to get the project in multiple
         segments. This will stress the IHC controller less.
         """
-        xdoc = self.connection.soap_action("/ws/ControllerService", "getIHCProject", "")
+        data = self.get_project_data()
+        if data is False:
+            return False
+        return IHCSoapClient.decompress_project(data)
+
+    def get_project_data(self) -> bytes | Literal[False]:
+        """Get the compressed ihc project data in single SOAP action."""
+        xdoc = self.connection.soap_action(
+            "/ws/ControllerService", "getIHCProject", "", PRIORITY_BULK
+        )
         if xdoc is not False:
             base64data = xdoc.find(
                 "./SOAP-ENV:Body/ns1:getIHCProject1/ns1:data", IHCSoapClient.ihcns
             ).text
-            if not base64:
+            if not base64data:
                 return False
-            compresseddata = base64.b64decode(base64data)
-            return zlib.decompress(compresseddata, 16 + zlib.MAX_WBITS).decode(
-                "ISO-8859-1"
-            )
+            return base64.b64decode(base64data)
         return False
 
-    def get_project_in_segments(self, info: dict[str, Any] | None = None) -> str:
+    def get_project_in_segments(
+        self, info: dict[str, Any] | None = None, max_workers: int = 1
+    ) -> str:
         """
         Get the ihc project per segments.
 
         Param: info .. reuse existing project info.
         If not provided, the get_project_info() is called internally.
+        Param: max_workers .. number of segments to download concurrently.
+        """
+        data = self.get_project_data_in_segments(info, max_workers)
+        if data is False:
+            return False
+        return IHCSoapClient.decompress_project(data)
+
+    def get_project_data_in_segments(
+        self, info: dict[str, Any] | None = None, max_workers: int = 1
+    ) -> bytes | Literal[False]:
+        """
+        Get the compressed ihc project data per segments.
+
+        With max_workers above 1 the segments are downloaded concurrently,
+        but never more than max_workers requests at a time.
+        """
+        try:
+            return b"".join(self.iter_project_segments(info, max_workers))
+        except ConnectionError:
+            return False
+
+    def iter_project_segments(
+        self, info: dict[str, Any] | None = None, max_workers: int = 1
+    ) -> Iterator[bytes]:
+        """
+        Yield the compressed ihc project segments in order as they arrive.
+
+        With max_workers above 1 the next segments are downloaded concurrently.
+        Raise ConnectionError if the project or a segment can not be downloaded.
         """
         if info is None:
             info = self.get_project_info()
-        if info:
-            project_major = info.get("projectMajorRevision", 0)
-            project_minor = info.get("projectMinorRevision", 0)
-            buffer = io.BytesIO()
-            for s in range(self.get_project_number_of_segments()):
-                segment = self.get_project_segment(s, project_major, project_minor)
+        if not info:
+            msg = "Unable to get the ihc project info"
+            raise ConnectionError(msg)
+        project_major = info.get("projectMajorRevision", 0)
+        project_minor = info.get("projectMinorRevision", 0)
+        segments = self.get_project_number_of_segments()
+        if segments is False:
+            msg = "Unable to get the number of ihc project segments"
+            raise ConnectionError(msg)
+        with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as executor:
+            pending = deque()
+            nextsegment = 0
+            while nextsegment < segments or pending:
+                while nextsegment < segments and len(pending) < max(max_workers, 1):
+                    pending.append(
+                        executor.submit(
+                            self.get_project_segment,
+                            nextsegment,
+                            project_major,
+                            project_minor,
+                        )
+                    )
+                    nextsegment += 1
+                segment = pending.popleft().result()
                 if segment is False:
-                    return False
-                buffer.write(segment)
-            return zlib.decompress(buffer.getvalue(), 16 + zlib.MAX_WBITS).decode(
-                "ISO-8859-1"
-            )
-        return False
+                    msg = "Unable to get ihc project segment"
+                    raise ConnectionError(msg)
+                yield segment
+
+    def iter_project(
+        self,
+        info: dict[str, Any] | None = None,
+        max_workers: int = 1,
+        events: tuple[str, ...] = ("end",),
+    ) -> Iterator[tuple[str, ET.Element]]:
+        """
+        Download, decompress and parse the ihc project incrementally.
+
+        Yield the (event, element) parse events while the segments arrive, so the
+        complete project is never kept in memory. Call clear() on the elements
+        when they have been handled to keep the memory use low.
+        """
+        return IHCSoapClient.parse_project_stream(
+            self.iter_project_segments(info, max_workers), events
+        )
+
+    @staticmethod
+    def parse_project_stream(
+        chunks: Iterable[bytes], events: tuple[str, ...] = ("end",)
+    ) -> Iterator[tuple[str, ET.Element]]:
+        """Decompress and parse the compressed project data chunks incrementally."""
+        parser = IHCProjectParser(events)
+        for chunk in chunks:
+            yield from parser.feed(chunk)
+        yield from parser.close()
+
+    @staticmethod
+    def decompress_project(compresseddata: bytes) -> str:
+        """Decompress the gzipped project data."""
+        return zlib.decompress(compresseddata, 16 + zlib.MAX_WBITS).decode("ISO-8859-1")
 
     def get_project_info(self) -> dict[str, Any]:
         """Return dictionary of project info items."""
@@ -151,7 +268,7 @@ class IHCSoapClient:
             if elem is not None:
                 for e in list(elem):
                     name = e.tag.split("}")[-1]
-                    info[name] = IHCSoapClient.__get_value(e)
+                    info[name] = decode_value(e)
             return info
         return False
 
@@ -181,135 +298,51 @@ class IHCSoapClient:
         should be fetched. That is, to make sure that you suddenly don't get segments
         belonging to another project.
         """
-        payload = f"""
-            <getIHCProjectSegment1 xmlns="utcs">{segment}</getIHCProjectSegment1>
-            <getIHCProjectSegment2 xmlns="utcs">{project_major}</getIHCProjectSegment2>
-            <getIHCProjectSegment3 xmlns="utcs">{project_minor}</getIHCProjectSegment3>
-            """
+        payload = ihcpayload.get_project_segment(segment, project_major, project_minor)
         xdoc = self.connection.soap_action(
-            "/ws/ControllerService", "getIHCProjectSegment", payload
+            "/ws/ControllerService", "getIHCProjectSegment", payload, PRIORITY_BULK
         )
         if xdoc is not False:
             base64data = xdoc.find(
                 "./SOAP-ENV:Body/ns1:getIHCProjectSegment4/ns1:data",
                 IHCSoapClient.ihcns,
             ).text
-            if not base64:
+            if not base64data:
                 return False
             return base64.b64decode(base64data)
         return False
 
     def set_runtime_value_bool(self, resourceid: int, value: bool) -> bool:
         """Set a boolean runtime value."""
-        boolvalue = "true" if value else "false"
-        payload = f"""
-            <setResourceValue1 xmlns=\"utcs\"
-            xmlns:i=\"http://www.w3.org/2001/XMLSchema-instance\">
-            <value i:type=\"a:WSBooleanValue\" xmlns:a=\"utcs.values\">
-            <a:value>{boolvalue}</a:value></value>
-            <typeString/>
-            <resourceID>{resourceid}</resourceID>
-            <isValueRuntime>true</isValueRuntime>
-            </setResourceValue1>
-            """
-        xdoc = self.connection.soap_action(
-            "/ws/ResourceInteractionService", "setResourceValue", payload
-        )
-        if xdoc is not False:
-            result = xdoc.find(
-                r"./SOAP-ENV:Body/ns1:setResourceValue2", IHCSoapClient.ihcns
-            ).text
-            return result == "true"
-        return False
+        return self._set_resource_value(resourceid, ihcpayload.bool_value(value))
 
     def set_runtime_value_int(self, resourceid: int, intvalue: int) -> bool:
         """Set a integer runtime value."""
-        payload = f"""
-            <setResourceValue1 xmlns=\"utcs\"
-            xmlns:i=\"http://www.w3.org/2001/XMLSchema-instance\">
-            <value i:type=\"a:WSIntegerValue\" xmlns:a=\"utcs.values\">
-            <a:integer>{intvalue}</a:integer></value>
-            <typeString/>
-            <resourceID>{resourceid}</resourceID>
-            <isValueRuntime>true</isValueRuntime>
-            </setResourceValue1>
-            """
-        xdoc = self.connection.soap_action(
-            "/ws/ResourceInteractionService", "setResourceValue", payload
-        )
-        if xdoc is not False:
-            result = xdoc.find(
-                "./SOAP-ENV:Body/ns1:setResourceValue2", IHCSoapClient.ihcns
-            ).text
-            return result == "true"
-        return False
+        return self._set_resource_value(resourceid, ihcpayload.int_value(intvalue))
 
     def set_runtime_value_float(self, resourceid: int, floatvalue: float) -> bool:
         """Set a flot runtime value."""
-        payload = f"""
-            <setResourceValue1 xmlns=\"utcs\"
-            xmlns:i=\"http://www.w3.org/2001/XMLSchema-instance\">
-            <value i:type=\"a:WSFloatingPointValue\" xmlns:a=\"utcs.values\">
-            <a:floatingPointValue>{floatvalue}</a:floatingPointValue></value>
-            <typeString/>
-            <resourceID>{resourceid}</resourceID>
-            <isValueRuntime>true</isValueRuntime>
-            </setResourceValue1>
-            </s:Body>
-            """
-        xdoc = self.connection.soap_action(
-            "/ws/ResourceInteractionService", "setResourceValue", payload
-        )
-        if xdoc is not False:
-            result = xdoc.find(
-                "./SOAP-ENV:Body/ns1:setResourceValue2", IHCSoapClient.ihcns
-            ).text
-            return result == "true"
-        return False
+        return self._set_resource_value(resourceid, ihcpayload.float_value(floatvalue))
 
     def set_runtime_value_timer(self, resourceid: int, timer: int) -> bool:
         """Set a timer runtime value in milliseconds."""
-        payload = f"""
-            <setResourceValue1 xmlns=\"utcs\"
-            xmlns:i=\"http://www.w3.org/2001/XMLSchema-instance\">
-            <value i:type=\"a:WSTimerValue\" xmlns:a=\"utcs.values\">
-            <a:milliseconds>{timer}</a:milliseconds></value>
-            <typeString/>
-            <resourceID>{resourceid}</resourceID>
-            <isValueRuntime>true</isValueRuntime>
-            </setResourceValue1>
-            </s:Body>
-            """
-        xdoc = self.connection.soap_action(
-            "/ws/ResourceInteractionService", "setResourceValue", payload
-        )
-        if xdoc is not False:
-            result = xdoc.find(
-                "./SOAP-ENV:Body/ns1:setResourceValue2", IHCSoapClient.ihcns
-            ).text
-            return result == "true"
-        return False
+        return self._set_resource_value(resourceid, ihcpayload.timer_value(timer))
 
     def set_runtime_value_time(
         self, resourceid: int, hours: int, minutes: int, seconds: int
     ) -> bool:
         """Set a time runtime value in hours:minutes:seconds."""
-        payload = f"""
-            <setResourceValue1 xmlns=\"utcs\"
-            xmlns:i=\"http://www.w3.org/2001/XMLSchema-instance\">
-            <value i:type=\"a:WSTimeValue\" xmlns:a=\"utcs.values\">
-            <a:hours>{hours}</a:hours>
-            <a:minutes>{minutes}</a:minutes>
-            <a:seconds>{seconds}</a:seconds>
-            </value>
-            <typeString/>
-            <resourceID>{resourceid}</resourceID>
-            <isValueRuntime>true</isValueRuntime>
-            </setResourceValue1>
-            </s:Body>
-            """
+        return self._set_resource_value(
+            resourceid, ihcpayload.time_value(hours, minutes, seconds)
+        )
+
+    def _set_resource_value(self, resourceid: int, valueelement: str) -> bool:
+        """Set a runtime value from the xml value element."""
         xdoc = self.connection.soap_action(
-            "/ws/ResourceInteractionService", "setResourceValue", payload
+            "/ws/ResourceInteractionService",
+            "setResourceValue",
+            ihcpayload.set_resource_value(resourceid, valueelement),
+            PRIORITY_WRITE,
         )
         if xdoc is not False:
             result = xdoc.find(
@@ -318,81 +351,6 @@ class IHCSoapClient:
             return result == "true"
         return False
 
-    @staticmethod
-    def _get_time(resource_value: ET.Element) -> datetime.time:
-        hours = int(resource_value.find("./ns2:hours", IHCSoapClient.ihcns).text)
-        minutes = int(resource_value.find("./ns2:minutes", IHCSoapClient.ihcns).text)
-        seconds = int(resource_value.find("./ns2:seconds", IHCSoapClient.ihcns).text)
-
-        return datetime.time(hours, minutes, seconds)
-
-    @staticmethod
-    def _get_datetime(resource_value: ET.Element) -> datetime.datetime:
-        year = int(resource_value.find("./ns1:year", IHCSoapClient.ihcns).text)
-        month = int(
-            resource_value.find("./ns1:monthWithJanuaryAsOne", IHCSoapClient.ihcns).text
-        )
-        day = int(resource_value.find("./ns1:day", IHCSoapClient.ihcns).text)
-        hours = int(resource_value.find("./ns1:hours", IHCSoapClient.ihcns).text)
-        minutes = int(resource_value.find("./ns1:minutes", IHCSoapClient.ihcns).text)
-        seconds = int(resource_value.find("./ns1:seconds", IHCSoapClient.ihcns).text)
-        return datetime.datetime(year, month, day, hours, minutes, seconds)  # noqa: DTZ001
-
-    @staticmethod
-    def _get_date(resource_value: ET.Element) -> datetime.datetime:
-        year = int(resource_value.find("./ns2:year", IHCSoapClient.ihcns).text)
-        if year == 0:
-            year = datetime.datetime.today().year  # noqa: DTZ002
-        month = int(resource_value.find("./ns2:month", IHCSoapClient.ihcns).text)
-        day = int(resource_value.find("./ns2:day", IHCSoapClient.ihcns).text)
-        return datetime.datetime(year, month, day)  # noqa: DTZ001
-
-    @staticmethod
-    def __get_value(
-        resource_value: ET.Element,
-    ) -> bool | int | float | str | datetime.datetime | None:
-        """Get a runtime value from the xml base on the type in the xml."""
-        if resource_value is None:
-            return None
-        valuetype = resource_value.attrib[
-            "{http://www.w3.org/2001/XMLSchema-instance}type"
-        ].split(":")[1]
-        result = resource_value.text
-        match valuetype:
-            case "WSBooleanValue":
-                result = (
-                    resource_value.find("./ns2:value", IHCSoapClient.ihcns).text
-                    == "true"
-                )
-            case "WSIntegerValue":
-                result = int(
-                    resource_value.find("./ns2:integer", IHCSoapClient.ihcns).text
-                )
-            case "WSFloatingPointValue":
-                result = round(
-                    float(
-                        resource_value.find(
-                            "./ns2:floatingPointValue", IHCSoapClient.ihcns
-                        ).text
-                    ),
-                    2,
-                )
-            case "WSEnumValue":
-                result = resource_value.find("./ns2:enumName", IHCSoapClient.ihcns).text
-            case "WSTimerValue":
-                return int(
-                    resource_value.find("./ns2:milliseconds", IHCSoapClient.ihcns).text
-                )
-            case "WSTimeValue":
-                result = IHCSoapClient._get_time(resource_value)
-            case "WSDate":
-                result = IHCSoapClient._get_datetime(resource_value)
-            case "WSDateValue":
-                result = IHCSoapClient._get_date(resource_value)
-            case "int":
-                result = int(resource_value.text)
-        return result
-
     def get_runtime_value(
         self, resourceid: int
     ) -> bool | int | float | str | datetime.datetime | None:
@@ -402,8 +360,15 @@ class IHCSoapClient:
         The returned value will be boolean, integer or float
         Return None if resource cannot be found or on error
         """
-        payload = f"""<getRuntimeValue1 xmlns="utcs">{resourceid}</getRuntimeValue1>
-                  """
+        if self.coalesce:
+            return self.read_batcher.read(resourceid)
+        return self._get_runtime_value(resourceid)
+
+    def _get_runtime_value(
+        self, resourceid: int
+    ) -> bool | int | float | str | datetime.datetime | None:
+        """Do the getResourceValue request."""
+        payload = ihcpayload.get_runtime_value(resourceid)
         xdoc = self.connection.soap_action(
             "/ws/ResourceInteractionService", "getResourceValue", payload
         )
@@ -412,38 +377,28 @@ class IHCSoapClient:
         value = xdoc.find(
             "./SOAP-ENV:Body/ns1:getRuntimeValue2/ns1:value", IHCSoapClient.ihcns
         )
-        return IHCSoapClient.__get_value(value)
+        return decode_value(value)
 
     def get_runtime_values(
-        self, resourceids: list[int]
+        self, resourceids: list[int], priority: int = PRIORITY_READ
     ) -> dict[int, Any] | Literal[False]:
         """
         Get runtime values of specified resource ids.
 
+        The priority is used by the rate limiter of the connection.
         Return None if resource cannot be found or on error
         """
-        idsarr = ""
-        for ihcid in resourceids:
-            idsarr += f"<arrayItem>{ihcid}</arrayItem>"
-        payload = '<getRuntimeValues1 xmlns="utcs">' + idsarr + "</getRuntimeValues1>"
-        xdoc = self.connection.soap_action(
-            "/ws/ResourceInteractionService", "getResourceValues", payload
+        payload = ihcpayload.get_runtime_values(resourceids)
+        items = self.connection.soap_action_items(
+            "/ws/ResourceInteractionService",
+            "getResourceValues",
+            payload,
+            "{utcs}arrayItem",
+            priority,
         )
-        if xdoc is False:
+        if items is False:
             return False
-        result = xdoc.findall(
-            "./SOAP-ENV:Body/ns1:getRuntimeValues2/ns1:arrayItem", IHCSoapClient.ihcns
-        )
-        changes = {}
-        for item in result:
-            ihcid = item.find("ns1:resourceID", IHCSoapClient.ihcns)
-            if ihcid is None:
-                continue
-            resource_value = item.find("./ns1:value", IHCSoapClient.ihcns)
-            item_value = IHCSoapClient.__get_value(resource_value)
-            if item_value is not None:
-                changes[int(ihcid.text)] = item_value
-        return changes
+        return dict(decode_resource_values(items))
 
     def cycle_bool_value(self, resourceid: int) -> bool | None:
         """
@@ -451,45 +406,75 @@ class IHCSoapClient:
 
         Return None if resource cannot be found or on error
         """
-        set_bool = (
-            "<arrayItem>"
-            '<value xsi:type="ns1:WSBooleanValue">'
-            "<ns1:value>{value}</ns1:value>"
-            "</value>"
-            "<typeString></typeString>"
-            "<resourceID>{id}</resourceID>"
-            "<isValueRuntime>true</isValueRuntime>"
-            "</arrayItem>"
-        )
-        payload = (
-            '<setResourceValues1 xmlns="utcs" xmlns:ns1="utcs.values">'
-            + set_bool.format(value="true", id=resourceid)
-            + set_bool.format(value="false", id=resourceid)
-            + "</setResourceValues1>"
+        payload = ihcpayload.set_resource_values(
+            [(resourceid, True), (resourceid, False)]
         )
         xdoc = self.connection.soap_action(
-            "/ws/ResourceInteractionService", "SOAPAction: setResourceValues", payload
+            "/ws/ResourceInteractionService",
+            "SOAPAction: setResourceValues",
+            payload,
+            PRIORITY_WRITE,
         )
         if xdoc is False:
             return None
         return True
 
+    def set_runtime_values(
+        self, values: dict[int, Any], chunksize: int = 100
+    ) -> dict[int, bool]:
+        """
+        Set multiple runtime values using the setResourceValues request.
+
+        The values can be mixed types. The IHC type is selected from the python type:
+        bool, int, float, datetime.timedelta (timer) and datetime.time (time).
+        Large batches are split in requests with at most chunksize values.
+        Return a dictionary with the result for each resource id.
+        """
+        result = {}
+        items = list(values.items())
+        for start in range(0, len(items), chunksize):
+            chunk = items[start : start + chunksize]
+            xdoc = self.connection.soap_action(
+                "/ws/ResourceInteractionService",
+                "setResourceValues",
+                ihcpayload.set_resource_values(chunk),
+                PRIORITY_WRITE,
+            )
+            result.update(IHCSoapClient._get_set_resource_values_result(xdoc, chunk))
+        return result
+
+    @staticmethod
+    def _get_set_resource_values_result(
+        xdoc: ET.Element | Literal[False], items: list[tuple[int, Any]]
+    ) -> dict[int, bool]:
+        """Get the result for each resource id from a setResourceValues response."""
+        resourceids = [resourceid for resourceid, _ in items]
+        if xdoc is False:
+            return dict.fromkeys(resourceids, False)
+        response = xdoc.find(
+            "./SOAP-ENV:Body/ns1:setResourceValues2", IHCSoapClient.ihcns
+        )
+        if response is None:
+            return dict.fromkeys(resourceids, False)
+        results = response.findall("ns1:arrayItem", IHCSoapClient.ihcns)
+        if not results:
+            # A single result for all the items
+            return dict.fromkeys(resourceids, (response.text or "").strip() == "true")
+        if len(results) != len(items):
+            # The results can not be matched with the items
+            return dict.fromkeys(resourceids, False)
+        return {
+            resourceid: result.text == "true"
+            for (resourceid, _), result in zip(items, results, strict=True)
+        }
+
     def enable_runtime_notification(self, resourceid: int) -> bool:
         """Enable notification for specified resource id."""
         return self.enable_runtime_notifications([resourceid])
 
     def enable_runtime_notifications(self, resourceids: list[int]) -> bool:
         """Enable notification for specified resource ids."""
-        idsarr = ""
-        for ihcid in resourceids:
-            idsarr += f"<a:arrayItem>{ihcid}</a:arrayItem>"
-
-        payload = f"""<enableRuntimeValueNotifications1 xmlns=\"utcs\"
-                     xmlns:a=\"http://www.w3.org/2001/XMLSchema\"
-                     xmlns:i=\"http://www.w3.org/2001/XMLSchema-instance\">
-                     {idsarr}
-                     </enableRuntimeValueNotifications1>
-                     """
+        payload = ihcpayload.enable_runtime_notifications(resourceids)
         xdoc = self.connection.soap_action(
             "/ws/ResourceInteractionService", "enableRuntimeValueNotifications", payload
         )
@@ -509,44 +494,32 @@ class IHCSoapClient:
         return dict(change_list)
 
     def wait_for_resource_value_change_list(
-        self, wait: int = 10
+        self, wait: int = 10, timeout: float | None = None
     ) -> list[(int, Any)] | Literal[False]:
         """
         Long polling for changes.
 
         And return a resource id dictionary with a list of all changes since last poll.
         Return a list of tuples with the id,value
+        The poll fails if there is no response within timeout seconds, like when
+        the connection is stalled.
         """
-        changes = []
-        payload = f"""<waitForResourceValueChanges1
-                     xmlns=\"utcs\">{wait}</waitForResourceValueChanges1>
-                  """
-        xdoc = self.connection.soap_action(
-            "/ws/ResourceInteractionService", "getResourceValue", payload
+        payload = ihcpayload.wait_for_resource_value_changes(wait)
+        items = self.connection.soap_action_items(
+            "/ws/ResourceInteractionService",
+            "getResourceValue",
+            payload,
+            "{utcs}arrayItem",
+            longpoll=True,
+            timeout=timeout,
         )
-        if xdoc is False:
+        if items is False:
             return False
-        result = xdoc.findall(
-            "./SOAP-ENV:Body/ns1:waitForResourceValueChanges2/ns1:arrayItem",
-            IHCSoapClient.ihcns,
-        )
-        for item in result:
-            ihcid = item.find("ns1:resourceID", IHCSoapClient.ihcns)
-            if ihcid is None:
-                continue
-
-            resource_value = item.find("./ns1:value", IHCSoapClient.ihcns)
-            value = IHCSoapClient.__get_value(resource_value)
-            if value is not None:
-                changes.append((int(ihcid.text), value))
-        return changes
+        return decode_resource_values(items)
 
     def get_user_log(self, language: str = "da") -> str | Literal[False]:
         """Get the controller state."""
-        payload = f"""<getUserLog1 xmlns="utcs" />
-                     <getUserLog2 xmlns="utcs">0</getUserLog2>
-                     <getUserLog3 xmlns="utcs">{language}</getUserLog3>
-                     """
+        payload = ihcpayload.get_user_log(language)
         xdoc = self.connection.soap_action(
             "/ws/ConfigurationService", "getUserLog", payload
         )
@@ -570,6 +543,11 @@ class IHCSoapClient:
         )
         if xdoc is False:
             return False
+        return IHCSoapClient._get_system_info(xdoc)
+
+    @staticmethod
+    def _get_system_info(xdoc: ET.Element) -> dict[str, str]:
+        """Get the system info dictionary from the getSystemInfo response."""
         return {
             "uptime": IHCSoapClient._extract_sysinfo(xdoc, "uptime"),
             "realtimeclock": IHCSoapClient._extract_sysinfo(xdoc, "realtimeclock"),
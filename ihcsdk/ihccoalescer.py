@@ -0,0 +1,156 @@
+"""
+Coalesce the concurrent read requests of a client.
+
+IHCSingleFlight lets concurrent identical requests share one request in flight.
+IHCReadBatcher folds the concurrent single resource reads into one
+getResourceValues request: a read is sent at once when no read is in flight, and
+the reads that arrive while it is in flight are sent together when it is done,
+so a read without contention is not delayed.
+
+The error classification of a connection (last_error) is kept per thread, so the
+shared result carries the error of the request, and it is set in the thread of
+each caller that gets the result.
+"""
+
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Any, Literal
+
+if TYPE_CHECKING:
+    from ihcsdk.ihcconnection import IHCConnectionBase
+
+
+class IHCSingleFlight:
+    """Share the result of a request in flight with the identical requests."""
+
+    def __init__(self, connection: "IHCConnectionBase | None" = None) -> None:
+        """Initialize with no requests in flight, sharing last_error of connection."""
+        self.connection = connection
+        self._inflight: dict[Any, Future] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Return the number of requests in flight."""
+        return len(self._inflight)
+
+    def call(self, key: Any, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Call func, or wait for the call in flight with the same key.
+
+        The callers of a shared call get the same result and last_error, or the
+        same exception.
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                future = self._inflight[key] = Future()
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            result, error = future.result()
+            _set_error(self.connection, error)
+            return result
+        try:
+            result = func(*args)
+        except BaseException as exc:
+            self._done(key)
+            future.set_exception(exc)
+            raise
+        # A call after this starts a new request
+        self._done(key)
+        future.set_result((result, _get_error(self.connection)))
+        return result
+
+    def _done(self, key: Any) -> None:
+        """Remove a call from the calls in flight."""
+        with self._lock:
+            del self._inflight[key]
+
+
+class IHCReadBatcher:
+    """Fold the concurrent single resource reads into batched reads."""
+
+    def __init__(
+        self,
+        read_one: Callable[[int], Any],
+        read_many: Callable[[list[int]], dict[int, Any] | Literal[False]],
+        connection: "IHCConnectionBase | None" = None,
+    ) -> None:
+        """
+        Initialize the batcher.
+
+        read_one reads a resource and returns None on error, read_many reads the
+        resources and returns a dictionary or False on error. The last_error of
+        the connection is set for each read from the request it was sent in.
+        """
+        self.read_one = read_one
+        self.read_many = read_many
+        self.connection = connection
+        # Seconds to wait for more reads before a batch is sent (0 sends at once)
+        self.window = 0.0
+        # Maximum number of resources in a batch
+        self.maxsize = 500
+        # Number of reads that were sent in a batch with other reads
+        self.batched = 0
+        self._pending: dict[int, Future] = {}
+        self._busy = False
+        self._condition = threading.Condition()
+
+    def read(self, resourceid: int) -> Any:
+        """Read a resource, None on error."""
+        with self._condition:
+            future = self._pending.get(resourceid)
+            if future is None:
+                future = self._pending[resourceid] = Future()
+        while True:
+            with self._condition:
+                while self._busy and not future.done():
+                    self._condition.wait()
+                if future.done():
+                    value, error = future.result()
+                    _set_error(self.connection, error)
+                    return value
+                self._busy = True
+            try:
+                self._send()
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
+
+    def _send(self) -> None:
+        """Send the pending reads as one request, with the busy flag set."""
+        if self.window > 0:
+            time.sleep(self.window)
+        with self._condition:
+            resourceids = list(self._pending)[: self.maxsize]
+            batch = {
+                resourceid: self._pending.pop(resourceid) for resourceid in resourceids
+            }
+        try:
+            if len(resourceids) == 1:
+                values = {resourceids[0]: self.read_one(resourceids[0])}
+            else:
+                self.batched += len(resourceids)
+                values = self.read_many(resourceids) or {}
+        except BaseException as exc:
+            for future in batch.values():
+                future.set_exception(exc)
+            raise
+        error = _get_error(self.connection)
+        for resourceid, future in batch.items():
+            future.set_result((values.get(resourceid), error))
+
+
+def _get_error(connection: "IHCConnectionBase | None") -> str | None:
+    """Get the last error of the connection in this thread."""
+    return None if connection is None else connection.last_error
+
+
+def _set_error(connection: "IHCConnectionBase | None", error: str | None) -> None:
+    """Set the last error of the connection in this thread."""
+    if connection is not None:
+        connection.last_error = error
@@ -1,107 +1,419 @@
 """Implements soap reqeust using the "requests" module."""
 
+import contextvars
 import logging
+import re
 import time
 import xml.etree.ElementTree as ET
 from http import HTTPStatus
-from typing import Literal
+from typing import TYPE_CHECKING, Literal
 from urllib.parse import urlparse
 
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util import Retry
 
+from ihcsdk.ihcparser import IHCParser, get_parser
+from ihcsdk.ihcratelimiter import PRIORITY_READ, IHCRateLimiter
+
+if TYPE_CHECKING:
+    from ihcsdk.ihcmetrics import IHCMetrics
+
 _LOGGER = logging.getLogger(__name__)
 
+# The classification of a failed request, see IHCConnection.last_error
+# The session is not authenticated (or expired)
+ERROR_AUTH = "auth"
+# The controller could not be reached or the connection failed
+ERROR_TRANSPORT = "transport"
+# No response within the timeout, like a stalled long poll
+ERROR_TIMEOUT = "timeout"
+# The controller returned a soap fault
+ERROR_FAULT = "fault"
+# The response could not be parsed
+ERROR_PARSE = "parse"
+# The controller returned another http error status
+ERROR_HTTP = "http"
 
-class IHCConnection:
-    """Implements a http connection to the controller."""
+FAULTSTRING = re.compile(rb"<(?:\w+:)?faultstring[^>]*>(.*?)<", re.DOTALL)
+AUTH_FAULTS = re.compile(
+    rb"authenticat|session|login|logged|unauthori|denied", re.IGNORECASE
+)
+
+
+def classify_error(status: int, body: bytes) -> str:
+    """Classify a http error response from the controller."""
+    if status in (HTTPStatus.UNAUTHORIZED, HTTPStatus.FORBIDDEN):
+        return ERROR_AUTH
+    fault = FAULTSTRING.search(body)
+    if fault is None:
+        return ERROR_HTTP
+    if AUTH_FAULTS.search(fault.group(1)):
+        return ERROR_AUTH
+    return ERROR_FAULT
 
-    soapenvelope = """<?xml version=\"1.0\" encoding=\"UTF-8\"?>
-        <s:Envelope xmlns:s=\"http://schemas.xmlsoap.org/soap/envelope/\"
-          xmlns:xsd=\"http://www.w3.org/2001/XMLSchema\"
-          xmlns:xsi=\"http://www.w3.org/2001/XMLSchema-instance\">
-        <s:Body>{body}</s:Body></s:Envelope>"""
+
+class IHCConnectionBase:
+    """
+    The state and failure handling shared by the connections.
+
+    The subclasses implement the transport with _post and rate_limit.
+    """
+
+    # The soap envelope before and after the payload body
+    envelope_prefix = (
+        b'<?xml version="1.0" encoding="UTF-8"?>'
+        b'<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/"'
+        b' xmlns:xsd="http://www.w3.org/2001/XMLSchema"'
+        b' xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"><s:Body>'
+    )
+    envelope_suffix = b"</s:Body></s:Envelope>"
+    # The exceptions of the transport that are a timeout
+    timeout_errors: tuple[type[BaseException], ...] = ()
 
     def __init__(self, url: str) -> None:
-        """Initialize the IHCConnection with a url for the controller."""
+        """Initialize the connection with a url for the controller."""
         self.url = url
-        self.verify = False
+        # The static headers are the same for all requests
+        self.headers = {
+            "Host": urlparse(url).netloc,
+            "Content-Type": "text/xml; charset=UTF-8",
+            "Cache-Control": "no-cache",
+        }
         self.last_exception = None
         self.last_response = None
-        self.session = requests.Session()
+        # The rate limiter for the requests (None will not rate limit). The same
+        # limiter can be shared by several connections to the same controller.
+        self.rate_limiter: IHCRateLimiter | None = None
+        self.logtiming = False
+        # The parser backend for the responses, see ihcparser.get_parser
+        self.parser: IHCParser = get_parser()
+        # Time of the last authentication and of the last successful request
+        self.authenticated_at: float | None = None
+        self.last_request_at: float | None = None
+        # The metrics hooks (None will not record metrics), see ihcmetrics
+        self.metrics: IHCMetrics | None = None
+        # The last error is kept per thread and per asyncio task
+        self._last_error: contextvars.ContextVar[str | None] = contextvars.ContextVar(
+            f"ihc_last_error_{id(self)}", default=None
+        )
+
+    @property
+    def last_error(self) -> str | None:
+        """Classification of the last failed request in this thread or task."""
+        return self._last_error.get()
+
+    @last_error.setter
+    def last_error(self, error: str | None) -> None:
+        """Set the classification of the last request in this thread or task."""
+        self._last_error.set(error)
+
+    def build_request(
+        self, action: str, payloadbody: str
+    ) -> tuple[bytes, dict[str, str]]:
+        """Build the soap envelope and the headers of a request."""
+        payload = b"".join(
+            (self.envelope_prefix, payloadbody.encode("utf-8"), self.envelope_suffix)
+        )
+        headers = {
+            **self.headers,
+            "Content-Length": str(len(payload)),
+            "SOAPAction": action,
+        }
+        return payload, headers
+
+    def failed(self, service: str, action: str, error: str) -> None:
+        """Set the last error and record the failure in the metrics."""
+        self.last_error = error
+        if self.metrics is not None:
+            self.metrics.failure(service, action, error)
+
+    def request_failed(
+        self, service: str, action: str, exp: BaseException, response: object
+    ) -> None:
+        """Classify and record an exception from a request."""
+        self.last_exception = exp
+        if isinstance(exp, self.timeout_errors):
+            _LOGGER.warning("soap request %s timed out", action)
+            self.failed(service, action, ERROR_TIMEOUT)
+        elif isinstance(exp, self.parser.errors):
+            _LOGGER.error("soap request xml parse error", exc_info=exp)
+            self.last_response = response
+            self.failed(service, action, ERROR_PARSE)
+        else:
+            _LOGGER.error("soap request exception", exc_info=exp)
+            self.failed(service, action, ERROR_TRANSPORT)
+
+    def parse_response(self, service: str, action: str, data: bytes) -> ET.Element:
+        """Parse a complete response and record the parse time."""
+        _LOGGER.debug("soap request response %s", data)
+        start = time.perf_counter()
+        xdoc = self.parser.parse(data)
+        if self.metrics is not None:
+            self.metrics.parse(service, action, time.perf_counter() - start)
+        return xdoc
+
+    def session_age(self) -> float | None:
+        """Get the seconds since the last authentication, None if not authenticated."""
+        if self.authenticated_at is None:
+            return None
+        return time.monotonic() - self.authenticated_at
+
+    def idle_time(self) -> float | None:
+        """Get the seconds since the last successful request."""
+        if self.last_request_at is None:
+            return None
+        return time.monotonic() - self.last_request_at
+
+    @property
+    def min_interval(self) -> float:
+        """Minimum time between calls in seconds."""
+        if self.rate_limiter is None or self.rate_limiter.rate <= 0:
+            return 0.0
+        return 1 / self.rate_limiter.rate
+
+    @min_interval.setter
+    def min_interval(self, interval: float) -> None:
+        """Set a rate limiter with the minimum time between calls (0 for none)."""
+        self.rate_limiter = IHCRateLimiter(1 / interval) if interval > 0 else None
+
+
+class IHCConnection(IHCConnectionBase):
+    """Implements a http connection to the controller."""
+
+    timeout_errors = (requests.exceptions.Timeout,)
+
+    def __init__(self, url: str) -> None:
+        """Initialize the IHCConnection with a url for the controller."""
+        super().__init__(url)
+        self.verify = False
         self.retries = Retry(
             total=3,
             backoff_factor=0.2,
             status_forcelist=[502, 503, 504],
             allowed_methods={"POST"},
         )
-        self.session.mount("http://", HTTPAdapter(max_retries=self.retries))
-        # default minimum time between calls in seconds (0 will not rate limit)
-        self.min_interval: float = 0.0
-        self.last_call_time: float = 0
-        self.logtiming = False
+        # Size of the keep-alive pool for the request/response calls, and if a
+        # call should wait for a free connection instead of opening a new one.
+        self.pool_maxsize = 4
+        self.pool_block = False
+        self.session = requests.Session()
+        # The long polling requests use their own session and connection, so they
+        # don't hold a connection from the pool. The sessions share the cookies.
+        self.longpoll_session = requests.Session()
+        self.longpoll_session.cookies = self.session.cookies
+        self.mount_adapters()
+        # The item responses larger than this in bytes are parsed while they are
+        # received to save memory, smaller responses are parsed at once, which
+        # is faster (None will never stream)
+        self.stream_size: int | None = 4 * 1024 * 1024
+        # Size of the chunks parsed while receiving a streamed response
+        self.chunk_size = 16384
+
+    def set_pool_size(self, maxsize: int, block: bool = False) -> None:
+        """
+        Set the keep-alive pool size for the request/response calls.
+
+        The connections of the previous pool are closed when they are released.
+        """
+        self.pool_maxsize = maxsize
+        self.pool_block = block
+        self.mount(self.session, self.create_adapter(maxsize, block))
+
+    def mount_adapters(self) -> None:
+        """Mount the http adapters on the request and the long polling sessions."""
+        self.mount(
+            self.session, self.create_adapter(self.pool_maxsize, self.pool_block)
+        )
+        self.mount(
+            self.longpoll_session, self.create_adapter(1, block=False, longpoll=True)
+        )
+
+    def mount(self, session: requests.Session, adapter: HTTPAdapter) -> None:
+        """Mount the adapter for the controller and close the adapter it replaces."""
+        prefix = urlparse(self.url).scheme + "://"
+        previous = session.adapters.get(prefix)
+        session.mount(prefix, adapter)
+        if previous is not None:
+            previous.close()
+
+    def create_adapter(
+        self, maxsize: int, block: bool, *, longpoll: bool = False
+    ) -> HTTPAdapter:
+        """
+        Create a http adapter with a connection pool of maxsize.
+
+        A failed read of a long poll is not retried, the notify loop will poll
+        again, so a stalled poll is detected after a single timeout.
+        """
+        return HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=maxsize,
+            pool_block=block,
+            max_retries=self.retries.new(read=False) if longpoll else self.retries,
+        )
 
     def close(self) -> None:
         """Close the connection."""
         self.session.close()
         self.session = None
+        self.longpoll_session.close()
+        self.longpoll_session = None
 
     def cert_verify(self) -> str | None:
         """Validate the certificate and return the cert file."""
         return None
 
-    def soap_action(
-        self, service: str, action: str, payloadbody: str
+    def soap_action(  # noqa: PLR0913
+        self,
+        service: str,
+        action: str,
+        payloadbody: str,
+        priority: int = PRIORITY_READ,
+        *,
+        longpoll: bool = False,
+        timeout: float | None = None,
     ) -> ET.Element | Literal[False]:
-        """Do a soap request."""
-        payload = self.soapenvelope.format(body=payloadbody).encode("utf-8")
-        headers = {
-            "Host": urlparse(self.url).netloc,
-            "Content-Type": "text/xml; charset=UTF-8",
-            "Cache-Control": "no-cache",
-            "Content-Length": str(len(payload)),
-            "SOAPAction": action,
-        }
+        """
+        Do a soap request.
+
+        Set longpoll for the requests that wait for a change on the controller, they
+        are send on the long polling session. The request fails if no response is
+        received within timeout seconds (None will wait forever).
+        """
+        response = None
         try:
-            self.rate_limit()
-            _LOGGER.debug("soap payload %s", payload)
-            self.last_exception = None
-            response = self.session.post(
-                url=self.url + service,
-                headers=headers,
-                data=payload,
-                verify=self.cert_verify(),
+            response = self._post(
+                service,
+                action,
+                payloadbody,
+                priority,
+                longpoll=longpoll,
+                timeout=timeout,
             )
-            _LOGGER.debug("soap request response status %d", response.status_code)
-            if response.status_code != HTTPStatus.OK:
-                self.last_response = response
+            if response is False:
                 return False
-            _LOGGER.debug("soap request response %s", response.text)
-            xdoc = ET.fromstring(response.text)  # noqa: S314
+            xdoc = self.parse_response(service, action, response.content)
             if xdoc is None:
                 return False
-        except requests.exceptions.RequestException as exp:
-            _LOGGER.exception("soap request exception")
-            self.last_exception = exp
-        except ET.ParseError as exp:
-            _LOGGER.exception("soap request xml parse erro")
-            self.last_exception = exp
-            self.last_response = response
+        except (requests.exceptions.RequestException, *self.parser.errors) as exp:
+            self.request_failed(service, action, exp, response)
         else:
             return xdoc
         return False
 
-    def rate_limit(self) -> None:
-        """Rate limit the calls to this function."""
-        current_time: float = time.time()
-        time_since_last_call: float = current_time - self.last_call_time
+    def soap_action_items(  # noqa: PLR0913
+        self,
+        service: str,
+        action: str,
+        payloadbody: str,
+        tag: str,
+        priority: int = PRIORITY_READ,
+        *,
+        longpoll: bool = False,
+        timeout: float | None = None,
+    ) -> list[ET.Element] | Literal[False]:
+        """
+        Do a soap request and return the elements with the tag from the response.
+
+        A response larger than stream_size is parsed while it is received and
+        only the elements with the tag are kept, the rest of the response tree is
+        not build.
+        """
+        response = None
+        try:
+            response = self._post(
+                service,
+                action,
+                payloadbody,
+                priority,
+                longpoll=longpoll,
+                stream=True,
+                timeout=timeout,
+            )
+            if response is False:
+                return False
+            with response:
+                start = time.perf_counter()
+                if self.streamed(response):
+                    items = list(
+                        self.parser.iter_items(
+                            response.iter_content(self.chunk_size), tag
+                        )
+                    )
+                else:
+                    items = self.parser.find_items(response.content, tag)
+                if self.metrics is not None:
+                    self.metrics.parse(service, action, time.perf_counter() - start)
+                return items
+        except (requests.exceptions.RequestException, *self.parser.errors) as exp:
+            self.request_failed(service, action, exp, response)
+        return False
+
+    def streamed(self, response: requests.Response) -> bool:
+        """Return True if the response should be parsed while it is received."""
+        length = response.headers.get("Content-Length")
+        return (
+            self.stream_size is not None
+            and length is not None
+            and int(length) > self.stream_size
+        )
+
+    def _post(  # noqa: PLR0913
+        self,
+        service: str,
+        action: str,
+        payloadbody: str,
+        priority: int = PRIORITY_READ,
+        *,
+        longpoll: bool = False,
+        stream: bool = False,
+        timeout: float | None = None,
+    ) -> requests.Response | Literal[False]:
+        """Post the soap request and return the response if the status is OK."""
+        payload, headers = self.build_request(action, payloadbody)
+        self.rate_limit(priority)
+        _LOGGER.debug("soap payload %s", payload)
+        self.last_exception = None
+        self.last_error = None
+        session = self.longpoll_session if longpoll else self.session
+        start = time.perf_counter()
+        response = session.post(
+            url=self.url + service,
+            headers=headers,
+            data=payload,
+            verify=self.cert_verify(),
+            stream=stream,
+            timeout=timeout,
+        )
+        _LOGGER.debug("soap request response status %d", response.status_code)
+        if self.metrics is not None:
+            self.metrics.request(
+                service,
+                action,
+                time.perf_counter() - start,
+                sent=len(payload),
+                received=int(response.headers.get("Content-Length", 0)),
+                retries=len(response.raw.retries.history)
+                if response.raw.retries
+                else 0,
+            )
+        if response.status_code != HTTPStatus.OK:
+            self.last_response = response
+            self.failed(
+                service, action, classify_error(response.status_code, response.content)
+            )
+            response.close()
+            return False
+        self.last_request_at = time.monotonic()
+        return response
+
+    def rate_limit(self, priority: int = PRIORITY_READ) -> None:
+        """Wait for the rate limiter before a request with the priority."""
+        if self.rate_limiter is None:
+            return
+        waited = self.rate_limiter.acquire(priority)
+        if waited and self.metrics is not None:
+            self.metrics.rate_limited(priority, waited)
         if self.logtiming:
-            _LOGGER.warning("time since last call %f sec", time_since_last_call)
-        # If not enough time has passed, sleep for the remaining time
-        if time_since_last_call < self.min_interval:
-            sleep_time: float = self.min_interval - time_since_last_call
-            _LOGGER.debug("Ratelimiting for %f sec", sleep_time)
-            time.sleep(sleep_time)
-        # Update the last call time and call the function
-        self.last_call_time = time.time()
+            _LOGGER.warning("rate limited for %f sec", waited)
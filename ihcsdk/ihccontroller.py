@@ -6,16 +6,41 @@ Notify thread to handle change notifications
 
 # pylint: disable=invalid-name, bare-except, too-many-instance-attributes
 import logging
+import random
 import threading
 import time
 from collections.abc import Callable
-from datetime import datetime, timedelta
+from datetime import datetime
 from http import HTTPStatus
-from typing import Any, Literal
+from typing import TYPE_CHECKING, Any, Literal
 
 import requests
 
+from ihcsdk.ihcchangestream import IHCChangeStream
 from ihcsdk.ihcclient import IHCSTATE_READY, IHCSoapClient
+from ihcsdk.ihcconnection import (
+    ERROR_AUTH,
+    ERROR_HTTP,
+    ERROR_TIMEOUT,
+    ERROR_TRANSPORT,
+)
+from ihcsdk.ihcdispatcher import (
+    OVERFLOW_BLOCK,
+    IHCCoalescingDispatcher,
+    IHCCountCallback,
+    IHCDispatcher,
+    IHCThreadDispatcher,
+)
+from ihcsdk.ihcpollscheduler import IHCPollScheduler
+from ihcsdk.ihcproject import IHCProject
+from ihcsdk.ihcsubscriptions import IHCSubscriptions
+from ihcsdk.ihcvaluecache import IHCValueCache
+
+if TYPE_CHECKING:
+    from ihcsdk.ihccontrollergroup import IHCControllerGroup
+    from ihcsdk.ihclongpoll import IHCLongPollTuner
+    from ihcsdk.ihcmetrics import IHCMetrics
+    from ihcsdk.ihcprojectcache import IHCProjectCache
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -27,21 +52,78 @@ class IHCController:
     will re-authenticate if needed.
     """
 
-    _mutex = threading.Lock()
-
     def __init__(self, url: str, username: str, password: str) -> None:
         """Initialize the IHC controller with connection data."""
         self.client = IHCSoapClient(url)
+        # Locks for the session (authentication), the notify subscriptions and
+        # the project, so callers don't wait for unrelated work
+        self._session_lock = threading.Lock()
+        self._subscription_lock = threading.Lock()
+        self._project_lock = threading.Lock()
+        # Only one thread re-authenticates, the others wait for the result
+        self._reauth_condition = threading.Condition()
+        self._reauthenticating = False
+        self._reauth_result = False
+        self._reauth_failed_until = 0.0
+        # Set to cancel the waiting between the authentication retries
+        self._reauth_cancel = threading.Event()
+        # Set to stop the waiting of the notify thread between the retries
+        self._notify_stop = threading.Event()
+        self._notify_attempt = 0
         self.reauthenticatetimeout = 30
+        # The retries wait with exponential backoff and jitter, from
+        # retryinitial up to retryinterval seconds
+        self.retryinitial = 0.5
         self.retryinterval = 10
+        # Why the last re-authentication failed, None if it succeeded
+        self.auth_error: str | None = None
+        # Re-authenticate before a request if the session is older, or has been
+        # idle longer, than this in seconds (None will not check)
+        self.session_max_age: float | None = None
+        self.session_max_idle: float | None = None
+        # The request errors that are retried after re-authentication
+        self.reauthenticate_errors = {
+            ERROR_AUTH,
+            ERROR_TRANSPORT,
+            ERROR_TIMEOUT,
+            ERROR_HTTP,
+        }
         self._username = username
         self._password = password
-        self._ihcevents = {}
+        # The notify callbacks by resource id
+        self.subscriptions = IHCSubscriptions()
+        # Maximum number of resource ids in a enableRuntimeValueNotifications request
+        self.enable_chunksize = 500
         self._ihcvalues = {}
         self._notifythread = threading.Thread(target=self._notify_fn)
         self._notifyrunning = False
-        self._newnotifyids = []
         self._project = None
+        self._projectmodel: IHCProject | None = None
+        # The compressed project, so the project and the model share a download
+        self._project_data: bytes | None = None
+        # Set a IHCProjectCache to load an unchanged project from disk
+        self.project_cache: IHCProjectCache | None = None
+        # Number of project segments to download concurrently
+        self.segment_workers = 4
+        # The dispatcher that runs the notify callbacks. If not set when the
+        # notify thread starts, a IHCThreadDispatcher with one worker is used.
+        self.dispatcher: IHCDispatcher | None = None
+        # Coalesce the changes for a resource in this window in seconds, and only
+        # notify the latest value (0 will notify every change)
+        self.coalesce_window: float = 0.0
+        # Cache of the runtime values, updated by the notifications and reads
+        self.value_cache = IHCValueCache()
+        # The group that runs the notifications, see IHCControllerGroup
+        self.group: IHCControllerGroup | None = None
+        # Set a IHCLongPollTuner to adapt the wait and the read timeout of the
+        # notify long polls (None polls with a 10 second wait and no timeout)
+        self.longpoll: IHCLongPollTuner | None = None
+        # The open change streams, replaced when a stream is opened or closed so
+        # the notify thread can use it without a lock
+        self._streams: tuple[IHCChangeStream, ...] = ()
+        # Polls the resources that are not notified, and shares the reads in
+        # flight between the callers of get_runtime_values
+        self.poll_scheduler = IHCPollScheduler(self)
 
     @staticmethod
     def is_ihc_controller(url: str) -> bool:
@@ -63,179 +145,583 @@ class IHCController:
 
     def authenticate(self) -> bool:
         """Authenticate and enable the registered notifications."""
-        with IHCController._mutex:
+        with self._session_lock:
             _LOGGER.debug("Authenticating login on ihc controller")
             if not self.client.authenticate(self._username, self._password):
                 _LOGGER.debug("Authentication failed")
                 return False
             _LOGGER.debug("Authentication was successful")
-            if self._ihcevents:
-                self.client.enable_runtime_notifications(self._ihcevents.keys())
+            self.subscriptions.take_pending()
+            self._enable_notifications(self.subscriptions.resourceids())
             return True
 
+    def _enable_notifications(self, resourceids: list[int]) -> bool:
+        """
+        Enable the notifications in chunked requests.
+
+        If a request fails, the resources are enabled later by the notify thread.
+        """
+        for chunk in IHCSubscriptions.chunks(resourceids, self.enable_chunksize):
+            if not self.client.enable_runtime_notifications(chunk):
+                self.subscriptions.set_pending(resourceids)
+                return False
+        return True
+
+    @property
+    def metrics(self) -> "IHCMetrics | None":
+        """The metrics hooks for the requests, the notify polls and the callbacks."""
+        return self.client.connection.metrics
+
+    @metrics.setter
+    def metrics(self, metrics: "IHCMetrics | None") -> None:
+        """Set the metrics hooks, None will not record metrics."""
+        self.client.connection.metrics = metrics
+        self._set_dispatcher_metrics()
+
+    def _set_dispatcher_metrics(self) -> None:
+        """Set the metrics on the dispatcher for the dispatch lag."""
+        dispatcher = self.dispatcher
+        if isinstance(dispatcher, IHCCoalescingDispatcher):
+            dispatcher = dispatcher.target
+        if dispatcher is not None:
+            dispatcher.metrics = self.metrics
+
     def disconnect(self) -> None:
         """Disconnect by stopping the notification thread. And closing the client."""
-        self._notifyrunning = False
+        self.cancel_notify()
+        self.poll_scheduler.stop()
         # wait for notify thread to finish
         while self._notifythread.is_alive():
             time.sleep(0.1)  # Optional sleep to prevent busy waiting
+        if self.group is not None:
+            self.group.stop_notify(self)
+        if self.dispatcher is not None and (
+            self.group is None or self.dispatcher is not self.group.dispatcher
+        ):
+            self.dispatcher.close()
         self.client.close()
 
+    def cancel_notify(self) -> None:
+        """
+        Tell the notifications to stop, without waiting for them.
+
+        The long poll in progress still runs until it returns, disconnect waits
+        for it.
+        """
+        self._notifyrunning = False
+        self._notify_stop.set()
+        self._reauth_cancel.set()
+        # End the streams, a blocked notify thread continues
+        for stream in self._streams:
+            stream.close()
+
+    def _check_session(self) -> None:
+        """Re-authenticate before a request if the session is too old or idle."""
+        connection = self.client.connection
+        age = connection.session_age()
+        if age is None:
+            return
+        idle = connection.idle_time()
+        if (self.session_max_age is not None and age > self.session_max_age) or (
+            self.session_max_idle is not None
+            and idle is not None
+            and idle > self.session_max_idle
+        ):
+            _LOGGER.debug("Re-authenticating before the session expires")
+            self.re_authenticate()
+
+    def _call(self, func: Callable[..., Any], *args: Any, failed: Any = False) -> Any:
+        """
+        Call a client method with re-authenticate if needed.
+
+        The call is only done again if it failed (returned failed) in a way that a
+        new authentication can fix, see reauthenticate_errors.
+        """
+        self._check_session()
+        result = func(*args)
+        if (
+            result is failed
+            and self.client.connection.last_error in self.reauthenticate_errors
+            and self.re_authenticate()
+        ):
+            result = func(*args)
+        return result
+
     def get_runtime_value(
-        self, ihcid: int
+        self, ihcid: int, max_age: float | None = None
     ) -> bool | int | float | str | datetime | None:
-        """Get runtime value with re-authenticate if needed."""
-        value = self.client.get_runtime_value(ihcid)
-        if value is not None:
-            return value
-        self.re_authenticate()
-        return self.client.get_runtime_value(ihcid)
+        """
+        Get runtime value with re-authenticate if needed.
 
-    def get_runtime_values(self, ihcids: list[int]) -> dict[int, Any] | Literal[False]:
-        """Get runtime value with re-authenticate if needed."""
-        value = self.client.get_runtime_values(ihcids)
+        The value of a resource with a notify event is read from the value cache.
+        Other values are read from the cache if they are not older than max_age
+        seconds.
+        """
+        value = self.value_cache.get(ihcid, max_age)
         if value is not None:
             return value
-        self.re_authenticate()
-        return self.client.get_runtime_values(ihcids)
+        value = self._call(self.client.get_runtime_value, ihcid, failed=None)
+        if value is not None:
+            self.value_cache.update(ihcid, value)
+        return value
+
+    def get_runtime_values(
+        self, ihcids: list[int], max_age: float | None = None
+    ) -> dict[int, Any] | Literal[False]:
+        """
+        Get runtime values with re-authenticate if needed.
+
+        Only the values that are not in the value cache are read from the
+        controller, see get_runtime_value. The values that are being read by
+        another caller or the poll scheduler are not requested again.
+        """
+        result = {}
+        missing = []
+        for ihcid in ihcids:
+            value = self.value_cache.get(ihcid, max_age)
+            if value is None:
+                missing.append(ihcid)
+            else:
+                result[ihcid] = value
+        if not missing:
+            return result
+        values = self.poll_scheduler.fetch(missing)
+        if values is False:
+            return False
+        result.update(values)
+        return result
 
     def cycle_bool_value(self, resourceid: int) -> bool | None:
         """Turn a booelan resource On and back Off."""
-        value = self.client.cycle_bool_value(resourceid)
-        if value is not None:
-            return value
-        self.re_authenticate()
-        return self.client.cycle_bool_value(resourceid)
+        self.value_cache.invalidate((resourceid,))
+        return self._call(self.client.cycle_bool_value, resourceid, failed=None)
 
     def set_runtime_value_bool(self, ihcid: int, value: bool) -> bool:
         """Set bool runtime value with re-authenticate if needed."""
-        if self.client.set_runtime_value_bool(ihcid, value):
-            return True
-        self.re_authenticate()
-        return self.client.set_runtime_value_bool(ihcid, value)
+        self.value_cache.invalidate((ihcid,))
+        return self._call(self.client.set_runtime_value_bool, ihcid, value)
 
     def set_runtime_value_int(self, ihcid: int, value: int) -> bool:
         """Set integer runtime value with re-authenticate if needed."""
-        if self.client.set_runtime_value_int(ihcid, value):
-            return True
-        self.re_authenticate()
-        return self.client.set_runtime_value_int(ihcid, value)
+        self.value_cache.invalidate((ihcid,))
+        return self._call(self.client.set_runtime_value_int, ihcid, value)
 
     def set_runtime_value_float(self, ihcid: int, value: float) -> bool:
         """Set float runtime value with re-authenticate if needed."""
-        if self.client.set_runtime_value_float(ihcid, value):
-            return True
-        self.re_authenticate()
-        return self.client.set_runtime_value_float(ihcid, value)
+        self.value_cache.invalidate((ihcid,))
+        return self._call(self.client.set_runtime_value_float, ihcid, value)
 
     def set_runtime_value_timer(self, ihcid: int, value: int) -> bool:
         """Set timer runtime value with re-authenticate if needed."""
-        if self.client.set_runtime_value_timer(ihcid, value):
-            return True
-        self.re_authenticate()
-        return self.client.set_runtime_value_timer(ihcid, value)
+        self.value_cache.invalidate((ihcid,))
+        return self._call(self.client.set_runtime_value_timer, ihcid, value)
 
     def set_runtime_value_time(
         self, ihcid: int, hours: int, minutes: int, seconds: int
     ) -> bool:
         """Set time runtime value with re-authenticate if needed."""
-        if self.client.set_runtime_value_time(ihcid, hours, minutes, seconds):
-            return True
-        self.re_authenticate()
-        return self.client.set_runtime_value_time(ihcid, hours, minutes, seconds)
+        self.value_cache.invalidate((ihcid,))
+        return self._call(
+            self.client.set_runtime_value_time, ihcid, hours, minutes, seconds
+        )
+
+    def set_runtime_values(self, values: dict[int, Any]) -> dict[int, bool]:
+        """
+        Set multiple runtime values in batched requests.
+
+        Failed values are set again after re-authenticate, if that can fix it.
+        Return a dictionary with the result for each resource id.
+        """
+        self.value_cache.invalidate(values)
+        self._check_session()
+        result = self.client.set_runtime_values(values)
+        failed = {ihcid: values[ihcid] for ihcid, ok in result.items() if not ok}
+        if (
+            not failed
+            or self.client.connection.last_error not in self.reauthenticate_errors
+            or not self.re_authenticate()
+        ):
+            return result
+        result.update(self.client.set_runtime_values(failed))
+        return result
 
     def get_project(self, insegments: bool = True) -> str:
         """Get the ihc project and make sure controller is ready before."""
-        with IHCController._mutex:
+        with self._project_lock:
             if self._project is None:
-                if self.client.get_state() != IHCSTATE_READY:
-                    ready = self.client.wait_for_state_change(IHCSTATE_READY, 10)
-                    if ready != IHCSTATE_READY:
-                        return None
-                if insegments:
-                    self._project = self.client.get_project_in_segments()
-                else:
-                    self._project = self.client.get_project()
+                data = self._load_project_data(insegments)
+                if not data:
+                    return data
+                self._project = IHCSoapClient.decompress_project(data)
         return self._project
 
+    def get_project_model(self, insegments: bool = True) -> IHCProject | None:
+        """
+        Get the indexed ihc project model.
+
+        The model is build once and cached with the controller. If the project has
+        not been decompressed, it is parsed incrementally from the compressed data,
+        which is kept for get_project.
+        """
+        with self._project_lock:
+            if self._projectmodel is None:
+                if self._project is not None:
+                    self._projectmodel = IHCProject.from_string(self._project)
+                    return self._projectmodel
+                data = self._load_project_data(insegments)
+                if not data:
+                    return None
+                self._projectmodel = IHCProject.from_events(
+                    IHCSoapClient.parse_project_stream([data], ("start", "end"))
+                )
+        return self._projectmodel
+
+    def _load_project_data(self, insegments: bool) -> bytes | Literal[False] | None:
+        """
+        Get the compressed project, downloaded once, with the project lock held.
+
+        Wait for the controller to be ready before the download, and return None
+        if it is not.
+        """
+        if self._project_data is not None:
+            return self._project_data
+        if self.client.get_state() != IHCSTATE_READY:
+            ready = self.client.wait_for_state_change(IHCSTATE_READY, 10)
+            if ready != IHCSTATE_READY:
+                return None
+        data = self._get_project_data(insegments)
+        if data is not False:
+            self._project_data = data
+        return data
+
+    def _get_project_data(self, insegments: bool) -> bytes | Literal[False]:
+        """Get the compressed project from the project cache or the controller."""
+        if self.project_cache is None:
+            if insegments:
+                return self.client.get_project_data_in_segments(
+                    max_workers=self.segment_workers
+                )
+            return self.client.get_project_data()
+        info = self.client.get_project_info()
+        if not info:
+            return False
+        data = self.project_cache.load(self.client.url, info)
+        if data is not None:
+            _LOGGER.debug("Using cached ihc project")
+            return data
+        if insegments:
+            data = self.client.get_project_data_in_segments(
+                info, max_workers=self.segment_workers
+            )
+        else:
+            data = self.client.get_project_data()
+        if data is not False:
+            self.project_cache.save(self.client.url, info, data)
+        return data
+
     def add_notify_event(
         self,
         resourceid: int,
         callback: Callable[[int, bool | float | str | datetime], None],
         delayed: bool = False,
+        with_count: bool = False,
     ) -> bool:
         """
         Add a notify callback for a specified resource id.
 
         If delayed is set to true the enable request will be send from the
         notofication thread
+        If with_count is set to true the callback is called with a third argument,
+        the number of changes coalesced into the value (see coalesce_window).
         """
-        with IHCController._mutex:
-            if resourceid in self._ihcevents:
-                self._ihcevents[resourceid].append(callback)
-            else:
-                self._ihcevents[resourceid] = [callback]
-                if delayed:
-                    self._newnotifyids.append(resourceid)
-                elif not self.client.enable_runtime_notification(resourceid):
-                    return False
+        return self.add_notify_events([resourceid], callback, delayed, with_count)
+
+    def add_notify_events(
+        self,
+        resourceids: list[int],
+        callback: Callable[[int, bool | float | str | datetime], None],
+        delayed: bool = False,
+        with_count: bool = False,
+    ) -> bool:
+        """
+        Add a notify callback for the resource ids.
+
+        The new resources are enabled in one (chunked) request, or by the
+        notification thread if delayed is set to true. See add_notify_event.
+        """
+        if with_count:
+            callback = IHCCountCallback(callback)
+        with self._subscription_lock:
+            for resourceid in resourceids:
+                self.subscriptions.add(resourceid, callback)
+            self.value_cache.subscribe(resourceids)
+            if not delayed and not self._enable_notifications(
+                self.subscriptions.take_pending()
+            ):
+                return False
             if not self._notifyrunning:
-                self._notifyrunning = True
-                self._notifythread.start()
+                self._start_notify()
+
+            return True
+
+    def remove_notify_event(
+        self,
+        resourceid: int,
+        callback: Callable[[int, bool | float | str | datetime], None] | None = None,
+    ) -> bool:
+        """
+        Remove a notify callback, or all the callbacks if None, for a resource id.
 
+        The controller will still send the changes for the resource until the next
+        authentication, they are ignored.
+        Return True if the resource has no callbacks left.
+        """
+        with self._subscription_lock:
+            if callback is not None and callback not in (
+                self.subscriptions.get(resourceid) or ()
+            ):
+                callback = IHCCountCallback(callback)
+            if not self.subscriptions.remove(resourceid, callback):
+                return False
+            self.value_cache.unsubscribe((resourceid,))
+            self._ihcvalues.pop(resourceid, None)
+            if self.dispatcher is not None:
+                self.dispatcher.forget(resourceid)
             return True
 
+    def change_stream(
+        self,
+        resourceids: list[int] | None = None,
+        maxsize: int = 100,
+        overflow: str = OVERFLOW_BLOCK,
+    ) -> IHCChangeStream:
+        """
+        Open a stream of the changes for the resource ids.
+
+        The notifications for the resource ids are enabled like add_notify_events.
+        If resourceids is None all the notified changes are streamed. Each poll is
+        streamed as one batch of (resourceid, value, timestamp) changes, see
+        IHCChangeStream for the overflow policies. Close the stream when done.
+        """
+        stream = IHCChangeStream(resourceids, maxsize, overflow, self._close_stream)
+        with self._subscription_lock:
+            if stream.resourceids is not None:
+                self.subscriptions.watch(stream.resourceids)
+                self.value_cache.subscribe(stream.resourceids)
+                self._enable_notifications(self.subscriptions.take_pending())
+            self._streams = (*self._streams, stream)
+            if not self._notifyrunning:
+                self._start_notify()
+        return stream
+
+    def _close_stream(self, stream: IHCChangeStream) -> None:
+        """Remove a closed change stream."""
+        with self._subscription_lock:
+            self._streams = tuple(s for s in self._streams if s is not stream)
+            if stream.resourceids is None:
+                return
+            removed = self.subscriptions.unwatch(stream.resourceids)
+            self.value_cache.unsubscribe(removed)
+            for resourceid in removed:
+                self._ihcvalues.pop(resourceid, None)
+
+    def _start_notify(self) -> None:
+        """Start the notify thread, or the notifications in the group."""
+        shared = self.group.dispatcher if self.group is not None else None
+        if self.dispatcher is None:
+            self.dispatcher = shared or IHCThreadDispatcher()
+        if self.coalesce_window > 0:
+            self.dispatcher = IHCCoalescingDispatcher(
+                self.dispatcher,
+                self.coalesce_window,
+                close_target=self.dispatcher is not shared,
+            )
+        if self.metrics is not None:
+            self._set_dispatcher_metrics()
+        self._notify_stop.clear()
+        self._notifyrunning = True
+        if self.group is not None:
+            self.group.start_notify(self)
+        else:
+            self._notifythread.start()
+
     def _notify_fn(self) -> None:
         """Notify thread function."""
         _LOGGER.debug("Starting notify thread")
         while self._notifyrunning:
-            try:
-                with IHCController._mutex:
-                    # Are there are any new ids to be added?
-                    if self._newnotifyids:
-                        self.client.enable_runtime_notifications(self._newnotifyids)
-                        self._newnotifyids = []
+            delay = self._notify_step()
+            if delay and self._notifyrunning:
+                self._notify_stop.wait(delay)
 
+    def _notify_step(self) -> float:
+        """
+        Wait for the changes once and dispatch them to the callbacks.
+
+        Return the time to wait before the next step, if the re-authentication
+        failed.
+        """
+        try:
+            with self._subscription_lock:
+                # Are there are any new ids to be added?
+                pending = self.subscriptions.take_pending()
+                if pending:
+                    self._enable_notifications(pending)
+
+            start = time.monotonic()
+            tuner = self.longpoll
+            if tuner is None:
                 changes = self.client.wait_for_resource_value_change_list()
-                if changes is False:
-                    self.re_authenticate(notify=True)
+            else:
+                wait, timeout = tuner.next_poll()
+                changes = self.client.wait_for_resource_value_change_list(wait, timeout)
+                if changes is not False:
+                    tuner.observe(wait, time.monotonic() - start, len(changes))
+                elif (
+                    self.client.connection.last_error == ERROR_TIMEOUT
+                    and tuner.stalled()
+                ):
+                    # Poll again at once, the stalled connection is closed
+                    return 0
+            if changes is False:
+                # The cached values are not updated until we get notifications
+                self.value_cache.clear()
+                return self._notify_reauthenticate()
+            if self.metrics is not None:
+                self.metrics.poll(time.monotonic() - start, len(changes))
+            self.value_cache.update_many(changes)
+            self._stream_changes(changes)
+            if self.group is not None:
+                self.group.add_changes(self, changes)
+            for ihcid, value in changes:
+                callbacks = self.subscriptions.get(ihcid)
+                if callbacks is None:
                     continue
-                for ihcid, value in changes:
-                    if ihcid in self._ihcevents:
-                        for callback in self._ihcevents[ihcid]:
-                            if (
-                                ihcid not in self._ihcvalues
-                                or value != self._ihcvalues[ihcid]
-                            ):
-                                callback(ihcid, value)
-                            self._ihcvalues[ihcid] = value
-            except Exception:
-                _LOGGER.exception("Exception in notify thread")
-                self.re_authenticate(notify=True)
-
-    def re_authenticate(self, notify: bool = False) -> bool:
+                if ihcid not in self._ihcvalues or value != self._ihcvalues[ihcid]:
+                    self.dispatcher.dispatch(ihcid, value, callbacks)
+                self._ihcvalues[ihcid] = value
+        except Exception:
+            _LOGGER.exception("Exception in notify thread")
+            return self._notify_reauthenticate()
+        return 0
+
+    def _stream_changes(self, changes: list) -> None:
+        """Put the changes from a poll in the change streams."""
+        if not self._streams:
+            return
+        timestamp = time.time()
+        for stream in self._streams:
+            stream.put(changes, timestamp)
+
+    def _notify_reauthenticate(self) -> float:
+        """
+        Authenticate from the notify step, and return the time to retry.
+
+        One attempt is made through re_authenticate, so a re-authentication by
+        another thread is shared, and the notify step retries with backoff.
+        """
+        if self.re_authenticate(notify=True, once=True):
+            self._notify_attempt = 0
+            return 0
+        delay = self._backoff(self._notify_attempt)
+        self._notify_attempt += 1
+        _LOGGER.debug(
+            "Authenticate failed, reauthenticating login on ihc controller in %.1fs",
+            delay,
+        )
+        return delay
+
+    def _backoff(self, attempt: int) -> float:
+        """Get the exponential backoff with jitter for the retry attempt."""
+        delay = min(self.retryinterval, self.retryinitial * 2**attempt)
+        return random.uniform(delay / 2, delay)  # noqa: S311
+
+    def cancel_re_authenticate(self) -> None:
+        """Cancel a running re-authentication, it will return False."""
+        self._reauth_cancel.set()
+
+    def re_authenticate(
+        self, notify: bool = False, wait: bool = True, *, once: bool = False
+    ) -> bool:
         """
         Authenticate again after failure.
 
-        Keep trying with 10 sec interval. If called from the notify thread
-        we will not have a timeout, but will end if the notify thread has
-        been cancled.
-        Will return True if authentication was successful.
+        Keep trying with exponential backoff, until reauthenticatetimeout. If
+        called from the notify thread we will not have a timeout, but will end if
+        the notify thread has been cancled. With once set only one attempt is
+        made, and the caller handles the retries.
+        Only one thread re-authenticates. Other callers wait for its result, or
+        return False at once if wait is False. After a failed re-authentication,
+        callers fail fast for retryinterval seconds.
+        Will return True if authentication was successful, otherwise auth_error
+        tells why it failed.
         """
-        timeout = datetime.now() + timedelta(seconds=self.reauthenticatetimeout)  # noqa: DTZ005
+        with self._reauth_condition:
+            if self._reauthenticating:
+                if not wait:
+                    self.auth_error = "re-authentication is in progress"
+                    return False
+                if not self._reauth_condition.wait_for(
+                    lambda: not self._reauthenticating,
+                    timeout=self.reauthenticatetimeout,
+                ):
+                    self.auth_error = "timeout waiting for the re-authentication"
+                    return False
+                return self._reauth_result
+            if not notify and time.monotonic() < self._reauth_failed_until:
+                # Fail fast, the last re-authentication just failed
+                _LOGGER.debug("Not re-authenticating, %s", self.auth_error)
+                return False
+            self._reauthenticating = True
+            self._reauth_cancel.clear()
+        result = False
+        try:
+            result = (
+                self._authenticate_once() if once else self._re_authenticate(notify)
+            )
+        finally:
+            with self._reauth_condition:
+                self._reauthenticating = False
+                self._reauth_result = result
+                if result:
+                    self.auth_error = None
+                else:
+                    self._reauth_failed_until = time.monotonic() + self.retryinterval
+                self._reauth_condition.notify_all()
+        return result
+
+    def _authenticate_once(self) -> bool:
+        """Authenticate once, and set auth_error if it fails."""
+        if self.authenticate():
+            return True
+        self.auth_error = (
+            f"authentication failed ({self.client.connection.last_error} error)"
+        )
+        _LOGGER.debug("Re-authentication failed, %s", self.auth_error)
+        return False
+
+    def _re_authenticate(self, notify: bool) -> bool:
+        """Keep trying to authenticate until it succeeds, times out or is cancled."""
+        deadline = time.monotonic() + self.reauthenticatetimeout
+        attempt = 0
         while True:
             _LOGGER.debug("Reauthenticating login on ihc controller")
             if self.authenticate():
                 return True
-            _LOGGER.debug(
-                "Authenticate failed, reauthenticating login on ihc controller in 10s"
-            )
-
+            delay = self._backoff(attempt)
+            attempt += 1
+            _LOGGER.debug("Authenticate failed, reauthenticating in %.1fs", delay)
             # if called from the notify and notify a cancled we do not want to retry
             if notify:
                 if not self._notifyrunning:
+                    self.auth_error = "the notifications were stopped"
                     return False
-            elif timeout and datetime.now() > timeout:  # noqa: DTZ005
+            elif time.monotonic() + delay > deadline:
+                self.auth_error = (
+                    f"authentication failed for {self.reauthenticatetimeout}s"
+                )
+                _LOGGER.warning("Re-authentication failed, %s", self.auth_error)
                 return False
             # wait before we try to authenticate again
-            time.sleep(self.retryinterval)
+            if self._reauth_cancel.wait(delay):
+                self.auth_error = "the re-authentication was cancelled"
+                return False
@@ -0,0 +1,185 @@
+"""
+Manage the notifications for a group of ihc controllers.
+
+The long polling for all the controllers in the group is done by a shared pool of
+worker threads, the callbacks are run by a shared dispatcher, and the changes from
+all the controllers are available as one stream.
+
+A long poll holds a worker thread for its whole wait, so the group does not use
+fewer threads than a notify thread for each controller. It shares the
+dispatcher, the stream and the closing of the controllers.
+"""
+
+import logging
+import queue
+import threading
+from collections.abc import Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any
+
+from ihcsdk.ihccontroller import IHCController
+from ihcsdk.ihcdispatcher import IHCDispatcher, IHCThreadDispatcher
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class IHCControllerGroup:
+    """A group of ihc controllers sharing the notify threads."""
+
+    def __init__(
+        self,
+        workers: int = 32,
+        dispatcher: IHCDispatcher | None = None,
+        stream_maxsize: int = 10000,
+    ) -> None:
+        """
+        Initialize the group.
+
+        workers is the number of threads for the long polling. It must be at
+        least the number of controllers, or the polls of some controllers wait
+        for a worker and their changes are delayed. If no
+        dispatcher is given a IHCThreadDispatcher with 4 workers is used for the
+        callbacks of all the controllers.
+        """
+        self.controllers: dict[str, IHCController] = {}
+        self.dispatcher = dispatcher or IHCThreadDispatcher(workers=4)
+        self.stream_maxsize = stream_maxsize
+        # Number of changes dropped because the stream was full
+        self.dropped = 0
+        self._names: dict[IHCController, str] = {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="ihc-notify"
+        )
+        self._futures: dict[IHCController, Future] = {}
+        self._timers: dict[IHCController, threading.Timer] = {}
+        self._stream: queue.Queue | None = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def add(self, name: str, url: str, username: str, password: str) -> IHCController:
+        """Create a controller and add it to the group."""
+        controller = IHCController(url, username, password)
+        self.add_controller(name, controller)
+        return controller
+
+    def add_controller(self, name: str, controller: IHCController) -> None:
+        """Add a controller to the group, before notify events are added."""
+        with self._lock:
+            if name in self.controllers:
+                msg = f"A controller with the name {name} is already in the group"
+                raise ValueError(msg)
+            controller.group = self
+            self.controllers[name] = controller
+            self._names[controller] = name
+
+    def remove(self, name: str) -> IHCController | None:
+        """Remove a controller from the group and disconnect it."""
+        with self._lock:
+            controller = self.controllers.pop(name, None)
+        if controller is None:
+            return None
+        controller.disconnect()
+        with self._lock:
+            del self._names[controller]
+        controller.group = None
+        return controller
+
+    def get(self, name: str) -> IHCController | None:
+        """Get a controller by name."""
+        return self.controllers.get(name)
+
+    def authenticate(self) -> dict[str, bool]:
+        """Authenticate all the controllers concurrently."""
+        futures = {
+            name: self._executor.submit(controller.authenticate)
+            for name, controller in list(self.controllers.items())
+        }
+        return {name: future.result() for name, future in futures.items()}
+
+    def start_notify(self, controller: IHCController) -> None:
+        """Start the notifications for a controller, called by the controller."""
+        self._submit(controller)
+
+    def stop_notify(self, controller: IHCController) -> None:
+        """Wait for the notify step of a stopped controller to finish."""
+        with self._lock:
+            timer = self._timers.pop(controller, None)
+            future = self._futures.pop(controller, None)
+        if timer is not None:
+            timer.cancel()
+        if future is not None:
+            future.result()
+
+    def _submit(self, controller: IHCController) -> None:
+        """Run the next notify step for the controller in the pool."""
+        with self._lock:
+            self._timers.pop(controller, None)
+            if self._closed or not controller._notifyrunning:  # noqa: SLF001
+                return
+            future = self._executor.submit(self._step, controller)
+            self._futures[controller] = future
+
+    def _step(self, controller: IHCController) -> None:
+        """Run a notify step and schedule the next one."""
+        delay = controller._notify_step()  # noqa: SLF001
+        if not delay:
+            self._submit(controller)
+            return
+        # Don't hold a worker while waiting to authenticate again
+        timer = threading.Timer(delay, self._submit, (controller,))
+        timer.daemon = True
+        with self._lock:
+            self._timers[controller] = timer
+        timer.start()
+
+    def add_changes(self, controller: IHCController, changes: list) -> None:
+        """Add the changes from a controller to the stream."""
+        stream = self._stream
+        if stream is None or not changes:
+            return
+        try:
+            stream.put_nowait((self._names.get(controller), changes))
+        except queue.Full:
+            self.dropped += len(changes)
+
+    def changes(self, timeout: float | None = None) -> Iterator[tuple[str, int, Any]]:
+        """
+        Iterate the (name, resourceid, value) changes from all the controllers.
+
+        The stream is started by the first call. The iteration ends when the
+        group is closed, or if no changes are received within the timeout.
+        """
+        with self._lock:
+            if self._stream is None:
+                self._stream = queue.Queue(self.stream_maxsize)
+            stream = self._stream
+        while True:
+            try:
+                item = stream.get(timeout=timeout)
+            except queue.Empty:
+                return
+            if item is None:
+                return
+            name, changes = item
+            for resourceid, value in changes:
+                yield name, resourceid, value
+
+    def close(self) -> None:
+        """Disconnect all the controllers and stop the shared threads."""
+        # Stop all the notifications first, so the long polls end together
+        for controller in list(self.controllers.values()):
+            controller.cancel_notify()
+        for name in list(self.controllers):
+            self.remove(name)
+        with self._lock:
+            self._closed = True
+        self._executor.shutdown(wait=True)
+        self.dispatcher.close()
+        if self._stream is not None:
+            # End the iteration, drop the oldest changes if the stream is full
+            while True:
+                try:
+                    self._stream.put_nowait(None)
+                    break
+                except queue.Full:
+                    self._stream.get_nowait()
@@ -0,0 +1,125 @@
+"""
+Decode the runtime values in the soap responses from the ihc controller.
+
+The decoders are selected from the xsi:type attribute and read the child elements
+by their fully qualified tag, so no ElementTree path expressions are evaluated per
+value.
+"""
+
+import datetime
+import xml.etree.ElementTree as ET
+from collections.abc import Callable, Iterable
+from typing import Any
+
+XSI_TYPE = "{http://www.w3.org/2001/XMLSchema-instance}type"
+NS1 = "{utcs}"
+NS2 = "{utcs.values}"
+
+RESOURCE_ID = NS1 + "resourceID"
+VALUE = NS1 + "value"
+
+
+def _get_children(resource_value: ET.Element) -> dict[str, str]:
+    """Get the text of all the child elements in a single iteration."""
+    return {child.tag: child.text for child in resource_value}
+
+
+def _decode_bool(resource_value: ET.Element) -> bool:
+    return resource_value.find(NS2 + "value").text == "true"
+
+
+def _decode_int(resource_value: ET.Element) -> int:
+    return int(resource_value.find(NS2 + "integer").text)
+
+
+def _decode_float(resource_value: ET.Element) -> float:
+    return round(float(resource_value.find(NS2 + "floatingPointValue").text), 2)
+
+
+def _decode_enum(resource_value: ET.Element) -> str:
+    return resource_value.find(NS2 + "enumName").text
+
+
+def _decode_timer(resource_value: ET.Element) -> int:
+    return int(resource_value.find(NS2 + "milliseconds").text)
+
+
+def _decode_time(resource_value: ET.Element) -> datetime.time:
+    children = _get_children(resource_value)
+    return datetime.time(
+        int(children[NS2 + "hours"]),
+        int(children[NS2 + "minutes"]),
+        int(children[NS2 + "seconds"]),
+    )
+
+
+def _decode_datetime(resource_value: ET.Element) -> datetime.datetime:
+    children = _get_children(resource_value)
+    return datetime.datetime(  # noqa: DTZ001
+        int(children[NS1 + "year"]),
+        int(children[NS1 + "monthWithJanuaryAsOne"]),
+        int(children[NS1 + "day"]),
+        int(children[NS1 + "hours"]),
+        int(children[NS1 + "minutes"]),
+        int(children[NS1 + "seconds"]),
+    )
+
+
+def _decode_date(resource_value: ET.Element) -> datetime.datetime:
+    children = _get_children(resource_value)
+    year = int(children[NS2 + "year"])
+    if year == 0:
+        year = datetime.datetime.today().year  # noqa: DTZ002
+    return datetime.datetime(  # noqa: DTZ001
+        year, int(children[NS2 + "month"]), int(children[NS2 + "day"])
+    )
+
+
+def _decode_xsd_int(resource_value: ET.Element) -> int:
+    return int(resource_value.text)
+
+
+DECODERS: dict[str, Callable[[ET.Element], Any]] = {
+    "WSBooleanValue": _decode_bool,
+    "WSIntegerValue": _decode_int,
+    "WSFloatingPointValue": _decode_float,
+    "WSEnumValue": _decode_enum,
+    "WSTimerValue": _decode_timer,
+    "WSTimeValue": _decode_time,
+    "WSDate": _decode_datetime,
+    "WSDateValue": _decode_date,
+    "int": _decode_xsd_int,
+}
+
+
+def decode_value(
+    resource_value: ET.Element | None,
+) -> bool | int | float | str | datetime.datetime | None:
+    """Get a runtime value from the xml base on the xsi:type in the xml."""
+    if resource_value is None:
+        return None
+    valuetype = resource_value.attrib[XSI_TYPE]
+    decoder = DECODERS.get(valuetype[valuetype.find(":") + 1 :])
+    if decoder is None:
+        return resource_value.text
+    return decoder(resource_value)
+
+
+def decode_resource_values(items: Iterable[ET.Element]) -> list[tuple[int, Any]]:
+    """Get a list of (id, value) tuples from resource value array items."""
+    values = []
+    for item in items:
+        ihcid = None
+        resource_value = None
+        for child in item:
+            tag = child.tag
+            if tag == RESOURCE_ID:
+                ihcid = child.text
+            elif tag == VALUE:
+                resource_value = child
+        if ihcid is None:
+            continue
+        value = decode_value(resource_value)
+        if value is not None:
+            values.append((int(ihcid), value))
+    return values
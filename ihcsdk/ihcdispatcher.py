@@ -0,0 +1,384 @@
+"""
+Dispatch the change notifications to the callbacks.
+
+The notify thread hands the changes to a dispatcher, so the long polling does not
+wait for the callbacks. The queued dispatchers keep the changes for a resource in
+order, and use an overflow policy when the bounded queue is full. The coalescing
+dispatcher delivers only the latest value for a resource in a time window.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Sequence
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from ihcsdk.ihcmetrics import IHCMetrics
+
+_LOGGER = logging.getLogger(__name__)
+
+# Overflow policies for a full dispatch queue
+# Wait for the callbacks to make room in the queue (no changes are lost)
+OVERFLOW_BLOCK = "block"
+# Drop the oldest queued change
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+# Replace the value of a queued change for the same resource, block otherwise
+OVERFLOW_COALESCE = "coalesce"
+
+Callbacks = Sequence[Callable[[int, Any], Any]]
+
+
+class IHCCountCallback:
+    """
+    Wrap a callback that also wants the number of changes.
+
+    The callback is called with (resourceid, value, count), where count is the
+    number of changes coalesced into the value.
+    """
+
+    __slots__ = ("callback",)
+
+    def __init__(self, callback: Callable[[int, Any, int], Any]) -> None:
+        """Wrap the callback."""
+        self.callback = callback
+
+    def __eq__(self, other: object) -> bool:
+        """Compare the wrapped callbacks."""
+        if isinstance(other, IHCCountCallback):
+            return self.callback == other.callback
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        """Hash the wrapped callback."""
+        return hash(self.callback)
+
+
+class IHCDispatchQueue:
+    """Bounded queue of [resourceid, value, callbacks, count, queued] changes."""
+
+    def __init__(self, maxsize: int = 1000, overflow: str = OVERFLOW_BLOCK) -> None:
+        """Initialize the queue."""
+        if overflow not in (OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_COALESCE):
+            msg = f"Unknown overflow policy {overflow}"
+            raise ValueError(msg)
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.dropped = 0
+        self.coalesced = 0
+        self.closed = False
+        self._items: deque[list] = deque()
+        self._pending: dict[int, list] = {}
+        self._condition = threading.Condition()
+
+    def __len__(self) -> int:
+        """Return the number of queued changes."""
+        return len(self._items)
+
+    def put(
+        self, resourceid: int, value: Any, callbacks: Callbacks, count: int = 1
+    ) -> None:
+        """Queue a change, using the overflow policy if the queue is full."""
+        with self._condition:
+            if self.overflow == OVERFLOW_COALESCE:
+                pending = self._pending.get(resourceid)
+                if pending is not None:
+                    pending[1] = value
+                    pending[2] = callbacks
+                    pending[3] += count
+                    self.coalesced += 1
+                    return
+            while len(self._items) >= self.maxsize and not self.closed:
+                if self.overflow == OVERFLOW_DROP_OLDEST:
+                    self._items.popleft()
+                    self.dropped += 1
+                    _LOGGER.debug("Dispatch queue is full, dropped the oldest change")
+                else:
+                    self._condition.wait()
+            item = [resourceid, value, callbacks, count, time.monotonic()]
+            self._items.append(item)
+            if self.overflow == OVERFLOW_COALESCE:
+                self._pending[resourceid] = item
+            self._condition.notify_all()
+
+    def get(self, block: bool = True) -> list | None:
+        """Get the next change, None if the queue is closed or empty (not block)."""
+        with self._condition:
+            while not self._items:
+                if self.closed or not block:
+                    return None
+                self._condition.wait()
+            item = self._items.popleft()
+            if self._pending.get(item[0]) is item:
+                del self._pending[item[0]]
+            self._condition.notify_all()
+            return item
+
+    def close(self) -> None:
+        """Close the queue, the queued changes are still returned by get."""
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+
+class IHCDispatcher:
+    """Run the callbacks inline on the notify thread."""
+
+    # The metrics hooks for the dispatch lag of the queued dispatchers
+    metrics: "IHCMetrics | None" = None
+
+    def dispatch(
+        self, resourceid: int, value: Any, callbacks: Callbacks, count: int = 1
+    ) -> None:
+        """Dispatch a change to the callbacks."""
+        self.run(resourceid, value, callbacks, count)
+
+    def run(
+        self, resourceid: int, value: Any, callbacks: Callbacks, count: int = 1
+    ) -> None:
+        """Run the callbacks for a change."""
+        for callback in callbacks:
+            try:
+                IHCDispatcher.call(callback, resourceid, value, count)
+            except Exception:
+                _LOGGER.exception("Exception in notify callback")
+
+    def forget(self, resourceid: int) -> None:
+        """Forget the state kept for a resource that is no longer dispatched."""
+
+    def run_item(self, item: list) -> None:
+        """Run the callbacks for a queued change and record the dispatch lag."""
+        if self.metrics is not None:
+            self.metrics.dispatch_lag(time.monotonic() - item[4])
+        self.run(item[0], item[1], item[2], item[3])
+
+    @staticmethod
+    def call(callback: Callable, resourceid: int, value: Any, count: int) -> Any:
+        """Call a callback, with the count if it is a IHCCountCallback."""
+        if type(callback) is IHCCountCallback:
+            return callback.callback(resourceid, value, count)
+        return callback(resourceid, value)
+
+    def close(self) -> None:
+        """Stop the dispatcher."""
+
+
+class IHCThreadDispatcher(IHCDispatcher):
+    """
+    Run the callbacks on worker threads.
+
+    The changes are distributed to the workers by resource id, so the changes for
+    a resource are always handled in order by the same worker.
+    """
+
+    def __init__(
+        self, workers: int = 1, maxsize: int = 1000, overflow: str = OVERFLOW_BLOCK
+    ) -> None:
+        """Start the worker threads, each with a queue of maxsize changes."""
+        self._queues = [IHCDispatchQueue(maxsize, overflow) for _ in range(workers)]
+        self._threads = [
+            threading.Thread(
+                target=self._worker, args=(queue,), name="ihc-dispatch", daemon=True
+            )
+            for queue in self._queues
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    @property
+    def dropped(self) -> int:
+        """Return the number of changes dropped because a queue was full."""
+        return sum(queue.dropped for queue in self._queues)
+
+    def dispatch(
+        self, resourceid: int, value: Any, callbacks: Callbacks, count: int = 1
+    ) -> None:
+        """Queue the change for the worker of the resource."""
+        self._queues[resourceid % len(self._queues)].put(
+            resourceid, value, callbacks, count
+        )
+
+    def _worker(self, queue: IHCDispatchQueue) -> None:
+        """Worker thread function."""
+        while (item := queue.get()) is not None:
+            self.run_item(item)
+
+    def close(self) -> None:
+        """Stop the workers when the queued changes have been handled."""
+        for queue in self._queues:
+            queue.close()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join()
+
+
+class IHCAsyncioDispatcher(IHCDispatcher):
+    """
+    Run the callbacks in an asyncio event loop.
+
+    The callbacks are called in order in the loop. If a callback returns a
+    coroutine it is scheduled as a task.
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        maxsize: int = 1000,
+        overflow: str = OVERFLOW_BLOCK,
+    ) -> None:
+        """Initialize the dispatcher for the loop."""
+        self.loop = loop
+        self._queue = IHCDispatchQueue(maxsize, overflow)
+        self._lock = threading.Lock()
+        self._scheduled = False
+        self._tasks: set[asyncio.Task] = set()
+
+    @property
+    def dropped(self) -> int:
+        """Return the number of changes dropped because the queue was full."""
+        return self._queue.dropped
+
+    def dispatch(
+        self, resourceid: int, value: Any, callbacks: Callbacks, count: int = 1
+    ) -> None:
+        """Queue the change and schedule the queue to be handled in the loop."""
+        self._queue.put(resourceid, value, callbacks, count)
+        with self._lock:
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self.loop.call_soon_threadsafe(self._drain)
+
+    def _drain(self) -> None:
+        """Run the callbacks for the queued changes."""
+        with self._lock:
+            self._scheduled = False
+        while (item := self._queue.get(block=False)) is not None:
+            self.run_item(item)
+
+    def run(
+        self, resourceid: int, value: Any, callbacks: Callbacks, count: int = 1
+    ) -> None:
+        """Run the callbacks and schedule the returned coroutines."""
+        for callback in callbacks:
+            try:
+                result = IHCDispatcher.call(callback, resourceid, value, count)
+                if asyncio.iscoroutine(result):
+                    task = self.loop.create_task(result)
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+            except Exception:
+                _LOGGER.exception("Exception in notify callback")
+
+    def close(self) -> None:
+        """Close the queue."""
+        self._queue.close()
+
+
+class IHCCoalescingDispatcher(IHCDispatcher):
+    """
+    Coalesce the changes for a resource in a time window.
+
+    The first change for a resource starts a window for that resource, and when
+    it ends only the latest value is passed on to the target dispatcher, with the
+    number of changes as the count. A value equal to the last value delivered for
+    the resource is skipped. The window can be set per resource in windows.
+    """
+
+    def __init__(
+        self, target: IHCDispatcher, window: float = 0.2, close_target: bool = True
+    ) -> None:
+        """
+        Initialize the dispatcher with the target and the window in seconds.
+
+        Set close_target to false if the target is shared with other controllers.
+        """
+        self.target = target
+        self.window = window
+        # The windows in seconds for single resources, the others use window
+        self.windows: dict[int, float] = {}
+        self.close_target = close_target
+        # [value, callbacks, count, window end] by resource id
+        self._pending: dict[int, list] = {}
+        # The last value delivered for each resource, until it is forgotten
+        self._delivered: dict[int, Any] = {}
+        self._condition = threading.Condition()
+        self._closing = threading.Event()
+        self._thread = threading.Thread(
+            target=self._flush_fn, name="ihc-coalesce", daemon=True
+        )
+        self._thread.start()
+
+    def dispatch(
+        self, resourceid: int, value: Any, callbacks: Callbacks, count: int = 1
+    ) -> None:
+        """Keep the latest value for the resource until the window ends."""
+        with self._condition:
+            pending = self._pending.get(resourceid)
+            if pending is None:
+                end = time.monotonic() + self.windows.get(resourceid, self.window)
+                self._pending[resourceid] = [value, callbacks, count, end]
+                self._condition.notify()
+                return
+            pending[0] = value
+            pending[1] = callbacks
+            pending[2] += count
+
+    def flush(self, due: bool = False) -> None:
+        """
+        Pass the pending changes on to the target dispatcher.
+
+        If due is set only the changes with an ended window are passed on.
+        """
+        now = time.monotonic()
+        with self._condition:
+            if due:
+                pending = {
+                    resourceid: item
+                    for resourceid, item in self._pending.items()
+                    if item[3] <= now
+                }
+                for resourceid in pending:
+                    del self._pending[resourceid]
+            else:
+                pending, self._pending = self._pending, {}
+        delivered = self._delivered
+        for resourceid, (value, callbacks, count, _) in pending.items():
+            if resourceid in delivered and delivered[resourceid] == value:
+                continue
+            delivered[resourceid] = value
+            self.target.dispatch(resourceid, value, callbacks, count)
+
+    def forget(self, resourceid: int) -> None:
+        """Forget the last value delivered for the resource."""
+        with self._condition:
+            self._delivered.pop(resourceid, None)
+
+    def _flush_fn(self) -> None:
+        """Flush thread function."""
+        while True:
+            with self._condition:
+                while not self._closing.is_set():
+                    wait = None
+                    if self._pending:
+                        end = min(item[3] for item in self._pending.values())
+                        wait = end - time.monotonic()
+                        if wait <= 0:
+                            break
+                    self._condition.wait(wait)
+            if self._closing.is_set():
+                return
+            self.flush(due=True)
+
+    def close(self) -> None:
+        """Deliver the pending changes and close the target dispatcher."""
+        self._closing.set()
+        with self._condition:
+            self._condition.notify()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+        self.flush()
+        if self.close_target:
+            self.target.close()
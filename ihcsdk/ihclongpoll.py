@@ -0,0 +1,102 @@
+"""
+Adapt the long polling for the resource value changes.
+
+The server wait of a poll is shortened when changes arrive often, so a stalled
+poll is detected quickly, and is doubled after each poll without changes, so a
+quiet system makes few round trips. The http read timeout is the wait plus a
+margin from the observed round trip time, like the tcp retransmission timeout.
+"""
+
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class IHCLongPollTuner:
+    """Select the wait and the read timeout for the next long poll."""
+
+    def __init__(
+        self, min_wait: int = 2, max_wait: int = 30, margin: float = 2.0
+    ) -> None:
+        """
+        Initialize the tuner.
+
+        The wait is kept between min_wait and max_wait seconds, and at least
+        margin seconds are added to the wait for the read timeout.
+        """
+        self.min_wait = min_wait
+        self.max_wait = max_wait
+        self.margin = margin
+        # Weight of a new sample in the moving averages
+        self.smoothing = 0.25
+        # A poll may wait this many times the average time between changes
+        self.quiet_intervals = 4
+        # Number of stalled polls in a row that are polled again at once, before
+        # the poll is handled as failed
+        self.max_stalls = 1
+        self.wait = max_wait
+        # Moving average of the time until a poll returned changes
+        self.interval: float | None = None
+        # Round trip time and its mean deviation, from the polls without changes
+        self.rtt: float | None = None
+        self.rtt_deviation = 0.0
+        self.stalls = 0
+
+    @property
+    def change_rate(self) -> float:
+        """Get the estimated number of polls with changes per second."""
+        if not self.interval:
+            return 0.0
+        return 1 / self.interval
+
+    def timeout(self) -> float:
+        """Get the read timeout for a poll with the current wait."""
+        if self.rtt is None:
+            return self.wait + self.margin
+        return self.wait + max(self.margin, self.rtt + 4 * self.rtt_deviation)
+
+    def next_poll(self) -> tuple[int, float]:
+        """Get the (wait, timeout) for the next poll."""
+        return self.wait, self.timeout()
+
+    def observe(self, wait: int, elapsed: float, changes: int) -> None:
+        """Adapt to a poll with the wait that returned changes after elapsed."""
+        self.stalls = 0
+        if changes:
+            self.interval = self._average(self.interval, elapsed)
+            self.wait = round(
+                min(
+                    max(self.quiet_intervals * self.interval, self.min_wait),
+                    self.max_wait,
+                )
+            )
+            return
+        if elapsed >= wait:
+            rtt = elapsed - wait
+            if self.rtt is None:
+                self.rtt = rtt
+                self.rtt_deviation = rtt / 2
+            else:
+                self.rtt_deviation = self._average(
+                    self.rtt_deviation, abs(rtt - self.rtt)
+                )
+                self.rtt = self._average(self.rtt, rtt)
+        self.wait = min(max(self.wait * 2, self.min_wait), self.max_wait)
+
+    def stalled(self) -> bool:
+        """
+        Handle a poll that timed out.
+
+        Return True if the poll should be issued again at once.
+        """
+        self.stalls += 1
+        _LOGGER.debug("Long poll stalled (%d in a row)", self.stalls)
+        # Detect the next stall sooner
+        self.wait = max(self.min_wait, self.wait // 2)
+        return self.stalls <= self.max_stalls
+
+    def _average(self, average: float | None, sample: float) -> float:
+        """Update a moving average with a sample."""
+        if average is None:
+            return sample
+        return average + self.smoothing * (sample - average)
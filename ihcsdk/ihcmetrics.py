@@ -0,0 +1,240 @@
+"""
+Metrics hooks for the requests and the notifications.
+
+A connection, a controller and a dispatcher call the hooks of their metrics
+object, if one is set. The IHCMetrics base class ignores the metrics and can be
+subclassed to forward them to another metrics system. IHCMetricsRegistry keeps
+histograms and counters in memory. Without a metrics object the hooks are not
+called, so the metrics cost nothing when they are not used.
+"""
+
+import threading
+from bisect import bisect_left
+from collections import Counter
+from typing import Any
+
+# Histogram bucket upper bounds for the times in seconds, the sizes in bytes and
+# the number of changes in a poll
+SECONDS_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000)
+
+PRIORITY_NAMES = ("write", "read", "bulk")
+
+
+def label(service: str, action: str) -> str:
+    """Get the metric label for a soap action, like ControllerService.getState."""
+    return f"{service.rsplit('/', 1)[-1]}.{action}"
+
+
+class IHCMetrics:
+    """The metrics hooks, the base class ignores the metrics."""
+
+    def request(  # noqa: PLR0913
+        self,
+        service: str,
+        action: str,
+        seconds: float,
+        *,
+        sent: int,
+        received: int,
+        retries: int,
+    ) -> None:
+        """
+        Record a request that got a response.
+
+        seconds is the time until the response was received (the headers for a
+        streamed response). sent and received are the body sizes in bytes, and
+        retries the number of http retries before the response.
+        """
+
+    def parse(self, service: str, action: str, seconds: float) -> None:
+        """Record the time to parse a response, including a streamed body."""
+
+    def failure(self, service: str, action: str, error: str) -> None:
+        """Record a failed request with the error class, see classify_error."""
+
+    def rate_limited(self, priority: int, seconds: float) -> None:
+        """Record the time a request waited for the rate limiter."""
+
+    def poll(self, seconds: float, changes: int) -> None:
+        """Record a notify long poll with the number of changes."""
+
+    def dispatch_lag(self, seconds: float) -> None:
+        """Record the time a change was queued before the callbacks were run."""
+
+
+class IHCHistogram:
+    """Histogram with fixed buckets."""
+
+    __slots__ = ("bounds", "buckets", "count", "max", "min", "sum")
+
+    def __init__(self, bounds: tuple[float, ...]) -> None:
+        """Initialize the histogram with the bucket upper bounds."""
+        self.bounds = bounds
+        # The last bucket is for the values above the last bound
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        """Add a value."""
+        self.buckets[bisect_left(self.bounds, value)] += 1
+        if self.count == 0 or value < self.min:
+            self.min = value
+        if self.count == 0 or value > self.max:
+            self.max = value
+        self.count += 1
+        self.sum += value
+
+    def percentile(self, percent: float) -> float:
+        """Get the upper bound of the bucket with the percentile, 0 if empty."""
+        if self.count == 0:
+            return 0.0
+        rank = self.count * percent / 100
+        total = 0
+        for index, count in enumerate(self.buckets[:-1]):
+            total += count
+            if total >= rank:
+                return min(self.bounds[index], self.max)
+        return self.max
+
+    def as_dict(self) -> dict[str, Any]:
+        """Get the histogram as a dictionary."""
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+        }
+
+
+class IHCMetricsRegistry(IHCMetrics):
+    """
+    Keep the metrics as histograms and counters in memory.
+
+    The histograms are kept by (metric, label), where the label is the soap
+    action for the request metrics. The counters are kept by (metric, label)
+    and failures by (error class, label).
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty registry."""
+        self.histograms: dict[tuple[str, str], IHCHistogram] = {}
+        self.counters: Counter[tuple[str, str]] = Counter()
+        self.failures: Counter[tuple[str, str]] = Counter()
+        self._lock = threading.Lock()
+
+    def observe(
+        self, metric: str, name: str, value: float, bounds: tuple[float, ...]
+    ) -> None:
+        """Add a value to a histogram, with the lock held."""
+        histogram = self.histograms.get((metric, name))
+        if histogram is None:
+            histogram = self.histograms[metric, name] = IHCHistogram(bounds)
+        histogram.observe(value)
+
+    def request(  # noqa: PLR0913
+        self,
+        service: str,
+        action: str,
+        seconds: float,
+        *,
+        sent: int,
+        received: int,
+        retries: int,
+    ) -> None:
+        """Record the request time and sizes."""
+        name = label(service, action)
+        with self._lock:
+            self.counters["requests", name] += 1
+            if retries:
+                self.counters["retries", name] += retries
+            self.observe("request_seconds", name, seconds, SECONDS_BUCKETS)
+            self.observe("request_bytes", name, sent, BYTES_BUCKETS)
+            self.observe("response_bytes", name, received, BYTES_BUCKETS)
+
+    def parse(self, service: str, action: str, seconds: float) -> None:
+        """Record the parse time."""
+        with self._lock:
+            self.observe(
+                "parse_seconds", label(service, action), seconds, SECONDS_BUCKETS
+            )
+
+    def failure(self, service: str, action: str, error: str) -> None:
+        """Count the failure by error class and action."""
+        with self._lock:
+            self.failures[error, label(service, action)] += 1
+
+    def rate_limited(self, priority: int, seconds: float) -> None:
+        """Record the rate limiter wait by priority."""
+        with self._lock:
+            self.observe(
+                "rate_limit_seconds", PRIORITY_NAMES[priority], seconds, SECONDS_BUCKETS
+            )
+
+    def poll(self, seconds: float, changes: int) -> None:
+        """Record the poll time and the number of changes."""
+        with self._lock:
+            self.counters["polls", ""] += 1
+            self.counters["changes", ""] += changes
+            self.observe("poll_seconds", "", seconds, SECONDS_BUCKETS)
+            self.observe("poll_changes", "", changes, COUNT_BUCKETS)
+
+    def dispatch_lag(self, seconds: float) -> None:
+        """Record the dispatch lag."""
+        with self._lock:
+            self.observe("dispatch_lag_seconds", "", seconds, SECONDS_BUCKETS)
+
+    def failures_by_error(self) -> Counter[str]:
+        """Get the number of failures by error class."""
+        with self._lock:
+            result: Counter[str] = Counter()
+            for (error, _), count in self.failures.items():
+                result[error] += count
+            return result
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        """
+        Get all the metrics as nested dictionaries.
+
+        The histograms and counters are by metric and label, and the failures by
+        error class and label.
+        """
+        result: dict[str, dict[str, Any]] = {}
+        with self._lock:
+            for (metric, name), histogram in self.histograms.items():
+                result.setdefault(metric, {})[name] = histogram.as_dict()
+            for (metric, name), count in self.counters.items():
+                result.setdefault(metric, {})[name] = count
+            for (error, name), count in self.failures.items():
+                result.setdefault("failures", {}).setdefault(error, {})[name] = count
+        return result
+
+    def reset(self) -> None:
+        """Remove all the metrics."""
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.failures.clear()
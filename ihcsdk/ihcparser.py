@@ -0,0 +1,98 @@
+"""
+Parser backends for the soap responses.
+
+The responses are parsed directly from the response bytes. The lxml backend is
+used if selected and lxml is installed. Parsing the complete response is faster
+than the incremental parsing of iter_items, which only saves memory for large
+responses.
+"""
+
+import xml.etree.ElementTree as ET
+from collections.abc import Iterable, Iterator
+
+try:
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None
+
+
+class IHCParser:
+    """Parse the soap responses using xml.etree.ElementTree."""
+
+    name = "etree"
+    errors: tuple[type[Exception], ...] = (ET.ParseError,)
+
+    def parse(self, data: bytes) -> ET.Element:
+        """Parse the complete response."""
+        return ET.fromstring(data)  # noqa: S314
+
+    def find_items(self, data: bytes, tag: str) -> list[ET.Element]:
+        """Parse the complete response and get the elements with the tag."""
+        return list(self.parse(data).iter(tag))
+
+    def iter_items(self, chunks: Iterable[bytes], tag: str) -> Iterator[ET.Element]:
+        """
+        Parse the response chunks and yield the elements with the tag.
+
+        The elements are removed from the parent when they are complete, so the
+        full tree is not build in memory.
+        """
+        parser = ET.XMLPullParser(("start", "end"))
+        stack = []
+        for chunk in chunks:
+            parser.feed(chunk)
+            for event, elem in parser.read_events():
+                if event == "start":
+                    stack.append(elem)
+                    continue
+                stack.pop()
+                if elem.tag == tag:
+                    if stack:
+                        stack[-1].remove(elem)
+                    yield elem
+        parser.close()
+
+
+class IHCLxmlParser(IHCParser):
+    """Parse the soap responses using lxml."""
+
+    name = "lxml"
+
+    def __init__(self) -> None:
+        """Create the lxml parser."""
+        if lxml_etree is None:
+            msg = "lxml is not installed"
+            raise ImportError(msg)
+        self.errors = (ET.ParseError, lxml_etree.XMLSyntaxError)
+        self._parser = lxml_etree.XMLParser(
+            resolve_entities=False, no_network=True, huge_tree=True
+        )
+
+    def parse(self, data: bytes) -> ET.Element:
+        """Parse the complete response."""
+        return lxml_etree.fromstring(data, self._parser)
+
+    def iter_items(self, chunks: Iterable[bytes], tag: str) -> Iterator[ET.Element]:
+        """Parse the response chunks and yield the elements with the tag."""
+        parser = lxml_etree.XMLPullParser(
+            events=("end",), tag=tag, resolve_entities=False, huge_tree=True
+        )
+        for chunk in chunks:
+            parser.feed(chunk)
+            for _, elem in parser.read_events():
+                parent = elem.getparent()
+                if parent is not None:
+                    parent.remove(elem)
+                yield elem
+        parser.close()
+
+
+def get_parser(backend: str = "etree") -> IHCParser:
+    """
+    Get a parser backend.
+
+    The backend can be "etree", "lxml" or "auto" to use lxml if it is installed.
+    """
+    if backend == "lxml" or (backend == "auto" and lxml_etree is not None):
+        return IHCLxmlParser()
+    return IHCParser()
@@ -0,0 +1,188 @@
+"""
+Build the soap request payloads for the ihc controller.
+
+The payloads are assembled from precompiled compact templates, and the arrays of
+resource ids are build with a single join.
+"""
+
+import datetime
+from collections.abc import Iterable
+from typing import Any
+from xml.sax.saxutils import escape
+
+SET_RESOURCE_VALUE_PREFIX = '<setResourceValue1 xmlns="utcs" xmlns:ns1="utcs.values">'
+SET_RESOURCE_VALUE_SUFFIX = (
+    "<typeString/><resourceID>{}</resourceID>"
+    "<isValueRuntime>true</isValueRuntime></setResourceValue1>"
+)
+SET_RESOURCE_VALUES_PREFIX = '<setResourceValues1 xmlns="utcs" xmlns:ns1="utcs.values">'
+SET_RESOURCE_VALUES_ITEM = (
+    "<arrayItem>{}<typeString></typeString><resourceID>{}</resourceID>"
+    "<isValueRuntime>true</isValueRuntime></arrayItem>"
+)
+
+
+def _array(resourceids: Iterable[int], tag: str) -> str:
+    """Array items for the resource ids."""
+    opentag = f"<{tag}>"
+    closetag = f"</{tag}>"
+    items = (closetag + opentag).join(map(str, resourceids))
+    if not items:
+        return ""
+    return opentag + items + closetag
+
+
+def authenticate(username: str, password: str) -> str:
+    """Payload for the authenticate request."""
+    return (
+        '<authenticate1 xmlns="utcs">'
+        f"<password>{escape(password)}</password>"
+        f"<username>{escape(username)}</username>"
+        "<application>treeview</application></authenticate1>"
+    )
+
+
+def wait_for_state_change(state: str, waitsec: int) -> str:
+    """Payload for the waitForControllerStateChange request."""
+    return (
+        '<ns1:waitForControllerStateChange1 xmlns:ns1="utcs"'
+        ' xsi:type="ns1:WSControllerState">'
+        f'<ns1:state xsi:type="xsd:string">{escape(state)}</ns1:state>'
+        "</ns1:waitForControllerStateChange1>"
+        '<ns2:waitForControllerStateChange2 xmlns:ns2="utcs" xsi:type="xsd:int">'
+        f"{waitsec}</ns2:waitForControllerStateChange2>"
+    )
+
+
+def get_project_segment(segment: int, project_major: int, project_minor: int) -> str:
+    """Payload for the getIHCProjectSegment request."""
+    return (
+        f'<getIHCProjectSegment1 xmlns="utcs">{segment}</getIHCProjectSegment1>'
+        f'<getIHCProjectSegment2 xmlns="utcs">{project_major}</getIHCProjectSegment2>'
+        f'<getIHCProjectSegment3 xmlns="utcs">{project_minor}</getIHCProjectSegment3>'
+    )
+
+
+def bool_value(value: bool) -> str:
+    """Value element for a boolean value."""
+    if value:
+        return (
+            '<value xsi:type="ns1:WSBooleanValue"><ns1:value>true</ns1:value></value>'
+        )
+    return '<value xsi:type="ns1:WSBooleanValue"><ns1:value>false</ns1:value></value>'
+
+
+def int_value(value: int) -> str:
+    """Value element for an integer value."""
+    return (
+        f'<value xsi:type="ns1:WSIntegerValue"><ns1:integer>{value}</ns1:integer>'
+        "</value>"
+    )
+
+
+def float_value(value: float) -> str:
+    """Value element for a floating point value."""
+    return (
+        '<value xsi:type="ns1:WSFloatingPointValue">'
+        f"<ns1:floatingPointValue>{value}</ns1:floatingPointValue></value>"
+    )
+
+
+def timer_value(milliseconds: int) -> str:
+    """Value element for a timer value in milliseconds."""
+    return (
+        '<value xsi:type="ns1:WSTimerValue">'
+        f"<ns1:milliseconds>{milliseconds}</ns1:milliseconds></value>"
+    )
+
+
+def time_value(hours: int, minutes: int, seconds: int) -> str:
+    """Value element for a time value."""
+    return (
+        '<value xsi:type="ns1:WSTimeValue">'
+        f"<ns1:hours>{hours}</ns1:hours>"
+        f"<ns1:minutes>{minutes}</ns1:minutes>"
+        f"<ns1:seconds>{seconds}</ns1:seconds></value>"
+    )
+
+
+def value(pyvalue: Any) -> str:
+    """
+    Value element for a python value.
+
+    The IHC type is selected from the python type: bool, int, float,
+    datetime.timedelta (timer) and datetime.time (time).
+    """
+    if isinstance(pyvalue, bool):
+        return bool_value(pyvalue)
+    if isinstance(pyvalue, int):
+        return int_value(pyvalue)
+    if isinstance(pyvalue, float):
+        return float_value(pyvalue)
+    if isinstance(pyvalue, datetime.timedelta):
+        return timer_value(pyvalue // datetime.timedelta(milliseconds=1))
+    if isinstance(pyvalue, datetime.time):
+        return time_value(pyvalue.hour, pyvalue.minute, pyvalue.second)
+    msg = f"Unsupported runtime value type {type(pyvalue).__name__}"
+    raise TypeError(msg)
+
+
+def set_resource_value(resourceid: int, valueelement: str) -> str:
+    """Payload for the setResourceValue request."""
+    return (
+        SET_RESOURCE_VALUE_PREFIX
+        + valueelement
+        + SET_RESOURCE_VALUE_SUFFIX.format(resourceid)
+    )
+
+
+def set_resource_values(items: Iterable[tuple[int, Any]]) -> str:
+    """Payload for the setResourceValues request from (id, value) tuples."""
+    return (
+        SET_RESOURCE_VALUES_PREFIX
+        + "".join(
+            SET_RESOURCE_VALUES_ITEM.format(value(pyvalue), resourceid)
+            for resourceid, pyvalue in items
+        )
+        + "</setResourceValues1>"
+    )
+
+
+def get_runtime_value(resourceid: int) -> str:
+    """Payload for the getResourceValue request."""
+    return f'<getRuntimeValue1 xmlns="utcs">{resourceid}</getRuntimeValue1>'
+
+
+def get_runtime_values(resourceids: Iterable[int]) -> str:
+    """Payload for the getResourceValues request."""
+    return (
+        '<getRuntimeValues1 xmlns="utcs">'
+        + _array(resourceids, "arrayItem")
+        + "</getRuntimeValues1>"
+    )
+
+
+def enable_runtime_notifications(resourceids: Iterable[int]) -> str:
+    """Payload for the enableRuntimeValueNotifications request."""
+    return (
+        '<enableRuntimeValueNotifications1 xmlns="utcs"'
+        ' xmlns:a="http://www.w3.org/2001/XMLSchema">'
+        + _array(resourceids, "a:arrayItem")
+        + "</enableRuntimeValueNotifications1>"
+    )
+
+
+def wait_for_resource_value_changes(wait: int) -> str:
+    """Payload for the waitForResourceValueChanges request."""
+    return (
+        f'<waitForResourceValueChanges1 xmlns="utcs">{wait}'
+        "</waitForResourceValueChanges1>"
+    )
+
+
+def get_user_log(language: str) -> str:
+    """Payload for the getUserLog request."""
+    return (
+        '<getUserLog1 xmlns="utcs" /><getUserLog2 xmlns="utcs">0</getUserLog2>'
+        f'<getUserLog3 xmlns="utcs">{escape(language)}</getUserLog3>'
+    )
@@ -0,0 +1,271 @@
+"""
+Poll the resource values that are not notified by the controller.
+
+Each resource is registered with a refresh interval. The scheduler thread reads
+the due resources in chunked getResourceValues requests, and a resource that is
+due soon is read early with them, so the resources with the same interval stay
+in the same requests. The scheduled requests use the bulk priority of the rate
+limiter, so they are spread out behind the reads and writes of the callers.
+The reads of the callers share the requests in flight with the scheduler and
+each other, so a resource is only requested once at a time.
+"""
+
+import heapq
+import logging
+import math
+import threading
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Literal
+
+from ihcsdk.ihcdispatcher import IHCDispatcher
+from ihcsdk.ihcratelimiter import PRIORITY_BULK, PRIORITY_READ
+from ihcsdk.ihcsubscriptions import IHCSubscriptions
+
+if TYPE_CHECKING:
+    from ihcsdk.ihccontroller import IHCController
+
+_LOGGER = logging.getLogger(__name__)
+
+Callback = Callable[[int, Any], Any]
+
+# The value of a resource in a failed request
+_FAILED = object()
+# The value of a resource that was not in the response, or not read yet
+_MISSING = object()
+
+# Runs the poll callbacks if the controller has no dispatcher
+_INLINE = IHCDispatcher()
+
+
+@dataclass(slots=True)
+class IHCPollEntry:
+    """A polled resource."""
+
+    interval: float
+    # The monotonic time the resource is due, inf while it is being read
+    due: float
+    callbacks: tuple[Callback, ...] = ()
+    value: Any = _MISSING
+
+
+class IHCPollScheduler:
+    """Poll the registered resources, see IHCController.poll_scheduler."""
+
+    def __init__(self, controller: "IHCController") -> None:
+        """Initialize the scheduler, the thread starts with the first resource."""
+        self.controller = controller
+        # Maximum number of resource ids in a getResourceValues request
+        self.chunk_size = 500
+        # A resource that is due within this fraction of its interval is read
+        # early with the due resources
+        self.early = 0.25
+        # The rate limiter priority of the scheduled reads
+        self.priority = PRIORITY_BULK
+        # Seconds before the resources of a failed read are polled again
+        self.retry_delay = 5.0
+        self._entries: dict[int, IHCPollEntry] = {}
+        # (due, resourceid), an item is stale if the entry has another due time
+        self._heap: list[tuple[float, int]] = []
+        self._inflight: dict[int, Future] = {}
+        self._condition = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._running = False
+
+    def __len__(self) -> int:
+        """Return the number of polled resources."""
+        return len(self._entries)
+
+    def __contains__(self, resourceid: int) -> bool:
+        """Return True if the resource is polled."""
+        return resourceid in self._entries
+
+    def add(
+        self,
+        resourceids: Iterable[int],
+        interval: float,
+        callback: Callback | None = None,
+    ) -> None:
+        """
+        Poll the resources every interval seconds, starting now.
+
+        A resource that is already polled keeps the shortest interval. The
+        callback is called with (resourceid, value) by the controller dispatcher
+        when a polled value has changed. The values are also kept in the value
+        cache of the controller.
+        """
+        now = time.monotonic()
+        with self._condition:
+            for resourceid in resourceids:
+                entry = self._entries.get(resourceid)
+                if entry is None:
+                    entry = self._entries[resourceid] = IHCPollEntry(interval, now)
+                    heapq.heappush(self._heap, (now, resourceid))
+                elif interval < entry.interval:
+                    entry.interval = interval
+                    if now + interval < entry.due:
+                        entry.due = now + interval
+                        heapq.heappush(self._heap, (entry.due, resourceid))
+                if callback is not None and callback not in entry.callbacks:
+                    entry.callbacks = (*entry.callbacks, callback)
+            if not self._running:
+                self._start()
+            self._condition.notify_all()
+
+    def remove(
+        self, resourceids: Iterable[int], callback: Callback | None = None
+    ) -> None:
+        """Remove a callback, or stop polling the resources if None."""
+        with self._condition:
+            for resourceid in resourceids:
+                entry = self._entries.get(resourceid)
+                if entry is None:
+                    continue
+                if callback is not None:
+                    entry.callbacks = tuple(c for c in entry.callbacks if c != callback)
+                    if entry.callbacks:
+                        continue
+                del self._entries[resourceid]
+
+    def _start(self) -> None:
+        """Start the scheduler thread, with the condition held."""
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="ihc-poll", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the scheduler thread, the resources are kept."""
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def _run(self) -> None:
+        """Scheduler thread function."""
+        _LOGGER.debug("Starting poll scheduler thread")
+        while True:
+            with self._condition:
+                while self._running:
+                    wait = self._next_due() - time.monotonic()
+                    if wait <= 0:
+                        break
+                    self._condition.wait(None if wait == math.inf else wait)
+                if not self._running:
+                    return
+                resourceids = self._take_due(time.monotonic())
+            try:
+                self.poll(resourceids)
+            except Exception:
+                _LOGGER.exception("Exception in poll scheduler thread")
+
+    def _next_due(self) -> float:
+        """Get the next due time, with the condition held."""
+        heap = self._heap
+        while heap:
+            due, resourceid = heap[0]
+            entry = self._entries.get(resourceid)
+            if entry is not None and entry.due == due:
+                return due
+            heapq.heappop(heap)
+        return math.inf
+
+    def _take_due(self, now: float) -> list[int]:
+        """Take the due resources and the ones due soon, with the condition held."""
+        resourceids = []
+        while self._next_due() != math.inf:
+            due, resourceid = self._heap[0]
+            entry = self._entries[resourceid]
+            if due > now and due - now > self.early * entry.interval:
+                break
+            heapq.heappop(self._heap)
+            entry.due = math.inf
+            resourceids.append(resourceid)
+        return resourceids
+
+    def poll(self, resourceids: list[int]) -> None:
+        """Read the resources, run the callbacks and schedule the next reads."""
+        start = time.monotonic()
+        values = self._fetch(resourceids, self.priority)
+        dispatch = []
+        with self._condition:
+            for resourceid in resourceids:
+                entry = self._entries.get(resourceid)
+                if entry is None:
+                    continue
+                value = values.get(resourceid, _MISSING)
+                if value is _FAILED:
+                    entry.due = start + min(entry.interval, self.retry_delay)
+                else:
+                    entry.due = start + entry.interval
+                    if value is not _MISSING and value != entry.value:
+                        entry.value = value
+                        if entry.callbacks:
+                            dispatch.append((resourceid, value, entry.callbacks))
+                heapq.heappush(self._heap, (entry.due, resourceid))
+        dispatcher = self.controller.dispatcher or _INLINE
+        for resourceid, value, callbacks in dispatch:
+            dispatcher.dispatch(resourceid, value, callbacks)
+
+    def fetch(
+        self, resourceids: Iterable[int], priority: int = PRIORITY_READ
+    ) -> dict[int, Any] | Literal[False]:
+        """
+        Read the resource values, sharing the requests in flight.
+
+        A resource that is being read by another caller or the scheduler is not
+        requested again, the result of that request is used. Return False if a
+        request failed.
+        """
+        values = self._fetch(resourceids, priority)
+        if any(value is _FAILED for value in values.values()):
+            return False
+        return values
+
+    def _fetch(self, resourceids: Iterable[int], priority: int) -> dict[int, Any]:
+        """Read the values, the resources of a failed request are _FAILED."""
+        waiting: dict[int, Future] = {}
+        new = []
+        with self._condition:
+            for resourceid in dict.fromkeys(resourceids):
+                future = self._inflight.get(resourceid)
+                if future is None:
+                    self._inflight[resourceid] = Future()
+                    new.append(resourceid)
+                else:
+                    waiting[resourceid] = future
+        values: dict[int, Any] = {}
+        done = 0
+        try:
+            for chunk in IHCSubscriptions.chunks(new, self.chunk_size):
+                result = self.controller._call(  # noqa: SLF001
+                    self.controller.client.get_runtime_values, chunk, priority
+                )
+                if result is False:
+                    result = dict.fromkeys(chunk, _FAILED)
+                else:
+                    self.controller.value_cache.update_many(result.items())
+                values.update(result)
+                self._resolve(chunk, result)
+                done += len(chunk)
+        finally:
+            # Release the waiting callers if a request raised
+            failed = new[done:]
+            self._resolve(failed, dict.fromkeys(failed, _FAILED))
+        for resourceid, future in waiting.items():
+            value = future.result()
+            if value is not _MISSING:
+                values[resourceid] = value
+        return values
+
+    def _resolve(self, resourceids: list[int], values: dict[int, Any]) -> None:
+        """Set the results of the requests in flight for the resources."""
+        with self._condition:
+            for resourceid in resourceids:
+                self._inflight.pop(resourceid).set_result(
+                    values.get(resourceid, _MISSING)
+                )
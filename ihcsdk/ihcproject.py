@@ -0,0 +1,155 @@
+"""Implements an indexed model of the ihc project."""
+
+import io
+import xml.etree.ElementTree as ET
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+# The resource element tags with a runtime value
+RESOURCE_PREFIXES = ("dataline_", "airlink_", "resource_")
+
+# Element tags that contain resources (besides the group)
+CONTAINER_PREFIXES = ("product_", "functionblock")
+
+# Coarse categories for the resource element tags
+RESOURCE_CATEGORIES = {
+    "airlink_dimming": "dimmer",
+    "airlink_relay": "relay",
+    "airlink_input": "input",
+    "dataline_input": "input",
+    "airlink_output": "output",
+    "dataline_output": "output",
+    "resource_temperature": "sensor",
+    "resource_humidity_level": "sensor",
+    "resource_light_level": "sensor",
+    "resource_flag": "flag",
+    "resource_integer": "integer",
+    "resource_enum": "enum",
+    "resource_timer": "timer",
+    "resource_time": "time",
+    "resource_date": "date",
+    "resource_counter": "counter",
+}
+
+
+@dataclass(slots=True, frozen=True)
+class IHCResource:
+    """A resource in the ihc project."""
+
+    ihcid: int
+    name: str
+    type: str
+    category: str
+    group: str | None
+    container: str | None
+    container_type: str | None
+
+
+class IHCProject:
+    """
+    Indexed ihc project.
+
+    The project is parsed once and the resources can be looked up by id, by type or
+    category and by location (the group/room name).
+    """
+
+    def __init__(self, resources: Iterable[IHCResource] = ()) -> None:
+        """Initialize the project with the resources."""
+        self.resources: dict[int, IHCResource] = {}
+        self._bytype: dict[str, list[IHCResource]] = {}
+        self._bycategory: dict[str, list[IHCResource]] = {}
+        self._bylocation: dict[str, list[IHCResource]] = {}
+        for resource in resources:
+            self.add(resource)
+
+    def add(self, resource: IHCResource) -> None:
+        """Add a resource to the indexes."""
+        if resource.ihcid in self.resources:
+            return
+        self.resources[resource.ihcid] = resource
+        self._bytype.setdefault(resource.type, []).append(resource)
+        self._bycategory.setdefault(resource.category, []).append(resource)
+        if resource.group is not None:
+            self._bylocation.setdefault(resource.group, []).append(resource)
+
+    def __len__(self) -> int:
+        """Return the number of resources."""
+        return len(self.resources)
+
+    def __contains__(self, ihcid: int) -> bool:
+        """Return True if the resource id is in the project."""
+        return ihcid in self.resources
+
+    def get(self, ihcid: int) -> IHCResource | None:
+        """Get the resource with the resource id."""
+        return self.resources.get(ihcid)
+
+    def by_type(self, resourcetype: str) -> list[IHCResource]:
+        """Get the resources with the element type, like 'airlink_dimming'."""
+        return self._bytype.get(resourcetype, [])
+
+    def by_category(self, category: str) -> list[IHCResource]:
+        """Get the resources in the category, like 'dimmer', 'relay' or 'sensor'."""
+        return self._bycategory.get(category, [])
+
+    def by_location(self, group: str) -> list[IHCResource]:
+        """Get the resources in the group (room)."""
+        return self._bylocation.get(group, [])
+
+    def types(self) -> list[str]:
+        """Get the element types in the project."""
+        return list(self._bytype)
+
+    def locations(self) -> list[str]:
+        """Get the group names in the project."""
+        return list(self._bylocation)
+
+    @staticmethod
+    def from_events(events: Iterable[tuple[str, ET.Element]]) -> "IHCProject":
+        """
+        Build the project from ("start", "end") parse events.
+
+        The elements are cleared when they have been handled, so the events from
+        IHCSoapClient.iter_project can be used without keeping the full project.
+        """
+        project = IHCProject()
+        groups: list[str] = []
+        containers: list[ET.Element] = []
+        for event, elem in events:
+            tag = elem.tag
+            if event == "start":
+                if tag == "group":
+                    groups.append(elem.get("name", ""))
+                elif tag.startswith(CONTAINER_PREFIXES):
+                    containers.append(elem)
+                continue
+            if tag.startswith(RESOURCE_PREFIXES):
+                ihcid = elem.get("id")
+                if ihcid is not None and ihcid.startswith("_0x"):
+                    container = containers[-1] if containers else ET.Element("")
+                    project.add(
+                        IHCResource(
+                            ihcid=int(ihcid[1:], 16),
+                            name=elem.get("name", ""),
+                            type=tag,
+                            category=RESOURCE_CATEGORIES.get(tag, tag),
+                            group=groups[-1] if groups else None,
+                            container=container.get("name"),
+                            container_type=container.tag or None,
+                        )
+                    )
+                elem.clear()
+            elif tag == "group":
+                groups.pop()
+                elem.clear()
+            elif tag.startswith(CONTAINER_PREFIXES):
+                containers.pop()
+                elem.clear()
+        return project
+
+    @staticmethod
+    def from_string(project: str) -> "IHCProject":
+        """Build the project from the project xml string."""
+        return IHCProject.from_events(
+            ET.iterparse(io.StringIO(project), events=("start", "end"))  # noqa: S314
+        )
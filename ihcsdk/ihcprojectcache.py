@@ -0,0 +1,59 @@
+"""Implements a disk cache for the ihc project."""
+
+import logging
+import re
+from pathlib import Path
+from typing import Any
+from urllib.parse import urlparse
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class IHCProjectCache:
+    """
+    Store the compressed ihc project data on disk.
+
+    The project is keyed by the controller url and the project major and minor
+    revision from get_project_info, so an unchanged project can be loaded
+    without downloading it from the controller.
+    """
+
+    def __init__(self, cachedir: str) -> None:
+        """Initialize the cache with the directory to store the projects in."""
+        self.cachedir = Path(cachedir)
+
+    def _get_prefix(self, url: str) -> str:
+        """Get the file name prefix for the controller url."""
+        host = re.sub(r"[^\w.-]", "_", urlparse(url).netloc)
+        return f"ihcproject_{host}_"
+
+    def _get_path(self, url: str, info: dict[str, Any]) -> Path:
+        """Get the cache file path for the project revision."""
+        major = info.get("projectMajorRevision", 0)
+        minor = info.get("projectMinorRevision", 0)
+        return self.cachedir / f"{self._get_prefix(url)}{major}_{minor}.gz"
+
+    def load(self, url: str, info: dict[str, Any]) -> bytes | None:
+        """Load the compressed project data. Return None if not in the cache."""
+        path = self._get_path(url, info)
+        try:
+            return path.read_bytes()
+        except FileNotFoundError:
+            return None
+        except OSError as exp:
+            _LOGGER.warning("Unable to read cached project %s: %s", path, exp)
+            return None
+
+    def save(self, url: str, info: dict[str, Any], data: bytes) -> None:
+        """Save the compressed project data and remove older revisions."""
+        path = self._get_path(url, info)
+        try:
+            self.cachedir.mkdir(parents=True, exist_ok=True)
+            for old in self.cachedir.glob(self._get_prefix(url) + "*.gz"):
+                if old != path:
+                    old.unlink(missing_ok=True)
+            tmppath = path.with_suffix(".tmp")
+            tmppath.write_bytes(data)
+            tmppath.replace(path)
+        except OSError as exp:
+            _LOGGER.warning("Unable to write cached project %s: %s", path, exp)
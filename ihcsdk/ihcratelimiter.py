@@ -0,0 +1,96 @@
+"""
+Implements a token bucket rate limiter for the soap requests.
+
+The limiter is thread safe and can be shared by several connections to the same
+controller. Requests with a higher priority (lower number) are granted a token
+before any waiting request with a lower priority.
+"""
+
+import threading
+import time
+
+# Request priorities, lower numbers are served first
+PRIORITY_WRITE = 0
+PRIORITY_READ = 1
+PRIORITY_BULK = 2
+
+
+class IHCRateLimiter:
+    """Token bucket rate limiter with request priorities."""
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        """
+        Initialize the rate limiter.
+
+        rate is the number of requests per second (0 will not rate limit) and
+        burst is the number of requests that can be done without waiting.
+        """
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._condition = threading.Condition()
+        self._waiting = [0, 0, 0]
+
+    def _refill(self) -> None:
+        """Add the tokens for the time since the last refill."""
+        now = time.monotonic()
+        self._tokens = min(
+            float(self.burst), self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def _take(self, priority: int) -> float:
+        """Take a token and return 0, or return the time until one is available."""
+        self._refill()
+        if self._tokens >= 1 and not any(self._waiting[:priority]):
+            self._tokens -= 1
+            return 0.0
+        return max((1 - self._tokens) / self.rate, 0.001)
+
+    def acquire(self, priority: int = PRIORITY_READ) -> float:
+        """Wait for a token and return the time waited in seconds."""
+        if self.rate <= 0:
+            return 0.0
+        start = time.monotonic()
+        with self._condition:
+            if self._take(priority) == 0:
+                return 0.0
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    wait = self._take(priority)
+                    if wait == 0:
+                        return time.monotonic() - start
+                    self._condition.wait(wait)
+            finally:
+                self._waiting[priority] -= 1
+                self._condition.notify_all()
+
+    def try_acquire(self, priority: int = PRIORITY_READ) -> float:
+        """
+        Take a token without waiting.
+
+        Returns 0 if the token was taken, otherwise the time in seconds until a
+        token is available. Used by the asyncio connection to sleep in the loop.
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self._condition:
+            return self._take(priority)
+
+    def add_waiter(self, priority: int) -> None:
+        """
+        Register a caller that waits outside acquire, like a coroutine.
+
+        The lower priority requests are not granted a token while it waits.
+        Call remove_waiter when it has a token or gives up.
+        """
+        with self._condition:
+            self._waiting[priority] += 1
+
+    def remove_waiter(self, priority: int) -> None:
+        """Remove a waiter registered by add_waiter."""
+        with self._condition:
+            self._waiting[priority] -= 1
+            self._condition.notify_all()
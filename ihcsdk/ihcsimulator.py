@@ -0,0 +1,729 @@
+"""
+Simulate an ihc controller for tests and benchmarks.
+
+The simulator is an in-process http server that answers the soap requests used by
+the sdk for the authentication, controller, resource interaction and configuration
+services. The latency, the project size and segments, the rate of runtime value
+changes and the faults can be configured, so the sdk can be exercised and load
+tested without a controller:
+
+    with IHCSimulator(resources=500) as simulator:
+        controller = IHCController(simulator.url, "user", "password")
+"""
+
+import base64
+import datetime
+import gzip
+import logging
+import math
+import random
+import secrets
+import threading
+import xml.etree.ElementTree as ET
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from xml.sax.saxutils import escape
+
+from ihcsdk.ihcclient import IHCSTATE_READY
+from ihcsdk.ihcdecoder import XSI_TYPE, decode_value
+
+_LOGGER = logging.getLogger(__name__)
+
+# Injected faults
+# A soap fault (http 500), classified as a fault by the connection
+FAULT_SOAP = "fault"
+# A soap fault telling that the session is not authenticated
+FAULT_AUTH = "auth"
+# A http 500 error without a soap fault
+FAULT_HTTP = "http"
+# A response that is not xml
+FAULT_GARBAGE = "garbage"
+# Close the connection without a response
+FAULT_DROP = "drop"
+# Hang for stall_time seconds and then close the connection
+FAULT_STALL = "stall"
+
+FAULTS = (FAULT_SOAP, FAULT_AUTH, FAULT_HTTP, FAULT_GARBAGE, FAULT_DROP, FAULT_STALL)
+
+ENVELOPE = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<SOAP-ENV:Envelope xmlns:SOAP-ENV="http://schemas.xmlsoap.org/soap/envelope/"'
+    ' xmlns:xsd="http://www.w3.org/2001/XMLSchema"'
+    ' xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"'
+    ' xmlns:ns1="utcs" xmlns:ns2="utcs.values">'
+    "<SOAP-ENV:Body>{}</SOAP-ENV:Body></SOAP-ENV:Envelope>"
+)
+SOAP_FAULT = (
+    "<SOAP-ENV:Fault><faultcode>SOAP-ENV:Server</faultcode>"
+    "<faultstring>{}</faultstring></SOAP-ENV:Fault>"
+)
+LOGIN = (
+    "<ns1:authenticate2><ns1:loginWasSuccessful>{}"
+    "</ns1:loginWasSuccessful></ns1:authenticate2>"
+)
+SOAP_BODY = "{http://schemas.xmlsoap.org/soap/envelope/}Body"
+
+# The service of each request, the requests with a payload are named by the
+# payload element without the number
+SERVICES = {
+    "authenticate": "/ws/AuthenticationService",
+    "getState": "/ws/ControllerService",
+    "waitForControllerStateChange": "/ws/ControllerService",
+    "getProjectInfo": "/ws/ControllerService",
+    "getIHCProject": "/ws/ControllerService",
+    "getIHCProjectNumberOfSegments": "/ws/ControllerService",
+    "getIHCProjectSegment": "/ws/ControllerService",
+    "getRuntimeValue": "/ws/ResourceInteractionService",
+    "getRuntimeValues": "/ws/ResourceInteractionService",
+    "setResourceValue": "/ws/ResourceInteractionService",
+    "setResourceValues": "/ws/ResourceInteractionService",
+    "enableRuntimeValueNotifications": "/ws/ResourceInteractionService",
+    "waitForResourceValueChanges": "/ws/ResourceInteractionService",
+    "getUserLog": "/ws/ConfigurationService",
+    "clearUserLog": "/ws/ConfigurationService",
+    "getSystemInfo": "/ws/ConfigurationService",
+}
+
+WSDL = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<definitions xmlns="http://schemas.xmlsoap.org/wsdl/" name="ControllerService">'
+    '<portType name="ControllerService">'
+    + "".join(
+        f'<operation name="{name}"/>'
+        for name, service in SERVICES.items()
+        if service == "/ws/ControllerService"
+    )
+    + "</portType></definitions>"
+)
+
+# The resource elements in the generated project, with the initial value
+RESOURCE_TYPES = (
+    ("dataline_input", False),
+    ("dataline_output", False),
+    ("airlink_relay", False),
+    ("resource_temperature", 21.5),
+    ("resource_integer", 0),
+)
+# Number of resources in a product and products in a group
+PRODUCT_SIZE = 5
+GROUP_SIZE = 4
+# First resource id in the generated project
+FIRST_RESOURCEID = 0x4000
+
+
+def encode_value(tag: str, value: Any) -> str:
+    """Encode a runtime value as a value element of a response."""
+    if isinstance(value, bool):
+        valuetype = "WSBooleanValue"
+        inner = f"<ns2:value>{'true' if value else 'false'}</ns2:value>"
+    elif isinstance(value, int):
+        valuetype = "WSIntegerValue"
+        inner = f"<ns2:integer>{value}</ns2:integer>"
+    elif isinstance(value, float):
+        valuetype = "WSFloatingPointValue"
+        inner = f"<ns2:floatingPointValue>{value}</ns2:floatingPointValue>"
+    elif isinstance(value, datetime.timedelta):
+        valuetype = "WSTimerValue"
+        milliseconds = value // datetime.timedelta(milliseconds=1)
+        inner = f"<ns2:milliseconds>{milliseconds}</ns2:milliseconds>"
+    elif isinstance(value, datetime.time):
+        valuetype = "WSTimeValue"
+        inner = (
+            f"<ns2:hours>{value.hour}</ns2:hours>"
+            f"<ns2:minutes>{value.minute}</ns2:minutes>"
+            f"<ns2:seconds>{value.second}</ns2:seconds>"
+        )
+    else:
+        valuetype = "WSEnumValue"
+        inner = f"<ns2:enumName>{escape(str(value))}</ns2:enumName>"
+    return f'<ns1:{tag} xsi:type="ns2:{valuetype}">{inner}</ns1:{tag}>'
+
+
+def encode_resource_value(resourceid: int, value: Any) -> str:
+    """Encode a resource value array item of a response."""
+    return (
+        f"<ns1:arrayItem>{encode_value('value', value)}<ns1:typeString/>"
+        f"<ns1:resourceID>{resourceid}</ns1:resourceID>"
+        "<ns1:isValueRuntime>true</ns1:isValueRuntime></ns1:arrayItem>"
+    )
+
+
+def generate_project(resources: int) -> tuple[bytes, dict[int, Any]]:
+    """
+    Generate a project with the number of resources.
+
+    Return the project xml and the initial values by resource id.
+    """
+    values = {}
+    parts = ['<?xml version="1.0" encoding="ISO-8859-1"?><utcs_project version="1">']
+    for index in range(resources):
+        if index % (PRODUCT_SIZE * GROUP_SIZE) == 0:
+            if index:
+                parts.append("</product_dataline></group>")
+            group = index // (PRODUCT_SIZE * GROUP_SIZE)
+            parts.append(f'<group name="Room {group}" id="_0x{0x100 + group:x}">')
+        elif index % PRODUCT_SIZE == 0:
+            parts.append("</product_dataline>")
+        if index % PRODUCT_SIZE == 0:
+            product = index // PRODUCT_SIZE
+            parts.append(
+                f'<product_dataline name="Product {product}"'
+                f' id="_0x{0x2000 + product:x}">'
+            )
+        resourceid = FIRST_RESOURCEID + index
+        tag, value = RESOURCE_TYPES[index % len(RESOURCE_TYPES)]
+        parts.append(f'<{tag} name="{tag} {index}" id="_0x{resourceid:x}"/>')
+        values[resourceid] = value
+    if resources:
+        parts.append("</product_dataline></group>")
+    parts.append("</utcs_project>")
+    return "".join(parts).encode("ISO-8859-1"), values
+
+
+@dataclass(slots=True)
+class IHCSimulatorSession:
+    """An authenticated session with the enabled notifications."""
+
+    enabled: set[int] = field(default_factory=set)
+    changes: deque = field(default_factory=lambda: deque(maxlen=10000))
+
+
+class IHCSimulator:
+    """Simulated ihc controller served by an in-process http server."""
+
+    def __init__(  # noqa: PLR0913
+        self,
+        username: str = "",
+        password: str = "",
+        resources: int = 100,
+        segments: int = 4,
+        *,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        seed: int | None = None,
+    ) -> None:
+        """
+        Initialize the simulator with a generated project.
+
+        Any username and password can login if the username is empty. Port 0
+        selects a free port, see url when the simulator is started.
+        """
+        self.username = username
+        self.password = password
+        self.host = host
+        self.port = port
+        # Seconds added to every response, plus a random jitter up to jitter
+        self.latency = 0.0
+        self.jitter = 0.0
+        # Random runtime value changes per second, and changes in each event
+        self.change_rate = 0.0
+        self.change_batch = 1
+        # Probability that a request fails with the fault_kind fault
+        self.fault_rate = 0.0
+        self.fault_kind = FAULT_HTTP
+        # Seconds a stalled request hangs before the connection is closed
+        self.stall_time = 30.0
+        # Reject requests without an authenticated session
+        self.require_auth = True
+        # Number of requests by name, see SERVICES
+        self.requests: Counter[str] = Counter()
+        self.state = IHCSTATE_READY
+        self.project_major = 1
+        self.project_minor = 0
+        self.segments = segments
+        self.system_info = {
+            "uptime": "1000",
+            "realtimeclock": "2024-01-01T00:00:00Z",
+            "serialNumber": "SIM0000001",
+            "productionDate": "2024-01-01",
+            "brand": "LK",
+            "version": "3.0",
+            "hwRevision": "6",
+            "swDate": "2024-01-01",
+            "datalineVersion": "1",
+            "rfModuleSoftwareVersion": "1",
+            "rfModuleSerialNumber": "0",
+            "applicationIsWithoutViewer": "false",
+            "smsModemSoftwareVersion": "0",
+            "ledDimmerSoftwareVersion": "0",
+        }
+        self.user_log = ""
+        self.project = b""
+        self.project_data = b""
+        self.values: dict[int, Any] = {}
+        self.sessions: dict[str, IHCSimulatorSession] = {}
+        self._faults: list[list] = []
+        self._random = random.Random(seed)  # noqa: S311
+        self._condition = threading.Condition()
+        self._stopped = threading.Event()
+        self._server: ThreadingHTTPServer | None = None
+        self._threads: list[threading.Thread] = []
+        self.set_project_size(resources)
+
+    @property
+    def url(self) -> str:
+        """Return the url of the running simulator."""
+        return f"http://{self.host}:{self.port}"
+
+    def __enter__(self) -> "IHCSimulator":  # noqa: PYI034
+        """Start the simulator."""
+        self.start()
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        """Stop the simulator."""
+        self.stop()
+
+    def start(self) -> str:
+        """Start the http server and the change generator, return the url."""
+        self._stopped.clear()
+        self._server = IHCSimulatorServer((self.host, self.port), self)
+        self.port = self._server.server_address[1]
+        self._threads = [
+            threading.Thread(
+                target=self._server.serve_forever, name="ihc-simulator", daemon=True
+            ),
+            threading.Thread(
+                target=self._change_fn, name="ihc-simulator-changes", daemon=True
+            ),
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self.url
+
+    def stop(self) -> None:
+        """Stop the http server and end the waiting long polls."""
+        self._stopped.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def set_project(self, project: bytes) -> None:
+        """Set the project xml, and a new project revision."""
+        with self._condition:
+            self.project = project
+            self.project_data = gzip.compress(project)
+            self.project_minor += 1
+
+    def set_project_size(self, resources: int) -> None:
+        """Generate a project with the number of resources and reset the values."""
+        project, values = generate_project(resources)
+        self.set_project(project)
+        with self._condition:
+            self.values = values
+
+    def set_state(self, state: str) -> None:
+        """Change the controller state."""
+        with self._condition:
+            self.state = state
+            self._condition.notify_all()
+
+    def get_value(self, resourceid: int) -> Any:
+        """Get a runtime value."""
+        return self.values.get(resourceid)
+
+    def set_value(self, resourceid: int, value: Any) -> None:
+        """Change a runtime value, like a change in the installation."""
+        with self._condition:
+            self._set_value(resourceid, value)
+            self._condition.notify_all()
+
+    def _set_value(self, resourceid: int, value: Any) -> None:
+        """Change a runtime value and queue the change, with the lock held."""
+        self.values[resourceid] = value
+        for session in self.sessions.values():
+            if resourceid in session.enabled:
+                session.changes.append((resourceid, value))
+
+    def generate_changes(self, count: int) -> None:
+        """Change count random runtime values with notifications enabled."""
+        with self._condition:
+            resourceids = set()
+            for session in self.sessions.values():
+                resourceids.update(session.enabled)
+            candidates = sorted(resourceids & self.values.keys()) or list(self.values)
+            if not candidates:
+                return
+            for _ in range(count):
+                resourceid = self._random.choice(candidates)
+                self._set_value(resourceid, self._next_value(self.values[resourceid]))
+            self._condition.notify_all()
+
+    def _next_value(self, value: Any) -> Any:
+        """Get a new random value of the same type."""
+        if isinstance(value, bool):
+            return not value
+        if isinstance(value, int):
+            return value + 1
+        if isinstance(value, float):
+            return round(value + self._random.choice((-0.5, 0.5)), 2)
+        return value
+
+    def _change_fn(self) -> None:
+        """Change generator thread function."""
+        delay = 0.1
+        while not self._stopped.wait(delay):
+            rate = self.change_rate
+            if rate <= 0:
+                delay = 0.1
+                continue
+            delay = self._random.expovariate(rate)
+            self.generate_changes(self.change_batch)
+
+    def expire_sessions(self) -> None:
+        """Expire all the sessions, the clients must authenticate again."""
+        with self._condition:
+            self.sessions.clear()
+            self._condition.notify_all()
+
+    def inject_fault(
+        self, kind: str = FAULT_HTTP, count: int = 1, request: str | None = None
+    ) -> None:
+        """
+        Fail the next count requests with the fault.
+
+        Only the requests with the name (see SERVICES) fail if request is given.
+        """
+        if kind not in FAULTS:
+            msg = f"Unknown fault {kind}"
+            raise ValueError(msg)
+        with self._condition:
+            self._faults.append([kind, count, request])
+
+    def count_request(self, request: str) -> None:
+        """Count a request, called by the handler threads."""
+        with self._condition:
+            self.requests[request] += 1
+
+    def take_fault(self, request: str) -> str | None:
+        """Get the fault for a request, None if it should not fail."""
+        with self._condition:
+            for fault in self._faults:
+                if fault[2] is None or fault[2] == request:
+                    fault[1] -= 1
+                    if fault[1] <= 0:
+                        self._faults.remove(fault)
+                    return fault[0]
+            if self.fault_rate > 0 and self._random.random() < self.fault_rate:
+                return self.fault_kind
+        return None
+
+    def delay(self) -> float:
+        """Get the simulated latency for a response."""
+        if self.jitter > 0:
+            return self.latency + self._random.uniform(0, self.jitter)
+        return self.latency
+
+    def get_session(self, cookie: str | None) -> IHCSimulatorSession | None:
+        """Get the session from the cookie header."""
+        if cookie is None:
+            return None
+        for part in cookie.split(";"):
+            name, _, value = part.strip().partition("=")
+            if name == "JSESSIONID":
+                return self.sessions.get(value)
+        return None
+
+    def handle(
+        self, name: str, body: ET.Element, session: IHCSimulatorSession | None
+    ) -> tuple[str, str | None]:
+        """
+        Handle a request with the soap body element and return the response.
+
+        The second item is the id of a new session when a login succeeds. Raise
+        IHCSimulatorError to answer with a soap fault.
+        """
+        if name == "authenticate":
+            return self._authenticate(body)
+        return getattr(self, "_" + name)(body, session), None
+
+    def _authenticate(self, body: ET.Element) -> tuple[str, str | None]:
+        """Login and create a session."""
+        username = body.findtext("{utcs}authenticate1/{utcs}username")
+        password = body.findtext("{utcs}authenticate1/{utcs}password")
+        if self.username and (username, password) != (self.username, self.password):
+            return LOGIN.format("false"), None
+        sessionid = secrets.token_hex(16)
+        with self._condition:
+            self.sessions[sessionid] = IHCSimulatorSession()
+        return LOGIN.format("true"), sessionid
+
+    def _getState(self, *_: object) -> str:  # noqa: N802
+        return f"<ns1:getState1><ns1:state>{self.state}</ns1:state></ns1:getState1>"
+
+    def _waitForControllerStateChange(self, body: ET.Element, *_: object) -> str:  # noqa: N802
+        state = body.findtext(".//{utcs}state")
+        wait = int(body.findtext("{utcs}waitForControllerStateChange2") or 0)
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self.state != state or self._stopped.is_set(), wait
+            )
+            state = self.state
+        return (
+            "<ns1:waitForControllerStateChange3>"
+            f"<ns1:state>{state}</ns1:state></ns1:waitForControllerStateChange3>"
+        )
+
+    def _getProjectInfo(self, *_: object) -> str:  # noqa: N802
+        return (
+            "<ns1:getProjectInfo1>"
+            '<ns1:visualMinorVersion xsi:type="xsd:int">0</ns1:visualMinorVersion>'
+            '<ns1:visualMajorVersion xsi:type="xsd:int">1</ns1:visualMajorVersion>'
+            '<ns1:projectMajorRevision xsi:type="xsd:int">'
+            f"{self.project_major}</ns1:projectMajorRevision>"
+            '<ns1:projectMinorRevision xsi:type="xsd:int">'
+            f"{self.project_minor}</ns1:projectMinorRevision>"
+            '<ns1:projectNumber xsi:type="xsd:string">1</ns1:projectNumber>'
+            '<ns1:customerName xsi:type="xsd:string">Simulator</ns1:customerName>'
+            "</ns1:getProjectInfo1>"
+        )
+
+    def _getIHCProject(self, *_: object) -> str:  # noqa: N802
+        data = base64.b64encode(self.project_data).decode()
+        return f"<ns1:getIHCProject1><ns1:data>{data}</ns1:data></ns1:getIHCProject1>"
+
+    def _getIHCProjectNumberOfSegments(self, *_: object) -> str:  # noqa: N802
+        return (
+            "<ns1:getIHCProjectNumberOfSegments1>"
+            f"{self.segments}</ns1:getIHCProjectNumberOfSegments1>"
+        )
+
+    def _getIHCProjectSegment(self, body: ET.Element, *_: object) -> str:  # noqa: N802
+        segment = int(body.findtext("{utcs}getIHCProjectSegment1"))
+        major = int(body.findtext("{utcs}getIHCProjectSegment2"))
+        minor = int(body.findtext("{utcs}getIHCProjectSegment3"))
+        if (major, minor) != (self.project_major, self.project_minor):
+            msg = "The project revision has changed"
+            raise IHCSimulatorError(msg)
+        size = math.ceil(len(self.project_data) / max(self.segments, 1))
+        data = self.project_data[segment * size : (segment + 1) * size]
+        return (
+            "<ns1:getIHCProjectSegment4><ns1:data>"
+            f"{base64.b64encode(data).decode()}</ns1:data></ns1:getIHCProjectSegment4>"
+        )
+
+    def _getRuntimeValue(self, body: ET.Element, *_: object) -> str:  # noqa: N802
+        resourceid = int(body.findtext("{utcs}getRuntimeValue1"))
+        value = self.values.get(resourceid)
+        if value is None:
+            msg = f"Unknown resource {resourceid}"
+            raise IHCSimulatorError(msg)
+        value = encode_value("value", value)
+        return f"<ns1:getRuntimeValue2>{value}</ns1:getRuntimeValue2>"
+
+    def _getRuntimeValues(self, body: ET.Element, *_: object) -> str:  # noqa: N802
+        items = []
+        for item in body.iterfind("{utcs}getRuntimeValues1/{utcs}arrayItem"):
+            resourceid = int(item.text)
+            value = self.values.get(resourceid)
+            if value is not None:
+                items.append(encode_resource_value(resourceid, value))
+        return f"<ns1:getRuntimeValues2>{''.join(items)}</ns1:getRuntimeValues2>"
+
+    def _set_request_value(self, item: ET.Element) -> bool:
+        """Set the value from a setResourceValue(s) item, return False if unknown."""
+        resourceid = int(item.findtext("{utcs}resourceID"))
+        element = item.find("{utcs}value")
+        if resourceid not in self.values or element is None:
+            return False
+        value = decode_value(element)
+        if element.attrib[XSI_TYPE].endswith(":WSTimerValue"):
+            value = datetime.timedelta(milliseconds=value)
+        with self._condition:
+            self._set_value(resourceid, value)
+            self._condition.notify_all()
+        return True
+
+    def _setResourceValue(self, body: ET.Element, *_: object) -> str:  # noqa: N802
+        result = self._set_request_value(body.find("{utcs}setResourceValue1"))
+        return (
+            f"<ns1:setResourceValue2>{'true' if result else 'false'}"
+            "</ns1:setResourceValue2>"
+        )
+
+    def _setResourceValues(self, body: ET.Element, *_: object) -> str:  # noqa: N802
+        results = (
+            self._set_request_value(item)
+            for item in body.iterfind("{utcs}setResourceValues1/{utcs}arrayItem")
+        )
+        items = "".join(
+            f"<ns1:arrayItem>{'true' if result else 'false'}</ns1:arrayItem>"
+            for result in results
+        )
+        return f"<ns1:setResourceValues2>{items}</ns1:setResourceValues2>"
+
+    def _enableRuntimeValueNotifications(  # noqa: N802
+        self, body: ET.Element, session: IHCSimulatorSession | None
+    ) -> str:
+        resourceids = [
+            int(item.text) for item in body.iter() if item.tag.endswith("arrayItem")
+        ]
+        with self._condition:
+            if session is not None:
+                for resourceid in resourceids:
+                    # The first poll returns the current values
+                    if resourceid in self.values:
+                        session.enabled.add(resourceid)
+                        session.changes.append((resourceid, self.values[resourceid]))
+            self._condition.notify_all()
+        return "<ns1:enableRuntimeValueNotifications2/>"
+
+    def _waitForResourceValueChanges(  # noqa: N802
+        self, body: ET.Element, session: IHCSimulatorSession | None
+    ) -> str:
+        wait = int(body.findtext("{utcs}waitForResourceValueChanges1") or 0)
+        changes = []
+        if session is not None:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: session.changes or self._stopped.is_set(), wait
+                )
+                changes = list(session.changes)
+                session.changes.clear()
+        items = "".join(
+            encode_resource_value(resourceid, value) for resourceid, value in changes
+        )
+        return (
+            f"<ns1:waitForResourceValueChanges2>{items}"
+            "</ns1:waitForResourceValueChanges2>"
+        )
+
+    def _getUserLog(self, *_: object) -> str:  # noqa: N802
+        data = base64.b64encode(self.user_log.encode("UTF-8")).decode()
+        return f"<ns1:getUserLog4><ns1:data>{data}</ns1:data></ns1:getUserLog4>"
+
+    def _clearUserLog(self, *_: object) -> str:  # noqa: N802
+        self.user_log = ""
+        return ""
+
+    def _getSystemInfo(self, *_: object) -> str:  # noqa: N802
+        items = "".join(
+            f"<ns1:{name}>{escape(value)}</ns1:{name}>"
+            for name, value in self.system_info.items()
+        )
+        return f"<ns1:getSystemInfo1>{items}</ns1:getSystemInfo1>"
+
+
+class IHCSimulatorError(Exception):
+    """Answer a simulated request with a soap fault."""
+
+
+class IHCSimulatorServer(ThreadingHTTPServer):
+    """The http server of a simulator."""
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], simulator: IHCSimulator) -> None:
+        """Initialize the server for the simulator."""
+        self.simulator = simulator
+        super().__init__(address, IHCSimulatorHandler)
+
+
+class IHCSimulatorHandler(BaseHTTPRequestHandler):
+    """Handle the http requests to the simulator."""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: IHCSimulatorServer
+
+    def log_message(self, format: str, *args: object) -> None:  # noqa: A002
+        """Log the requests at debug level."""
+        _LOGGER.debug(format, *args)
+
+    def do_GET(self) -> None:
+        """Answer the wsdl request used to detect a controller."""
+        if self.path != "/wsdl/controller.wsdl":
+            self.send(HTTPStatus.NOT_FOUND, b"")
+            return
+        self.send(HTTPStatus.OK, WSDL.encode())
+
+    def do_POST(self) -> None:
+        """Handle a soap request."""
+        simulator = self.server.simulator
+        data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        try:
+            body = ET.fromstring(data).find(SOAP_BODY)  # noqa: S314
+        except ET.ParseError:
+            body = None
+        if body is None:
+            self.send(HTTPStatus.BAD_REQUEST, b"")
+            return
+        name = self.get_name(body, self.headers.get("SOAPAction", ""))
+        if SERVICES.get(name) != self.path:
+            self.send(HTTPStatus.NOT_FOUND, b"")
+            return
+        simulator.count_request(name)
+        delay = simulator.delay()
+        if delay > 0:
+            simulator._stopped.wait(delay)  # noqa: SLF001
+        fault = simulator.take_fault(name)
+        if fault is not None:
+            self.send_fault(fault)
+            return
+        session = simulator.get_session(self.headers.get("Cookie"))
+        if simulator.require_auth and session is None and name != "authenticate":
+            self.send_soap_fault("Session is not authenticated")
+            return
+        try:
+            response, sessionid = simulator.handle(name, body, session)
+        except IHCSimulatorError as fault:
+            self.send_soap_fault(str(fault))
+            return
+        headers = {}
+        if sessionid is not None:
+            headers["Set-Cookie"] = f"JSESSIONID={sessionid}; Path=/"
+        self.send(HTTPStatus.OK, ENVELOPE.format(response).encode(), headers)
+
+    @staticmethod
+    def get_name(body: ET.Element, action: str) -> str:
+        """Get the request name from the first payload element or the action."""
+        if len(body) == 0:
+            return action
+        return body[0].tag.split("}")[-1].rstrip("0123456789")
+
+    def send(
+        self, status: int, data: bytes, headers: dict[str, str] | None = None
+    ) -> None:
+        """Send a response."""
+        self.send_response(status)
+        self.send_header("Content-Type", "text/xml; charset=UTF-8")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_soap_fault(self, faultstring: str) -> None:
+        """Send a soap fault."""
+        self.send(
+            HTTPStatus.INTERNAL_SERVER_ERROR,
+            ENVELOPE.format(SOAP_FAULT.format(escape(faultstring))).encode(),
+        )
+
+    def send_fault(self, fault: str) -> None:
+        """Send an injected fault."""
+        match fault:
+            case "fault":
+                self.send_soap_fault("Simulated fault")
+            case "auth":
+                self.send_soap_fault("Session is not authenticated")
+            case "http":
+                self.send(HTTPStatus.INTERNAL_SERVER_ERROR, b"Internal Server Error")
+            case "garbage":
+                self.send(HTTPStatus.OK, b"<SOAP-ENV:Envelope><garbage")
+            case "stall":
+                self.server.simulator._stopped.wait(  # noqa: SLF001
+                    self.server.simulator.stall_time
+                )
+                self.close_connection = True
+            case _:
+                self.close_connection = True
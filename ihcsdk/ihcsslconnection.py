@@ -17,12 +17,9 @@ class IHCSSLConnection(IHCConnection):
 
     def __init__(self, url: str) -> None:
         """Initialize the IHCSSLConnection with a url for the controller."""
-        super().__init__(url)
         self.cert_file = os.path.dirname(__file__) + "/certs/ihc3.crt"
-        self.session.mount(
-            "https://",
-            CertAdapter(self.get_fingerprint_from_cert(), max_retries=self.retries),
-        )
+        self.fingerprint = self.get_fingerprint_from_cert()
+        super().__init__(url)
 
     def get_fingerprint_from_cert(self) -> str:
         """Get the fingerprint from the certificate."""
@@ -31,6 +28,18 @@ class IHCSSLConnection(IHCConnection):
         f = cert.fingerprint(hashes.SHA1())
         return "".join("{:02x}".format(x) for x in f)
 
+    def create_adapter(
+        self, maxsize: int, block: bool, *, longpoll: bool = False
+    ) -> "CertAdapter":
+        """Create a http adapter for the controller certificate."""
+        return CertAdapter(
+            self.fingerprint,
+            pool_connections=1,
+            pool_maxsize=maxsize,
+            pool_block=block,
+            max_retries=self.retries.new(read=False) if longpoll else self.retries,
+        )
+
     def cert_verify(self) -> str:
         return self.cert_file
 
@@ -0,0 +1,132 @@
+"""
+Implements the notify subscriptions for the resources.
+
+The callbacks for a resource are kept as a tuple that is replaced when a callback
+is added or removed, so the notify thread can use it without a lock. New resources
+are collected until they are enabled in one request. A resource can also be
+watched without callbacks, like by a change stream.
+"""
+
+import threading
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator
+from typing import Any
+
+Callback = Callable[[int, Any], Any]
+
+
+class IHCSubscriptions:
+    """The notify callbacks by resource id and the resources to enable."""
+
+    def __init__(self) -> None:
+        """Initialize the subscriptions."""
+        self._callbacks: dict[int, tuple[Callback, ...]] = {}
+        # Number of watchers by resource id
+        self._watchers: Counter[int] = Counter()
+        self._pending: set[int] = set()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Return the number of subscribed resources."""
+        return len(self._callbacks.keys() | self._watchers.keys())
+
+    def __contains__(self, resourceid: int) -> bool:
+        """Return True if there are callbacks or watchers for the resource."""
+        return resourceid in self._callbacks or resourceid in self._watchers
+
+    def get(self, resourceid: int) -> tuple[Callback, ...] | None:
+        """Get the callbacks for a resource."""
+        return self._callbacks.get(resourceid)
+
+    def resourceids(self) -> list[int]:
+        """Get the subscribed resource ids."""
+        return list(self._callbacks.keys() | self._watchers.keys())
+
+    def add(self, resourceid: int, callback: Callback) -> bool:
+        """
+        Add a callback for a resource.
+
+        Return True if the resource is new, it is then pending to be enabled.
+        """
+        with self._lock:
+            callbacks = self._callbacks.get(resourceid)
+            if callbacks is None:
+                self._callbacks[resourceid] = (callback,)
+                if resourceid in self._watchers:
+                    return False
+                self._pending.add(resourceid)
+                return True
+            if callback not in callbacks:
+                self._callbacks[resourceid] = (*callbacks, callback)
+            return False
+
+    def remove(self, resourceid: int, callback: Callback | None = None) -> bool:
+        """
+        Remove a callback, or all the callbacks if None, for a resource.
+
+        Return True if the resource has no callbacks or watchers left and was
+        removed.
+        """
+        with self._lock:
+            callbacks = self._callbacks.get(resourceid)
+            if callbacks is None:
+                return False
+            if callback is not None:
+                callbacks = tuple(cb for cb in callbacks if cb != callback)
+                if callbacks:
+                    self._callbacks[resourceid] = callbacks
+                    return False
+            del self._callbacks[resourceid]
+            if resourceid in self._watchers:
+                return False
+            self._pending.discard(resourceid)
+            return True
+
+    def watch(self, resourceids: Iterable[int]) -> None:
+        """Watch the resources, the new resources are pending to be enabled."""
+        with self._lock:
+            for resourceid in resourceids:
+                if (
+                    resourceid not in self._callbacks
+                    and resourceid not in self._watchers
+                ):
+                    self._pending.add(resourceid)
+                self._watchers[resourceid] += 1
+
+    def unwatch(self, resourceids: Iterable[int]) -> list[int]:
+        """Stop watching the resources, and return the removed resources."""
+        removed = []
+        with self._lock:
+            for resourceid in resourceids:
+                if resourceid not in self._watchers:
+                    continue
+                self._watchers[resourceid] -= 1
+                if self._watchers[resourceid] > 0:
+                    continue
+                del self._watchers[resourceid]
+                if resourceid not in self._callbacks:
+                    self._pending.discard(resourceid)
+                    removed.append(resourceid)
+        return removed
+
+    def take_pending(self) -> list[int]:
+        """Get and clear the resources that should be enabled."""
+        with self._lock:
+            pending = list(self._pending)
+            self._pending.clear()
+            return pending
+
+    def set_pending(self, resourceids: Iterable[int]) -> None:
+        """Mark subscribed resources to be enabled again, like after a failure."""
+        with self._lock:
+            self._pending.update(
+                resourceid
+                for resourceid in resourceids
+                if resourceid in self._callbacks or resourceid in self._watchers
+            )
+
+    @staticmethod
+    def chunks(resourceids: list[int], chunksize: int) -> Iterator[list[int]]:
+        """Split the resource ids in chunks with at most chunksize ids."""
+        for start in range(0, len(resourceids), chunksize):
+            yield resourceids[start : start + chunksize]
@@ -0,0 +1,120 @@
+"""
+Implements a cache of the runtime values.
+
+The values for the subscribed resources are kept up to date by the notifications,
+so they can be read from memory. Other values are kept in a LRU with a size cap
+and are only used if they are not older than the max age of the read.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterable
+from typing import Any
+
+
+class IHCValueCache:
+    """Cache of runtime values with the time they were received."""
+
+    def __init__(self, maxsize: int = 1000) -> None:
+        """Initialize the cache with the maximum number of unsubscribed values."""
+        self.maxsize = maxsize
+        self._subscribed: set[int] = set()
+        # Values for the subscribed resources, (value, time) by resource id
+        self._values: dict[int, tuple[Any, float]] = {}
+        # LRU of the values for the unsubscribed resources
+        self._lru: OrderedDict[int, tuple[Any, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Return the number of cached values."""
+        return len(self._values) + len(self._lru)
+
+    def subscribe(self, resourceids: Iterable[int]) -> None:
+        """Mark the resources as updated by notifications."""
+        with self._lock:
+            for resourceid in resourceids:
+                self._subscribed.add(resourceid)
+                entry = self._lru.pop(resourceid, None)
+                if entry is not None:
+                    self._values[resourceid] = entry
+
+    def unsubscribe(self, resourceids: Iterable[int]) -> None:
+        """Remove the resources from the subscribed resources."""
+        with self._lock:
+            for resourceid in resourceids:
+                self._subscribed.discard(resourceid)
+                entry = self._values.pop(resourceid, None)
+                if entry is not None:
+                    self._set_lru(resourceid, entry)
+
+    def is_subscribed(self, resourceid: int) -> bool:
+        """Return True if the resource is updated by notifications."""
+        return resourceid in self._subscribed
+
+    def update(self, resourceid: int, value: Any) -> None:
+        """Set the value for a resource."""
+        entry = (value, time.monotonic())
+        with self._lock:
+            if resourceid in self._subscribed:
+                self._values[resourceid] = entry
+            else:
+                self._set_lru(resourceid, entry)
+
+    def update_many(self, values: Iterable[tuple[int, Any]]) -> None:
+        """Set the values from (id, value) tuples."""
+        now = time.monotonic()
+        with self._lock:
+            for resourceid, value in values:
+                if resourceid in self._subscribed:
+                    self._values[resourceid] = (value, now)
+                else:
+                    self._set_lru(resourceid, (value, now))
+
+    def _set_lru(self, resourceid: int, entry: tuple[Any, float]) -> None:
+        """Set an unsubscribed entry and evict the least recently used."""
+        self._lru[resourceid] = entry
+        self._lru.move_to_end(resourceid)
+        while len(self._lru) > self.maxsize:
+            self._lru.popitem(last=False)
+
+    def get(self, resourceid: int, max_age: float | None = None) -> Any:
+        """
+        Get a cached value, or None if there is no usable value.
+
+        The value for a subscribed resource is always used. An unsubscribed value
+        is only used if max_age is set and the value is not older than max_age
+        seconds.
+        """
+        with self._lock:
+            entry = self._values.get(resourceid)
+            if entry is not None:
+                return entry[0]
+            if max_age is None:
+                return None
+            entry = self._lru.get(resourceid)
+            if entry is None or time.monotonic() - entry[1] > max_age:
+                return None
+            self._lru.move_to_end(resourceid)
+            return entry[0]
+
+    def age(self, resourceid: int) -> float | None:
+        """Get the age of a cached value in seconds, None if not cached."""
+        with self._lock:
+            entry = self._values.get(resourceid) or self._lru.get(resourceid)
+        if entry is None:
+            return None
+        return time.monotonic() - entry[1]
+
+    def invalidate(self, resourceids: Iterable[int]) -> None:
+        """Remove the cached values, they will be read from the controller."""
+        with self._lock:
+            for resourceid in resourceids:
+                self._values.pop(resourceid, None)
+                self._lru.pop(resourceid, None)
+
+    def clear(self) -> None:
+        """Remove all the cached values, but keep the subscriptions."""
+        with self._lock:
+            self._values.clear()
+            self._lru.clear()
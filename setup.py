@@ -17,6 +17,10 @@ setup(
         "requests",
         "cryptography",
     ],
+    extras_require={
+        "async": ["aiohttp"],
+        "lxml": ["lxml"],
+    },
     license="GPL-3.0",
     include_package_data=True,
 )
@@ -0,0 +1,12 @@
+"""Helpers for the tests."""
+
+import time
+from collections.abc import Callable
+
+
+def wait_for(predicate: Callable[[], bool], timeout: float = 5) -> None:
+    """Wait until the predicate is true."""
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timeout"
+        time.sleep(0.01)
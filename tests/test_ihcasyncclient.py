@@ -0,0 +1,83 @@
+"""Test the async soap client against the simulator."""
+
+import asyncio
+import time
+
+from ihcsdk.ihcasyncclient import AsyncIHCSoapClient
+from ihcsdk.ihcclient import IHCSoapClient
+from ihcsdk.ihcconnection import ERROR_AUTH, ERROR_TIMEOUT
+from ihcsdk.ihcsimulator import FAULT_AUTH, IHCSimulator
+
+
+def test_last_error_per_task() -> None:
+    """A concurrent request does not clear the error of a failed request."""
+
+    async def run(simulator: IHCSimulator) -> tuple:
+        client = AsyncIHCSoapClient(simulator.url)
+        assert await client.authenticate("user", "password")
+        simulator.latency = 0.3
+        simulator.inject_fault(FAULT_AUTH, request="getState")
+
+        async def get_state() -> tuple:
+            return await client.get_state(), client.connection.last_error
+
+        async def get_values() -> tuple:
+            await asyncio.sleep(0.1)
+            values = await client.get_runtime_values(list(simulator.values)[:2])
+            return values, client.connection.last_error
+
+        results = await asyncio.gather(get_state(), get_values())
+        await client.close()
+        return results
+
+    with IHCSimulator("user", "password", resources=2) as simulator:
+        (state, state_error), (values, values_error) = asyncio.run(run(simulator))
+    assert state is False
+    assert state_error == ERROR_AUTH
+    assert values
+    assert values_error is None
+
+
+def test_project_in_segments() -> None:
+    """The segments are downloaded concurrently, like the sync client does."""
+
+    async def run(simulator: IHCSimulator) -> tuple:
+        client = AsyncIHCSoapClient(simulator.url)
+        assert await client.authenticate("user", "password")
+        simulator.latency = 0.1
+        start = time.monotonic()
+        project = await client.get_project_in_segments(max_workers=8)
+        elapsed = time.monotonic() - start
+        tags = [element.tag async for _, element in client.iter_project()]
+        await client.close()
+        return project, elapsed, tags
+
+    with IHCSimulator("user", "password", segments=8) as simulator:
+        project, elapsed, tags = asyncio.run(run(simulator))
+        client = IHCSoapClient(simulator.url)
+        assert client.authenticate("user", "password")
+        simulator.latency = 0
+        expected = client.get_project_in_segments()
+        expected_tags = [element.tag for _, element in client.iter_project()]
+        client.close()
+    assert project == expected
+    assert tags == expected_tags
+    # The info, the number of segments and one round of 8 segments
+    assert elapsed < 0.6
+
+
+def test_change_list_timeout() -> None:
+    """A long poll without a response within the timeout fails."""
+
+    async def run(simulator: IHCSimulator) -> tuple:
+        client = AsyncIHCSoapClient(simulator.url)
+        assert await client.authenticate("user", "password")
+        changes = await client.wait_for_resource_value_change_list(2, timeout=0.5)
+        error = client.connection.last_error
+        await client.close()
+        return changes, error
+
+    with IHCSimulator("user", "password") as simulator:
+        changes, error = asyncio.run(run(simulator))
+    assert changes is False
+    assert error == ERROR_TIMEOUT
@@ -0,0 +1,84 @@
+"""Test the soap client against the simulator."""
+
+import datetime
+from collections.abc import Iterator
+
+import pytest
+
+from ihcsdk.ihcclient import IHCSoapClient
+from ihcsdk.ihcsimulator import FAULT_HTTP, IHCSimulator
+
+
+@pytest.fixture
+def simulator() -> Iterator[IHCSimulator]:
+    """Run a simulator."""
+    with IHCSimulator("user", "password", resources=10) as simulator:
+        yield simulator
+
+
+@pytest.fixture
+def client(simulator: IHCSimulator) -> Iterator[IHCSoapClient]:
+    """Get an authenticated client for the simulator."""
+    client = IHCSoapClient(simulator.url)
+    assert client.authenticate("user", "password")
+    yield client
+    client.close()
+
+
+@pytest.mark.parametrize("milliseconds", [1, 999, 1001, 1003, 86_400_001])
+def test_timer_round_trip(
+    simulator: IHCSimulator, client: IHCSoapClient, milliseconds: int
+) -> None:
+    """A timer value is written and read back to the millisecond."""
+    resourceid = next(iter(simulator.values))
+    timer = datetime.timedelta(milliseconds=milliseconds)
+    assert client.set_runtime_values({resourceid: timer}) == {resourceid: True}
+    assert simulator.get_value(resourceid) == timer
+    assert client.get_runtime_value(resourceid) == milliseconds
+
+
+def test_set_pool_size_closes_the_previous_pool(client: IHCSoapClient) -> None:
+    """The connections of the replaced pool are closed."""
+    connection = client.connection
+    assert client.get_state()
+    prefix = "http://"
+    previous = connection.session.adapters[prefix]
+    longpoll = connection.longpoll_session.adapters[prefix]
+    assert len(previous.poolmanager.pools) == 1
+    connection.set_pool_size(8)
+    assert len(previous.poolmanager.pools) == 0
+    assert connection.session.adapters[prefix] is not previous
+    assert connection.longpoll_session.adapters[prefix] is longpoll
+    assert client.get_state()
+
+
+def test_set_runtime_values_results(
+    simulator: IHCSimulator, client: IHCSoapClient
+) -> None:
+    """Each resource gets the result of its item, in the chunks."""
+    first, second, third = list(simulator.values)[:3]
+    unknown = max(simulator.values) + 1
+    values = {first: True, unknown: 5, second: 21.5, third: 7}
+    assert client.set_runtime_values(values, chunksize=2) == {
+        first: True,
+        unknown: False,
+        second: True,
+        third: True,
+    }
+    assert simulator.get_value(second) == 21.5
+    assert simulator.get_value(third) == 7
+
+
+def test_set_runtime_values_failed_chunk(
+    simulator: IHCSimulator, client: IHCSoapClient
+) -> None:
+    """The resources of a failed request are False, the other chunks are set."""
+    first, second, third = list(simulator.values)[:3]
+    simulator.inject_fault(FAULT_HTTP, request="setResourceValues")
+    values = {first: 1, second: 2, third: 3}
+    assert client.set_runtime_values(values, chunksize=2) == {
+        first: False,
+        second: False,
+        third: True,
+    }
+    assert simulator.get_value(third) == 3
@@ -0,0 +1,54 @@
+"""Test the coalesced reads against the simulator."""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from ihcsdk.ihcconnection import ERROR_AUTH
+from ihcsdk.ihccontroller import IHCController
+from ihcsdk.ihcsimulator import IHCSimulator
+
+READERS = 8
+
+
+def test_concurrent_reads_after_session_expiry() -> None:
+    """All the coalesced reads re-authenticate and get their value."""
+    with IHCSimulator("user", "password", resources=READERS) as simulator:
+        simulator.latency = 0.05
+        controller = IHCController(simulator.url, "user", "password")
+        assert controller.authenticate()
+        resourceids = list(simulator.values)[:READERS]
+        simulator.expire_sessions()
+        barrier = threading.Barrier(READERS)
+
+        def read(resourceid: int) -> object:
+            barrier.wait()
+            return controller.get_runtime_value(resourceid)
+
+        with ThreadPoolExecutor(READERS) as executor:
+            values = list(executor.map(read, resourceids))
+        controller.disconnect()
+        assert values == [simulator.get_value(i) for i in resourceids]
+        assert controller.client.read_batcher.batched > 0
+        # The readers of a request share the re-authentication
+        assert simulator.requests["authenticate"] < 1 + READERS
+
+
+def test_shared_failure_sets_last_error() -> None:
+    """The callers of a shared request get the error of the request."""
+    with IHCSimulator("user", "password") as simulator:
+        simulator.latency = 0.05
+        controller = IHCController(simulator.url, "user", "password")
+        assert controller.authenticate()
+        simulator.expire_sessions()
+        client = controller.client
+        barrier = threading.Barrier(READERS)
+
+        def get_state() -> tuple[object, str | None]:
+            barrier.wait()
+            return client.get_state(), client.connection.last_error
+
+        with ThreadPoolExecutor(READERS) as executor:
+            results = list(executor.map(lambda _: get_state(), range(READERS)))
+        controller.disconnect()
+        assert results == [(False, ERROR_AUTH)] * READERS
+        assert simulator.requests["getState"] < READERS
@@ -0,0 +1,127 @@
+"""Test the controller against the simulator."""
+
+import queue
+import threading
+import time
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from ihcsdk.ihccontroller import IHCController
+from ihcsdk.ihclongpoll import IHCLongPollTuner
+from ihcsdk.ihcsimulator import FAULT_HTTP, IHCSimulator
+from tests.common import wait_for
+
+THREADS = 8
+
+
+@pytest.fixture
+def simulator() -> Iterator[IHCSimulator]:
+    """Run a simulator."""
+    with IHCSimulator("user", "password", resources=20) as simulator:
+        yield simulator
+
+
+@pytest.fixture
+def controller(simulator: IHCSimulator) -> Iterator[IHCController]:
+    """Get an authenticated controller for the simulator."""
+    controller = IHCController(simulator.url, "user", "password")
+    controller.retryinitial = 0.05
+    assert controller.authenticate()
+    yield controller
+    controller.disconnect()
+
+
+def test_single_attempt_sets_auth_error(
+    simulator: IHCSimulator, controller: IHCController
+) -> None:
+    """A failed attempt of the notify thread makes the callers fail fast."""
+    simulator.inject_fault(FAULT_HTTP, count=100, request="authenticate")
+    assert not controller.re_authenticate(notify=True, once=True)
+    assert controller.auth_error == "authentication failed (http error)"
+    start = time.monotonic()
+    assert not controller.re_authenticate()
+    assert time.monotonic() - start < 0.5
+    assert controller.auth_error == "authentication failed (http error)"
+
+
+def test_project_downloaded_once(
+    simulator: IHCSimulator, controller: IHCController
+) -> None:
+    """The project model and the project share one download."""
+    model = controller.get_project_model()
+    assert model is not None
+    project = controller.get_project()
+    assert project
+    assert controller.get_project_model() is model
+    assert simulator.requests["getIHCProjectNumberOfSegments"] == 1
+    assert simulator.requests["getIHCProjectSegment"] == simulator.segments
+
+
+def test_subscriptions_after_re_authentication(
+    simulator: IHCSimulator, controller: IHCController
+) -> None:
+    """The notify events are enabled again in the new session, without the removed."""
+    controller.longpoll = IHCLongPollTuner(min_wait=1, max_wait=1)
+    removed, kept = list(simulator.values)[:2]
+    changes = queue.Queue()
+    assert controller.add_notify_events(
+        [removed, kept], lambda resourceid, value: changes.put((resourceid, value))
+    )
+    assert {changes.get(timeout=5)[0] for _ in range(2)} == {removed, kept}
+    assert controller.remove_notify_event(removed)
+    simulator.set_value(removed, 1)
+    simulator.set_value(kept, 2)
+    assert changes.get(timeout=5) == (kept, 2)
+    authentications = simulator.requests["authenticate"]
+    simulator.expire_sessions()
+    wait_for(lambda: simulator.requests["authenticate"] > authentications)
+    wait_for(lambda: len(simulator.sessions) == 1)
+    # The current value from the first poll in the new session is not a change
+    simulator.set_value(removed, 3)
+    simulator.set_value(kept, 4)
+    assert changes.get(timeout=5) == (kept, 4)
+    assert changes.empty()
+    (session,) = simulator.sessions.values()
+    assert session.enabled == {kept}
+
+
+def test_single_flight_re_authentication(
+    simulator: IHCSimulator, controller: IHCController
+) -> None:
+    """Concurrent callers share one re-authentication."""
+    simulator.latency = 0.1
+    barrier = threading.Barrier(THREADS)
+
+    def re_authenticate() -> bool:
+        barrier.wait()
+        return controller.re_authenticate()
+
+    with ThreadPoolExecutor(THREADS) as executor:
+        results = list(executor.map(lambda _: re_authenticate(), range(THREADS)))
+    assert results == [True] * THREADS
+    assert simulator.requests["authenticate"] == 2
+
+
+def test_failed_re_authentication_fails_fast(
+    simulator: IHCSimulator, controller: IHCController
+) -> None:
+    """The callers share a failed re-authentication and fail fast after it."""
+    controller.reauthenticatetimeout = 0.5
+    simulator.inject_fault(FAULT_HTTP, count=1000, request="authenticate")
+    barrier = threading.Barrier(THREADS)
+
+    def re_authenticate() -> bool:
+        barrier.wait()
+        return controller.re_authenticate()
+
+    with ThreadPoolExecutor(THREADS) as executor:
+        results = list(executor.map(lambda _: re_authenticate(), range(THREADS)))
+    assert results == [False] * THREADS
+    # One thread retried with backoff until the timeout
+    attempts = simulator.requests["authenticate"] - 1
+    assert 1 < attempts < THREADS
+    assert controller.auth_error == "authentication failed for 0.5s"
+    assert not controller.re_authenticate()
+    assert simulator.requests["authenticate"] - 1 == attempts
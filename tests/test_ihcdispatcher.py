@@ -0,0 +1,132 @@
+"""Test the dispatchers and the dispatch queue."""
+
+import threading
+import time
+from collections import defaultdict
+from typing import Any
+
+import pytest
+
+from ihcsdk.ihccontroller import IHCController
+from ihcsdk.ihcdispatcher import (
+    OVERFLOW_BLOCK,
+    OVERFLOW_COALESCE,
+    OVERFLOW_DROP_OLDEST,
+    IHCCoalescingDispatcher,
+    IHCDispatcher,
+    IHCDispatchQueue,
+    IHCThreadDispatcher,
+)
+from ihcsdk.ihclongpoll import IHCLongPollTuner
+from ihcsdk.ihcsimulator import IHCSimulator
+from tests.common import wait_for
+
+
+def test_coalescing_skips_the_delivered_value() -> None:
+    """A resource that returns to its delivered value is not delivered again."""
+    calls: list[tuple[int, Any]] = []
+
+    def callback(resourceid: int, value: Any) -> None:
+        calls.append((resourceid, value))
+
+    dispatcher = IHCCoalescingDispatcher(IHCDispatcher(), window=0.05)
+    dispatcher.dispatch(1, "A", [callback])
+    dispatcher.flush()
+    time.sleep(0.1)
+    # Another resource flushes after the window of the delivery ended
+    dispatcher.dispatch(2, "X", [callback])
+    dispatcher.flush()
+    dispatcher.dispatch(1, "B", [callback])
+    dispatcher.dispatch(1, "A", [callback])
+    dispatcher.close()
+    assert calls == [(1, "A"), (2, "X")]
+
+
+def test_coalescing_forget() -> None:
+    """The value of a forgotten resource is delivered again."""
+    calls: list[tuple[int, Any]] = []
+
+    def callback(resourceid: int, value: Any) -> None:
+        calls.append((resourceid, value))
+
+    dispatcher = IHCCoalescingDispatcher(IHCDispatcher(), window=0.05)
+    dispatcher.dispatch(1, "A", [callback])
+    dispatcher.flush()
+    dispatcher.forget(1)
+    dispatcher.dispatch(1, "A", [callback])
+    dispatcher.close()
+    assert calls == [(1, "A"), (1, "A")]
+
+
+def test_queue_drop_oldest() -> None:
+    """A full queue drops the oldest change."""
+    queue = IHCDispatchQueue(2, OVERFLOW_DROP_OLDEST)
+    for resourceid in (1, 2, 3):
+        queue.put(resourceid, resourceid, [])
+    assert [queue.get(block=False)[0] for _ in range(2)] == [2, 3]
+    assert queue.dropped == 1
+
+
+def test_queue_coalesce() -> None:
+    """A queued change for the resource gets the new value and count."""
+    queue = IHCDispatchQueue(10, OVERFLOW_COALESCE)
+    queue.put(1, "A", [])
+    queue.put(2, "X", [])
+    queue.put(1, "B", [])
+    assert [item[:4] for item in (queue.get(), queue.get())] == [
+        [1, "B", [], 2],
+        [2, "X", [], 1],
+    ]
+    assert queue.coalesced == 1
+    assert queue.get(block=False) is None
+
+
+def test_queue_block() -> None:
+    """A full queue makes the producer wait for the consumer."""
+    queue = IHCDispatchQueue(1, OVERFLOW_BLOCK)
+    queue.put(1, "A", [])
+    thread = threading.Thread(target=queue.put, args=(2, "X", []))
+    thread.start()
+    thread.join(0.1)
+    assert thread.is_alive()
+    assert queue.get()[0] == 1
+    thread.join(1)
+    assert not thread.is_alive()
+    assert queue.get()[0] == 2
+    assert queue.dropped == 0
+
+
+def test_queue_unknown_overflow() -> None:
+    """An unknown overflow policy is rejected."""
+    with pytest.raises(ValueError, match="Unknown overflow policy"):
+        IHCDispatchQueue(1, "unknown")
+
+
+def test_changes_in_order_per_resource() -> None:
+    """The changes of each resource are delivered in order by the workers."""
+    changes = 50
+    with IHCSimulator("user", "password", resources=8) as simulator:
+        controller = IHCController(simulator.url, "user", "password")
+        controller.longpoll = IHCLongPollTuner(min_wait=1, max_wait=1)
+        controller.dispatcher = IHCThreadDispatcher(workers=4)
+        assert controller.authenticate()
+        resourceids = list(simulator.values)
+        values: dict[int, list] = defaultdict(list)
+        lock = threading.Lock()
+
+        def callback(resourceid: int, value: Any) -> None:
+            with lock:
+                values[resourceid].append(value)
+
+        assert controller.add_notify_events(resourceids, callback)
+        wait_for(lambda: len(values) == len(resourceids))
+        for value in range(1, changes + 1):
+            for resourceid in resourceids:
+                simulator.set_value(resourceid, value)
+            if value % 10 == 0:
+                time.sleep(0.05)
+        wait_for(lambda: all(v[-1] == changes for v in values.values()))
+        controller.disconnect()
+    for resourceid in resourceids:
+        # The first value is the current value when the notifications started
+        assert values[resourceid][1:] == list(range(1, changes + 1))
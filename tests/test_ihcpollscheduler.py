@@ -0,0 +1,64 @@
+"""Test the poll scheduler against the simulator."""
+
+import threading
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+import pytest
+
+from ihcsdk.ihccontroller import IHCController
+from ihcsdk.ihcsimulator import IHCSimulator
+from tests.common import wait_for
+
+THREADS = 4
+
+
+@pytest.fixture
+def simulator() -> Iterator[IHCSimulator]:
+    """Run a simulator with latency, so the reads overlap."""
+    with IHCSimulator("user", "password", resources=20) as simulator:
+        simulator.latency = 0.2
+        yield simulator
+
+
+@pytest.fixture
+def controller(simulator: IHCSimulator) -> Iterator[IHCController]:
+    """Get an authenticated controller for the simulator."""
+    controller = IHCController(simulator.url, "user", "password")
+    assert controller.authenticate()
+    yield controller
+    controller.disconnect()
+
+
+def test_concurrent_reads_share_a_request(
+    simulator: IHCSimulator, controller: IHCController
+) -> None:
+    """The resources that are being read are not requested again."""
+    resourceids = list(simulator.values)
+    barrier = threading.Barrier(THREADS)
+
+    def read(_: int) -> Any:
+        barrier.wait()
+        return controller.get_runtime_values(resourceids)
+
+    with ThreadPoolExecutor(THREADS) as executor:
+        results = list(executor.map(read, range(THREADS)))
+    assert results == [simulator.values] * THREADS
+    assert simulator.requests["getRuntimeValues"] == 1
+
+
+def test_read_shares_the_scheduled_poll(
+    simulator: IHCSimulator, controller: IHCController
+) -> None:
+    """A read of the resources in a scheduled poll uses the poll request."""
+    resourceids = list(simulator.values)
+    polled = {}
+    controller.poll_scheduler.add(
+        resourceids, 60, lambda resourceid, value: polled.update({resourceid: value})
+    )
+    wait_for(lambda: simulator.requests["getRuntimeValues"] == 1)
+    assert controller.get_runtime_values(resourceids) == simulator.values
+    wait_for(lambda: len(polled) == len(resourceids))
+    assert polled == simulator.values
+    assert simulator.requests["getRuntimeValues"] == 1
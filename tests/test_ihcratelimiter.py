@@ -0,0 +1,83 @@
+"""Test the request priorities of the rate limiter against the simulator."""
+
+import asyncio
+import threading
+import time
+
+from ihcsdk.ihcasyncclient import AsyncIHCSoapClient
+from ihcsdk.ihcclient import IHCSoapClient
+from ihcsdk.ihcratelimiter import (
+    PRIORITY_BULK,
+    PRIORITY_READ,
+    PRIORITY_WRITE,
+    IHCRateLimiter,
+)
+from ihcsdk.ihcsimulator import IHCSimulator
+
+# Requests per second, the requests wait 0.1 second for each other
+RATE = 10
+
+
+def test_priority_order() -> None:
+    """A waiting write is sent before the waiting reads and bulk reads."""
+    with IHCSimulator("user", "password", resources=2) as simulator:
+        client = IHCSoapClient(simulator.url)
+        assert client.authenticate("user", "password")
+        client.connection.rate_limiter = IHCRateLimiter(RATE)
+        resourceid = next(iter(simulator.values))
+        order = []
+        lock = threading.Lock()
+
+        def request(priority: int) -> None:
+            if priority == PRIORITY_WRITE:
+                assert client.set_runtime_value_bool(resourceid, value=True)
+            else:
+                assert client.get_runtime_values([resourceid], priority)
+            with lock:
+                order.append(priority)
+
+        # Take the token, so the requests below wait for the next ones
+        assert client.get_runtime_values([resourceid])
+        threads = []
+        for priority in (PRIORITY_BULK, PRIORITY_BULK, PRIORITY_READ, PRIORITY_WRITE):
+            thread = threading.Thread(target=request, args=(priority,))
+            thread.start()
+            threads.append(thread)
+            time.sleep(0.01)
+        for thread in threads:
+            thread.join()
+        client.close()
+    assert order == [PRIORITY_WRITE, PRIORITY_READ, PRIORITY_BULK, PRIORITY_BULK]
+
+
+def test_async_priority_order() -> None:
+    """The waiting coroutines are served by priority."""
+
+    async def run(simulator: IHCSimulator) -> list[int]:
+        client = AsyncIHCSoapClient(simulator.url)
+        assert await client.authenticate("user", "password")
+        client.connection.rate_limiter = IHCRateLimiter(RATE)
+        resourceid = next(iter(simulator.values))
+        order = []
+
+        async def request(priority: int, delay: float) -> None:
+            await asyncio.sleep(delay)
+            if priority == PRIORITY_WRITE:
+                assert await client.set_runtime_value_bool(resourceid, value=True)
+            else:
+                assert await client.get_runtime_values([resourceid], priority)
+            order.append(priority)
+
+        assert await client.get_runtime_values([resourceid])
+        await asyncio.gather(
+            request(PRIORITY_BULK, 0),
+            request(PRIORITY_BULK, 0.01),
+            request(PRIORITY_READ, 0.02),
+            request(PRIORITY_WRITE, 0.03),
+        )
+        await client.close()
+        return order
+
+    with IHCSimulator("user", "password", resources=2) as simulator:
+        order = asyncio.run(run(simulator))
+    assert order == [PRIORITY_WRITE, PRIORITY_READ, PRIORITY_BULK, PRIORITY_BULK]